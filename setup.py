@@ -43,6 +43,12 @@ setup(
     ],
     keywords='tic-tac-toe tic tac toe noughts crosses',
     packages=packages,
+    package_data={
+        'xo': ['solutions.bin', 'books/*.bin']
+    },
+    extras_require={
+        'numpy': ['numpy']
+    },
     entry_points={
         'console_scripts': [
             'xo=xo.cli:main'
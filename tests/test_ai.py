@@ -1,7 +1,11 @@
+import asyncio
+import threading
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
+
 import xo.ai as ai
-from xo.board import Board
+from xo.board import Board, geometry
 
 
 class OpeningGameTestCase(unittest.TestCase):
@@ -92,3 +96,626 @@ class BadArgumentTestCase(unittest.TestCase):
     def test_when_not_token_turn(self):
         with self.assertRaisesRegex(ValueError, "not x's turn to play: xxo......"):
             ai.evaluate(Board.fromstring('xxo'), 'x')
+
+
+class CachedEvaluationTestCase(unittest.TestCase):
+    def test_it_agrees_with_an_uncached_search(self):
+        for i in range(9):
+            for j in range(9):
+                if i != j:
+                    layout = ['.'] * 9
+                    layout[i] = 'x'
+                    layout[j] = 'o'
+                    board = Board.fromstring(''.join(layout))
+
+                    for token in ['x', 'o']:
+                        with self.subTest(board=str(board), token=token):
+                            self.assertEqual(
+                                ai.evaluate(board, token),
+                                ai.evaluate(board, token, use_cache=False)
+                            )
+
+    def test_it_returns_positions_that_are_safe_to_modify(self):
+        board = Board.fromstring('x...o')
+
+        ai.evaluate(board, 'x').positions.clear()
+
+        self.assertEqual(ai.evaluate(board, 'x').positions,
+            [(1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2), (3, 3)]
+        )
+
+
+class TranspositionTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = ai._solutions()
+        ai.use_solutions(None)
+        ai.transposition_table.clear()
+
+    def tearDown(self):
+        ai.use_solutions(self.database)
+
+    def test_it_agrees_with_an_uncached_search(self):
+        for layout in ['', 'x', 'x.o', 'xo...x', '.o..x']:
+            board = Board.fromstring(layout)
+
+            for token in ['x', 'o']:
+                if layout.count('x') > layout.count('o') and token == 'x':
+                    continue
+
+                with self.subTest(board=str(board), token=token):
+                    self.assertEqual(
+                        ai.evaluate(board, token),
+                        ai.evaluate(board, token, use_cache=False)
+                    )
+                    self.assertGreater(len(ai.transposition_table), 0)
+
+    def test_it_evicts_the_least_recently_used_entry(self):
+        table = ai.TranspositionTable(maxsize=2)
+        table.put('a', 1)
+        table.put('b', 2)
+        table.get('a')
+        table.put('c', 3)
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.get('a'), 1)
+        self.assertIsNone(table.get('b'))
+        self.assertEqual(table.get('c'), 3)
+
+    def test_resize(self):
+        table = ai.TranspositionTable(maxsize=3)
+        table.put('a', 1)
+        table.put('b', 2)
+        table.put('c', 3)
+        table.resize(1)
+
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.get('c'), 3)
+
+        with self.assertRaisesRegex(ValueError, 'maxsize must be non-negative: -1'):
+            table.resize(-1)
+
+    def test_a_small_table_still_gives_the_same_results(self):
+        board = Board.fromstring('x.o')
+        expected = ai.evaluate(board, 'x', use_cache=False)
+
+        ai.transposition_table.resize(16)
+        try:
+            self.assertEqual(ai.evaluate(board, 'x'), expected)
+            self.assertLessEqual(len(ai.transposition_table), 16)
+        finally:
+            ai.transposition_table.resize(65536)
+
+    def test_later_positions_of_a_game_reuse_the_earlier_searches(self):
+        g = geometry(3, 4, 3)
+
+        def search(layout, token, table):
+            board = Board.fromstring(layout, g)
+            stats = ai.SearchStats()
+            result = ai._maximize(g, board.mask(token), board.mask('o' if token == 'x' else 'x'),
+                token, 0, table, stats)
+
+            return result, stats.total_nodes
+
+        table = ai.TranspositionTable(maxsize=1 << 20)
+        search('x....o......', 'x', table)
+
+        for layout, token in [('x....o..x..o', 'x'), ('x....o..x...', 'o')]:
+            with self.subTest(board=layout, token=token):
+                result, nodes = search(layout, token, table)
+                expected, expected_nodes = search(layout, token, ai.TranspositionTable(maxsize=1 << 20))
+
+                self.assertEqual(result, expected)
+                self.assertLess(nodes, expected_nodes)
+
+    def test_symmetric_boards_share_an_entry(self):
+        ai.evaluate(Board.fromstring('x'), 'o')
+        size = len(ai.transposition_table)
+
+        for layout in ['..x', '......x', '........x']:
+            self.assertEqual(ai.evaluate(Board.fromstring(layout), 'o').positions, [(2, 2)])
+
+        self.assertEqual(len(ai.transposition_table), size)
+
+
+class AlphaBetaTestCase(unittest.TestCase):
+    layouts = ['', 'x', '.x', '....x', 'xo', 'x.o', 'x...o', 'x....o', 'xo.xo.', 'x.x.o', 'x.oo..x.x']
+
+    def test_it_agrees_with_minimax(self):
+        for layout in self.layouts:
+            board = Board.fromstring(layout)
+
+            for token in ['x', 'o']:
+                try:
+                    expected = ai.evaluate(board, token, use_cache=False)
+                except ValueError:
+                    continue
+
+                with self.subTest(board=str(board), token=token):
+                    self.assertEqual(
+                        ai.evaluate(board, token, use_cache=False, engine=ai.ENGINE_ALPHABETA),
+                        expected
+                    )
+                    self.assertEqual(str(board), str(Board.fromstring(layout)))
+
+    def test_when_one_position_is_enough(self):
+        for layout in self.layouts:
+            board = Board.fromstring(layout)
+            token = 'o' if layout.count('x') > layout.count('o') else 'x'
+            expected = ai.evaluate(board, token, use_cache=False)
+
+            with self.subTest(board=str(board), token=token):
+                result = ai.evaluate(board, token, use_cache=False,
+                    engine=ai.ENGINE_ALPHABETA, all_positions=False)
+
+                self.assertEqual(result.score, expected.score)
+                self.assertEqual(result.depth, expected.depth)
+                self.assertEqual(len(result.positions), 1)
+                self.assertIn(result.positions[0], expected.positions)
+
+    def test_it_validates_the_board(self):
+        with self.assertRaisesRegex(ValueError, 'no available moves: xxxoo....'):
+            ai.evaluate(Board.fromstring('xxxoo'), 'x', engine=ai.ENGINE_ALPHABETA)
+
+    def test_when_the_engine_is_unknown(self):
+        with self.assertRaisesRegex(ValueError, 'unknown engine: negamax'):
+            ai.evaluate(Board.fromstring(), 'x', engine='negamax')
+
+
+class ConcurrentEvaluationTestCase(unittest.TestCase):
+    layouts = ['', 'x', '.x', '....x', 'xo', 'x.o', 'x...o', 'x....o', 'xo.xo.', 'x.x.o']
+
+    def setUp(self):
+        self.database = ai._solutions()
+        ai.use_solutions(None)
+        ai.transposition_table.clear()
+
+    def tearDown(self):
+        ai.use_solutions(self.database)
+        ai.transposition_table.resize(65536)
+
+    def test_it_does_not_modify_the_board(self):
+        board = Board.fromstring('x.o')
+
+        for engine in [ai.ENGINE_MINIMAX, ai.ENGINE_ALPHABETA]:
+            ai.evaluate(board, 'x', use_cache=False, engine=engine)
+
+            self.assertEqual(str(board), 'x.o......')
+
+    def test_many_threads_can_share_boards_and_the_cache(self):
+        # A small table forces entries to be evicted while other threads are
+        # reading and writing it.
+        ai.transposition_table.resize(256)
+
+        tasks = []
+        for layout in self.layouts:
+            board = Board.fromstring(layout)
+            token = 'o' if layout.count('x') > layout.count('o') else 'x'
+            expected = ai.evaluate(board, token, use_cache=False)
+
+            tasks.append((board, token, expected))
+
+        def evaluate(n):
+            board, token, expected = tasks[n % len(tasks)]
+            engine = [ai.ENGINE_MINIMAX, ai.ENGINE_ALPHABETA][n // len(tasks) % 2]
+
+            return ai.evaluate(board, token, engine=engine), expected
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for result, expected in executor.map(evaluate, range(8 * len(tasks))):
+                self.assertEqual(result, expected)
+
+        for (board, _, _), layout in zip(tasks, self.layouts):
+            self.assertEqual(str(board), str(Board.fromstring(layout)))
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = ai._solutions()
+
+    def tearDown(self):
+        ai.use_solutions(self.database)
+
+    def test_it_counts_every_node_of_a_full_search(self):
+        board = Board.fromstring()
+
+        with ai.instrument() as stats:
+            result = ai.evaluate(board, 'x', use_cache=False)
+
+        self.assertEqual(result, ai.evaluate(board, 'x', use_cache=False))
+        self.assertEqual(stats.evaluations, 1)
+        self.assertEqual(stats.nodes[0], 1)
+        self.assertEqual(stats.nodes[1], 9)
+        self.assertEqual(stats.nodes[2], 9 * 8)
+        self.assertEqual(stats.total_nodes, 549946)
+        self.assertEqual(stats.terminals, 255168)
+        self.assertEqual(stats.cache_hits + stats.cache_misses, 0)
+        self.assertGreater(stats.wall_time, 0)
+
+    def test_it_counts_cache_hits_and_misses(self):
+        ai.use_solutions(None)
+        ai.transposition_table.clear()
+
+        with ai.instrument() as stats:
+            ai.evaluate(Board.fromstring('x'), 'o')
+
+        self.assertGreater(stats.cache_hits, 0)
+        # Terminal positions are looked up but never stored.
+        self.assertEqual(stats.cache_misses, len(ai.transposition_table) + stats.terminals)
+        self.assertEqual(stats.cache_hits + stats.cache_misses, stats.total_nodes)
+
+    def test_it_counts_database_hits(self):
+        with ai.instrument() as stats:
+            ai.evaluate(Board.fromstring('x'), 'o')
+
+        if self.database is not None:
+            self.assertEqual(stats.database_hits, 1)
+            self.assertEqual(stats.total_nodes, 0)
+
+    def test_it_counts_the_alphabeta_search(self):
+        with ai.instrument() as stats:
+            ai.evaluate(Board.fromstring(), 'x', use_cache=False, engine=ai.ENGINE_ALPHABETA)
+
+        self.assertEqual(stats.nodes[0], 1)
+        self.assertLess(stats.total_nodes, 549946)
+        self.assertGreater(stats.terminals, 0)
+
+    def test_it_only_counts_within_the_block_and_the_thread(self):
+        board = Board.fromstring('xo.xo.')
+
+        with ai.instrument() as stats:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(ai.evaluate, board, 'x', use_cache=False).result()
+
+            with ai.instrument() as inner:
+                ai.evaluate(board, 'x', use_cache=False)
+
+            ai.evaluate(board, 'x', use_cache=False)
+
+        ai.evaluate(board, 'x', use_cache=False)
+
+        self.assertEqual(inner.evaluations, 1)
+        self.assertEqual(stats.evaluations, 1)
+        self.assertEqual(stats.asdict()['nodes'], inner.asdict()['nodes'])
+
+    def test_it_can_add_to_existing_stats(self):
+        stats = ai.SearchStats()
+
+        for _ in range(2):
+            with ai.instrument(stats):
+                ai.evaluate(Board.fromstring('xo.xo.'), 'x', use_cache=False)
+
+        self.assertEqual(stats.evaluations, 2)
+        self.assertEqual(stats.nodes[0], 2)
+
+
+class EvaluateManyTestCase(unittest.TestCase):
+    layouts = ['', 'x', '.x', '..x', '......x', '........x', 'xo', 'x.o', 'x...o', 'xo.xo.', 'x.oo..x.x']
+
+    def positions(self):
+        for layout in self.layouts:
+            token = 'o' if layout.count('x') > layout.count('o') else 'x'
+            yield Board.fromstring(layout), token
+
+    def test_it_agrees_with_evaluate_in_input_order(self):
+        expected = [ai.evaluate(board, token, use_cache=False) for board, token in self.positions()]
+
+        for engine in [ai.ENGINE_MINIMAX, ai.ENGINE_ALPHABETA]:
+            with self.subTest(engine=engine):
+                self.assertEqual(
+                    list(ai.evaluate_many(self.positions(), use_cache=False, engine=engine, chunksize=3)),
+                    expected
+                )
+
+    def test_symmetric_boards_are_only_evaluated_once(self):
+        layouts = ['x', '..x', '......x', '........x', 'x', '.x', '...x']
+        positions = [(Board.fromstring(layout), 'o') for layout in layouts]
+
+        with ai.instrument() as stats:
+            results = list(ai.evaluate_many(positions, use_cache=False))
+
+        self.assertEqual(stats.evaluations, 2)
+        self.assertEqual([result.positions for result in results[:5]], [[(2, 2)]] * 5)
+        self.assertEqual(results[5], ai.evaluate(Board.fromstring('.x'), 'o'))
+        self.assertEqual(results[6], ai.evaluate(Board.fromstring('...x'), 'o'))
+
+    def test_it_streams_the_results(self):
+        def positions():
+            yield Board.fromstring('xo.xo.'), 'x'
+            raise RuntimeError('read too far')
+
+        results = ai.evaluate_many(positions(), chunksize=1)
+
+        self.assertEqual(next(results).positions, [(3, 1)])
+
+    def test_it_fans_out_to_processes(self):
+        expected = [ai.evaluate(board, token) for board, token in self.positions()]
+
+        self.assertEqual(list(ai.evaluate_many(self.positions(), jobs=2, chunksize=2)), expected)
+
+    def test_it_raises_the_error_for_the_rejected_position(self):
+        positions = [(Board.fromstring('x'), 'o'), (Board.fromstring('xxxoo'), 'o')]
+        results = ai.evaluate_many(positions)
+
+        self.assertEqual(next(results).positions, [(2, 2)])
+
+        with self.assertRaisesRegex(ValueError, 'no available moves: xxxoo....'):
+            next(results)
+
+    def test_it_validates_its_arguments(self):
+        with self.assertRaisesRegex(ValueError, 'unknown engine: negamax'):
+            ai.evaluate_many([], engine='negamax')
+
+        with self.assertRaisesRegex(ValueError, 'jobs must be non-negative: -1'):
+            ai.evaluate_many([], jobs=-1)
+
+        with self.assertRaisesRegex(ValueError, 'chunksize must be positive: 0'):
+            ai.evaluate_many([], chunksize=0)
+
+
+class IterativeDeepeningTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = ai._solutions()
+        ai.use_solutions(None)
+
+    def tearDown(self):
+        ai.use_solutions(self.database)
+
+    def test_it_agrees_with_minimax_given_enough_time(self):
+        for layout in ['', 'x', 'x.o', 'xo...x', '.o..x', 'xo.xo.']:
+            board = Board.fromstring(layout)
+
+            for token in ['x', 'o']:
+                try:
+                    expected = ai.evaluate(board, token, use_cache=False)
+                except ValueError:
+                    continue
+
+                with self.subTest(board=layout, token=token):
+                    self.assertEqual(ai.evaluate(board, token, time_budget=60), expected)
+
+    def test_it_reuses_the_previous_searches_for_move_ordering(self):
+        board = Board.fromstring('x....o', geometry(4, 4, 3))
+
+        with ai.instrument() as alphabeta:
+            expected = ai.evaluate(board, 'x', use_cache=False, engine=ai.ENGINE_ALPHABETA)
+
+        with ai.instrument() as deepening:
+            self.assertEqual(ai.evaluate(board, 'x', time_budget=60), expected)
+
+        self.assertLess(deepening.total_nodes, alphabeta.total_nodes)
+
+    def test_it_respects_the_time_budget(self):
+        board = Board.fromstring('', geometry(5, 5, 4))
+
+        with ai.instrument() as stats:
+            result = ai.evaluate(board, 'x', time_budget=0.02)
+
+        self.assertLess(stats.wall_time, 0.5)
+        self.assertEqual(result.score, 0)
+        self.assertGreaterEqual(result.depth, 1)
+        self.assertTrue(result.positions)
+
+    def test_it_always_finds_a_move(self):
+        board = Board.fromstring('', geometry(15, 15, 5))
+        result = ai.evaluate(board, 'x', time_budget=0)
+
+        self.assertEqual(result.depth, 1)
+        self.assertEqual(len(result.positions), 1)
+
+    def test_it_finds_a_win_within_its_depth(self):
+        board = Board.fromstring('xx..oo' + '.' * 219, geometry(15, 15, 3))
+
+        self.assertEqual(ai.evaluate(board, 'x', time_budget=0.05).positions, [(1, 3)])
+
+    def test_when_the_time_budget_is_negative(self):
+        with self.assertRaisesRegex(ValueError, 'time_budget must be non-negative: -1'):
+            ai.evaluate(Board.fromstring(), 'x', time_budget=-1)
+
+
+class MonteCarloTreeSearchTestCase(unittest.TestCase):
+    def test_it_takes_a_win(self):
+        board = Board.fromstring('xx.oo')
+
+        self.assertEqual(ai.mcts(board, 'x', 2000, seed=1).positions, [(1, 3)])
+
+    def test_it_blocks_a_win(self):
+        board = Board.fromstring('xx.o')
+
+        self.assertEqual(ai.mcts(board, 'o', 2000, seed=1).positions, [(1, 3)])
+
+    def test_it_takes_a_win_on_a_large_board(self):
+        board = Board.fromstring('xxxx.' + '.' * 10 + 'oooo' + '.' * 206, geometry(15, 15, 5))
+
+        self.assertEqual(ai.mcts(board, 'x', 2000, seed=1).positions, [(1, 5)])
+
+    def test_a_seed_gives_the_same_result(self):
+        board = Board.fromstring('', geometry(7, 7, 4))
+
+        self.assertEqual(
+            ai.mcts(board, 'x', 300, seed=3),
+            ai.mcts(board, 'x', 300, seed=3)
+        )
+
+    def test_it_respects_the_time_budget(self):
+        board = Board.fromstring('', geometry(15, 15, 5))
+
+        with ai.instrument() as stats:
+            result = ai.evaluate(board, 'x', engine=ai.ENGINE_MCTS, time_budget=0.05)
+
+        self.assertLess(stats.wall_time, 0.5)
+        self.assertIsNone(result.score)
+        self.assertIsNone(result.depth)
+        self.assertTrue(result.positions)
+
+    def test_the_searches_of_several_processes_are_merged(self):
+        board = Board.fromstring('xx.oo')
+
+        self.assertEqual(ai.mcts(board, 'x', 2000, jobs=2, seed=1).positions, [(1, 3)])
+
+    def test_it_runs_even_when_the_exact_results_are_known(self):
+        board = Board.fromstring('x...o')
+
+        with ai.instrument() as stats:
+            result = ai.evaluate(board, 'x', engine=ai.ENGINE_MCTS)
+
+        self.assertEqual(stats.database_hits, 0)
+        self.assertIsNone(result.score)
+        self.assertIsNone(result.depth)
+        self.assertTrue(set(result.positions) <= set(ai.evaluate(board, 'x').positions))
+
+    def test_when_the_board_cannot_be_evaluated(self):
+        with self.assertRaisesRegex(ValueError, "not x's turn to play"):
+            ai.mcts(Board.fromstring('x'), 'x')
+
+        with self.assertRaisesRegex(ValueError, 'no available moves'):
+            ai.mcts(Board.fromstring('xxxoo'), 'o')
+
+    def test_when_there_is_no_budget(self):
+        with self.assertRaisesRegex(ValueError, 'either playouts or time_budget is needed'):
+            ai.mcts(Board.fromstring(), 'x', playouts=None)
+
+        with self.assertRaisesRegex(ValueError, 'playouts must be positive: 0'):
+            ai.mcts(Board.fromstring(), 'x', playouts=0)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, gate=None):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+        self.gate = gate
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+
+        def run():
+            if self.gate is not None:
+                self.gate.wait()
+            return fn(*args, **kwargs)
+
+        return super().submit(run)
+
+
+class AsyncEvaluationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_it_agrees_with_evaluate(self):
+        for layout, token in [('x.o', 'x'), ('xo.xo.', 'o'), ('', 'x')]:
+            board = Board.fromstring(layout)
+
+            with self.subTest(board=layout, token=token):
+                self.assertEqual(
+                    self.run_until_complete(ai.evaluate_async(board, token, use_cache=False)),
+                    ai.evaluate(board, token, use_cache=False)
+                )
+
+    def test_concurrent_requests_share_an_evaluation(self):
+        executor = CountingExecutor()
+        self.addCleanup(executor.shutdown)
+        layouts = ['x', '..x', '......x', '........x'] * 3
+
+        async def evaluate_all():
+            return await asyncio.gather(*[
+                ai.evaluate_async(Board.fromstring(layout), 'o', use_cache=False, executor=executor)
+                for layout in layouts
+            ])
+
+        results = self.run_until_complete(evaluate_all())
+
+        self.assertEqual(executor.submitted, 1)
+        self.assertEqual([result.positions for result in results], [[(2, 2)]] * len(layouts))
+        self.assertEqual(ai._flights.get(self.loop), {})
+
+    def test_a_request_can_time_out_without_affecting_the_others(self):
+        gate = threading.Event()
+        executor = CountingExecutor(gate)
+        self.addCleanup(executor.shutdown)
+        board = Board.fromstring('x.o')
+
+        async def evaluate_both():
+            patient = asyncio.ensure_future(ai.evaluate_async(board, 'x', executor=executor))
+
+            with self.assertRaises(asyncio.TimeoutError):
+                await ai.evaluate_async(board, 'x', executor=executor, timeout=0.01)
+
+            gate.set()
+            return await patient
+
+        self.assertEqual(self.run_until_complete(evaluate_both()), ai.evaluate(board, 'x'))
+        self.assertEqual(executor.submitted, 1)
+
+    def test_the_evaluation_is_cancelled_when_every_request_is(self):
+        gate = threading.Event()
+        executor = CountingExecutor(gate)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(gate.set)
+
+        async def cancel():
+            request = asyncio.ensure_future(ai.evaluate_async(Board.fromstring(), 'x', executor=executor))
+            await asyncio.sleep(0)
+
+            flight, = ai._flights[self.loop].values()
+            request.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await request
+
+            return flight
+
+        flight = self.run_until_complete(cancel())
+
+        self.assertTrue(flight.future.cancelled())
+        self.assertEqual(ai._flights.get(self.loop), {})
+
+    def test_a_request_right_after_a_cancellation_is_not_cancelled(self):
+        gate = threading.Event()
+        executor = CountingExecutor(gate)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(gate.set)
+        board = Board.fromstring('x.o')
+
+        async def cancel_and_request_again():
+            request = asyncio.ensure_future(ai.evaluate_async(board, 'x', executor=executor))
+            await asyncio.sleep(0)
+            request.cancel()
+            await asyncio.sleep(0)
+
+            # The cancelled evaluation's done callbacks haven't run yet.
+            gate.set()
+            return await ai.evaluate_async(board, 'x', executor=executor)
+
+        self.assertEqual(self.run_until_complete(cancel_and_request_again()), ai.evaluate(board, 'x'))
+        self.assertEqual(executor.submitted, 2)
+        self.assertEqual(ai._flights.get(self.loop), {})
+
+    def test_it_raises_the_error_for_the_board(self):
+        with self.assertRaisesRegex(ValueError, 'no available moves: xxxoo....'):
+            self.run_until_complete(ai.evaluate_async(Board.fromstring('xxxoo'), 'o'))
+
+        with self.assertRaisesRegex(ValueError, 'unknown engine: negamax'):
+            self.run_until_complete(ai.evaluate_async(Board.fromstring(), 'x', engine='negamax'))
+
+
+class LargerBoardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.geometry = geometry(3, 4, 3)
+
+    def test_all_the_engines_agree(self):
+        for layout, token in [('x.o..x.o....', 'x'), ('x....o......', 'x'), ('..x..o......', 'o')]:
+            board = Board.fromstring(layout, self.geometry)
+            expected = ai.evaluate(board, token, use_cache=False)
+
+            with self.subTest(board=layout, token=token):
+                self.assertEqual(ai.evaluate(board, token), expected)
+                self.assertEqual(ai.evaluate(board, token, engine=ai.ENGINE_ALPHABETA), expected)
+
+    def test_it_finds_the_win(self):
+        board = Board.fromstring('xx..oo......', self.geometry)
+
+        self.assertEqual(ai.evaluate(board, 'x'), ai.MinimaxResult(
+            score=2 * (12 - 1) + 12 + 1, depth=1, positions=[(1, 3)]
+        ))
@@ -1,7 +1,16 @@
+import itertools
+import json
+import pickle
+import random
 import unittest
 
 import xo.arbiter as arbiter
-from xo.board import Board
+from xo.board import Board, geometry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class InProgressPositionsTestCase(unittest.TestCase):
@@ -91,3 +100,235 @@ class CountPiecesTestCase(unittest.TestCase):
         self.assertEqual(piece_counts['xs'], 2)
         self.assertEqual(piece_counts['os'], 3)
         self.assertEqual(piece_counts['es'], 4)
+
+
+class CanMoveTestCase(unittest.TestCase):
+    def test_it_is_true_when_it_is_the_tokens_turn(self):
+        self.assertTrue(arbiter.can_move(Board.fromstring(), 'x'))
+        self.assertTrue(arbiter.can_move(Board.fromstring(), 'o'))
+        self.assertTrue(arbiter.can_move(Board.fromstring('x'), 'o'))
+        self.assertTrue(arbiter.can_move(Board.fromstring('x...o', geometry(3, 4)), 'x'))
+
+    def test_it_is_false_otherwise(self):
+        self.assertFalse(arbiter.can_move(Board.fromstring('x'), 'x'))
+        self.assertFalse(arbiter.can_move(Board.fromstring('xxxoo'), 'o'))
+        self.assertFalse(arbiter.can_move(Board.fromstring('xxx'), 'o'))
+
+
+class OutcomeTableTestCase(unittest.TestCase):
+    def test_it_agrees_with_a_fresh_analysis_of_every_board(self):
+        for n in range(3 ** 9):
+            layout = ''
+            for _ in range(9):
+                n, d = divmod(n, 3)
+                layout += '.xo'[d]
+
+            board = Board.fromstring(layout)
+
+            for token in ['x', 'o']:
+                self.assertEqual(
+                    arbiter.outcome(board, token),
+                    arbiter._outcome(board, token)
+                )
+
+    def test_it_returns_a_result_that_cannot_be_modified(self):
+        board = Board.fromstring('xxxoo')
+        outcome = arbiter.outcome(board, 'x')
+
+        with self.assertRaises(TypeError):
+            outcome['piece_counts']['xs'] = 0
+
+        with self.assertRaisesRegex(AttributeError, 'Outcome is immutable'):
+            outcome.status = arbiter.STATUS_IN_PROGRESS
+
+        outcome['details'][0]['positions'].clear()
+
+        self.assertEqual(arbiter.outcome(board, 'x')['details'][0]['positions'],
+            [(1, 1), (1, 2), (1, 3)]
+        )
+
+    def test_equal_outcomes_are_shared(self):
+        self.assertIs(
+            arbiter.outcome(Board.fromstring('x'), 'o'),
+            arbiter.outcome(Board.fromstring('....x'), 'o')
+        )
+
+
+class OutcomeRecordTestCase(unittest.TestCase):
+    def test_it_can_be_read_through_attributes(self):
+        outcome = arbiter.outcome(Board.fromstring('xxxoo'), 'o')
+
+        self.assertEqual(outcome.status, arbiter.STATUS_GAMEOVER)
+        self.assertEqual(outcome.reason, arbiter.REASON_LOSER)
+        self.assertEqual(outcome.details[0].where, 'row')
+        self.assertEqual(outcome.details[0].index, 1)
+        self.assertEqual(outcome.details[0].positions, ((1, 1), (1, 2), (1, 3)))
+        self.assertEqual(outcome.piece_counts.xs, 3)
+        self.assertEqual(outcome.piece_counts.os, 2)
+        self.assertEqual(outcome.piece_counts.es, 4)
+
+    def test_it_compares_equal_to_the_equivalent_dict(self):
+        self.assertEqual(arbiter.outcome(Board.fromstring('xxxoo'), 'o'), {
+            'status': 'gameover',
+            'reason': 'loser',
+            'details': [
+                { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] }
+            ],
+            'piece_counts': { 'xs': 3, 'os': 2, 'es': 4 }
+        })
+
+        self.assertEqual(dict(arbiter.outcome(Board.fromstring(), 'x')), {
+            'status': 'in-progress',
+            'piece_counts': { 'xs': 0, 'os': 0, 'es': 9 }
+        })
+
+    def test_missing_fields_are_not_in_the_dict_view(self):
+        outcome = arbiter.outcome(Board.fromstring(), 'x')
+
+        self.assertNotIn('reason', outcome)
+        self.assertIsNone(outcome.get('details'))
+
+        with self.assertRaises(KeyError):
+            outcome['reason']
+
+    def test_it_can_be_encoded_as_json_like_the_dict(self):
+        outcome = arbiter.outcome(Board.fromstring('xxxoo'), 'o')
+        expected = {
+            'status': 'gameover',
+            'reason': 'loser',
+            'details': [
+                { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] }
+            ],
+            'piece_counts': { 'xs': 3, 'os': 2, 'es': 4 }
+        }
+
+        self.assertIs(type(outcome.asdict()['details'][0]), dict)
+        self.assertIs(type(outcome.asdict()['piece_counts']), dict)
+        self.assertEqual(json.dumps(outcome.asdict()), json.dumps(expected))
+        self.assertEqual(json.dumps(arbiter.outcome(Board.fromstring(), 'x').asdict()),
+            json.dumps({ 'status': 'in-progress', 'piece_counts': { 'xs': 0, 'os': 0, 'es': 9 } }))
+
+    def test_winning_line_is_still_importable_from_the_arbiter(self):
+        from xo.arbiter import WinningLine
+        from xo.board import WinningLine as BoardWinningLine
+
+        self.assertIs(WinningLine, BoardWinningLine)
+
+    def test_it_can_be_pickled(self):
+        outcome = arbiter.outcome(Board.fromstring('xxxoo'), 'o')
+
+        self.assertEqual(pickle.loads(pickle.dumps(outcome)), outcome)
+
+
+class LinesCompletedByTestCase(unittest.TestCase):
+    def test_when_no_line_is_completed(self):
+        self.assertEqual(arbiter.lines_completed_by(Board.fromstring('xx.oo'), 1, 2), ())
+
+    def test_when_the_position_is_empty(self):
+        self.assertEqual(arbiter.lines_completed_by(Board.fromstring('xx.oo'), 1, 3), ())
+
+    def test_it_only_considers_lines_through_the_position(self):
+        board = Board.fromstring('xxxo.o.o.')
+
+        self.assertEqual(arbiter.lines_completed_by(board, 1, 1), (
+            { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] },
+        ))
+        self.assertEqual(arbiter.lines_completed_by(board, 2, 1), ())
+
+
+class LargerBoardTestCase(unittest.TestCase):
+    def test_when_x_wins_on_a_4x4_board(self):
+        board = Board.fromstring('xo..ox..o.x....x', geometry(4, 4, 4))
+        outcome = arbiter.outcome(board, 'x')
+
+        self.assertEqual(outcome['status'], arbiter.STATUS_GAMEOVER)
+        self.assertEqual(outcome['reason'], arbiter.REASON_WINNER)
+        self.assertEqual(outcome['details'], [{
+            'where': 'diagonal',
+            'index': 1,
+            'positions': [(1, 1), (2, 2), (3, 3), (4, 4)]
+        }])
+
+    def test_when_in_progress_on_a_4x4_board(self):
+        board = Board.fromstring('xo..ox..o.x.....', geometry(4, 4, 4))
+
+        self.assertEqual(arbiter.outcome(board, 'o')['status'], arbiter.STATUS_IN_PROGRESS)
+
+    def test_gomoku(self):
+        g = geometry(15, 15, 5)
+        board = Board.fromstring('', g)
+
+        for c in range(3, 8):
+            board[8, c] = 'o'
+        for r in range(1, 5):
+            board[r, 1] = 'x'
+
+        outcome = arbiter.outcome(board, 'x')
+
+        self.assertEqual(outcome.status, arbiter.STATUS_GAMEOVER)
+        self.assertEqual(outcome.reason, arbiter.REASON_LOSER)
+        self.assertEqual(outcome.details[0].where, 'row')
+        self.assertEqual(outcome.details[0].index, 8)
+        self.assertEqual(outcome.piece_counts, { 'xs': 4, 'os': 5, 'es': 216 })
+
+        self.assertEqual(arbiter.lines_completed_by(board, 8, 5), outcome.details)
+        self.assertEqual(arbiter.lines_completed_by(board, 1, 1), ())
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class OutcomeBatchTestCase(unittest.TestCase):
+    def assertSameOutcomes(self, batch, boards, token):
+        for i, board in enumerate(boards):
+            outcome = arbiter.outcome(board, token)
+
+            self.assertEqual(
+                (arbiter.STATUSES[batch.status[i]], arbiter.REASONS[batch.reason[i]],
+                 batch.xs[i], batch.os[i], batch.es[i]),
+                (outcome.status, outcome.reason, outcome.piece_counts.xs,
+                 outcome.piece_counts.os, outcome.piece_counts.es),
+                msg='{} for {}'.format(board, token)
+            )
+
+    def test_it_agrees_with_outcome_on_every_board(self):
+        layouts = [''.join(cells) for cells in itertools.product('xo.', repeat=9)]
+        cells = np.frombuffer(''.join(layouts).encode('ascii'), dtype=np.int8).reshape(-1, 9)
+        boards = [Board.fromstring(layout) for layout in layouts]
+
+        for token in ['x', 'o']:
+            with self.subTest(token=token):
+                self.assertSameOutcomes(arbiter.outcome_batch(cells, token), boards, token)
+
+    def test_it_accepts_bitboards(self):
+        boards = [Board.fromstring(layout) for layout in ['', 'xxxoo', 'xo xo xo', 'xoxxoooxx', 'xx']]
+        xmasks = np.array([board.xmask for board in boards], dtype=np.uint16)
+        omasks = np.array([board.omask for board in boards], dtype=np.uint16)
+
+        self.assertSameOutcomes(arbiter.outcome_batch((xmasks, omasks), 'o'), boards, 'o')
+
+    def test_it_works_across_blocks_and_on_larger_boards(self):
+        g = geometry(4, 5, 3)
+        rng = random.Random(0)
+        boards = [
+            Board.fromstring(''.join(rng.choice('xo.....') for _ in range(g.ncells)), g)
+            for _ in range(300)
+        ]
+        cells = np.array([[ord(c) for c in str(board)] for board in boards], dtype=np.uint8)
+
+        block_size = arbiter._batch_block_size
+        arbiter._batch_block_size = 64
+        try:
+            batch = arbiter.outcome_batch(cells, 'x', g)
+        finally:
+            arbiter._batch_block_size = block_size
+
+        self.assertSameOutcomes(batch, boards, 'x')
+
+    def test_when_given_bad_arguments(self):
+        with self.assertRaisesRegex(ValueError, 'must be a token: .'):
+            arbiter.outcome_batch(np.zeros((1, 9), dtype=np.int8), '.')
+
+        with self.assertRaisesRegex(ValueError, r'boards must be an array of shape \(N, 9\): \(2, 8\)'):
+            arbiter.outcome_batch(np.zeros((2, 8), dtype=np.int8), 'x')
+
+        with self.assertRaisesRegex(ValueError, 'masks must be one-dimensional arrays of the same length'):
+            arbiter.outcome_batch((np.zeros(2, dtype=np.int64), np.zeros(3, dtype=np.int64)), 'x')
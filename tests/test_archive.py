@@ -0,0 +1,149 @@
+import io
+import random
+import unittest
+
+import xo.game as game
+
+from xo.archive import ArchiveReader, ArchiveWriter
+from xo.board import geometry
+from xo.game import Game
+
+
+def play(g, rng, ngames):
+    """Plays random games and returns the events of their moves."""
+    events = []
+    g.start('x')
+
+    while ngames:
+        positions = [(r, c) for r, c, piece in g.board if piece not in 'xo']
+        event = g.moveto(*rng.choice(positions))
+        events.append(event)
+
+        if event.name == game.EVENT_NAME_GAMEOVER:
+            ngames -= 1
+
+            if ngames:
+                g.restart()
+
+    g.close()
+    return events
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def test_a_game_is_recorded_once_it_is_final(self):
+        stream = io.BytesIO()
+        g = Game(recorder=ArchiveWriter(stream))
+        g.start('o')
+
+        for r, c in [(1, 1), (2, 1), (1, 2), (2, 2), (1, 3)]:
+            g.moveto(r, c)
+
+        g.restart()
+
+        for r, c in [(1, 1), (2, 2), (3, 3), (2, 3), (2, 1), (3, 1), (1, 3), (1, 2), (3, 2)]:
+            g.moveto(r, c)
+
+        self.assertEqual(len(list(ArchiveReader(io.BytesIO(stream.getvalue())).games())), 1)
+
+        g.close()
+        reader = ArchiveReader(io.BytesIO(stream.getvalue()))
+
+        self.assertEqual(list(reader.games()), [
+            ('o', [0, 3, 1, 4, 2]),
+            ('o', [0, 4, 8, 5, 3, 6, 2, 1, 7])
+        ])
+
+    def test_a_move_takes_4_bits_on_the_standard_board(self):
+        stream = io.BytesIO()
+        ArchiveWriter(stream).record('x', [0, 4, 8, 5, 3, 6, 2, 1, 7])
+
+        self.assertEqual(len(stream.getvalue()), 8 + 1 + 5)
+
+    def test_the_events_and_outcomes_are_recovered(self):
+        rng = random.Random(0)
+
+        for g in [geometry(), geometry(4, 4, 3), geometry(7, 7, 4), geometry(15, 15, 5)]:
+            stream = io.BytesIO()
+            events = play(Game(g, ArchiveWriter(stream, g)), rng, 20)
+
+            with self.subTest(geometry=(g.nrows, g.ncols, g.k)):
+                reader = ArchiveReader(io.BytesIO(stream.getvalue()))
+                self.assertEqual(reader.geometry, g)
+                self.assertEqual(list(reader.events()), events)
+
+                reader = ArchiveReader(io.BytesIO(stream.getvalue()))
+                self.assertEqual(list(reader.outcomes()),
+                    [event for event in events if event.name == game.EVENT_NAME_GAMEOVER])
+
+    def test_records_may_span_blocks(self):
+        g = geometry(15, 15, 5)
+        stream = io.BytesIO()
+        events = play(Game(g, ArchiveWriter(stream, g)), random.Random(1), 5)
+
+        reader = ArchiveReader(io.BytesIO(stream.getvalue()), block_size=3)
+
+        self.assertEqual(list(reader.events()), events)
+
+    def test_moves_that_are_undone_are_not_recorded(self):
+        stream = io.BytesIO()
+        g = Game(recorder=ArchiveWriter(stream))
+        g.start('x')
+
+        for r, c in [(1, 1), (2, 1), (1, 2), (2, 2), (1, 3)]:
+            g.moveto(r, c)
+
+        g.undo()
+        g.redo()
+        g.undo()
+        g.moveto(3, 3)
+        g.close()
+
+        self.assertEqual(list(ArchiveReader(io.BytesIO(stream.getvalue())).games()), [])
+        self.assertEqual(g.statistics['total'], 0)
+
+        stream = io.BytesIO()
+        g = Game(recorder=ArchiveWriter(stream))
+        g.start('x')
+
+        for r, c in [(1, 1), (2, 1), (1, 2), (2, 2), (1, 3)]:
+            g.moveto(r, c)
+
+        g.undo()
+        g.moveto(3, 3)
+        g.moveto(2, 3)
+        g.restart()
+        g.close()
+
+        self.assertEqual(list(ArchiveReader(io.BytesIO(stream.getvalue())).games()), [
+            ('x', [0, 3, 1, 4, 8, 5])
+        ])
+        self.assertEqual(g.statistics, { 'total': 1, 'xwins': 0, 'owins': 1, 'squashed': 0 })
+
+    def test_forks_are_not_recorded(self):
+        stream = io.BytesIO()
+        g = Game(recorder=ArchiveWriter(stream))
+        g.start('x')
+        g.moveto(1, 1)
+
+        fork = g.fork()
+
+        for r, c in [(2, 1), (1, 2), (2, 2), (1, 3)]:
+            fork.moveto(r, c)
+
+        fork.restart()
+        fork.close()
+
+        self.assertEqual(list(ArchiveReader(io.BytesIO(stream.getvalue())).games()), [])
+
+    def test_when_the_archive_is_truncated(self):
+        stream = io.BytesIO()
+        ArchiveWriter(stream).record('x', [0, 4, 8, 5, 3, 6, 2, 1, 7])
+
+        reader = ArchiveReader(io.BytesIO(stream.getvalue()[:-1]))
+
+        with self.assertRaisesRegex(ValueError, 'game archive is truncated'):
+            list(reader.games())
+
+    def test_when_it_is_not_an_archive(self):
+        with self.assertRaisesRegex(ValueError, 'not a game archive'):
+            ArchiveReader(io.BytesIO(b'XOSD\x01\x03\x03\x01'))
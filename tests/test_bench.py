@@ -0,0 +1,71 @@
+import json
+import unittest
+
+from xo import bench
+
+
+class SelectTestCase(unittest.TestCase):
+    def test_it_selects_everything_by_default(self):
+        self.assertEqual(bench.select(), bench.names())
+
+    def test_it_selects_by_substring_or_glob(self):
+        self.assertEqual(bench.select(['board.']), ['board.fromstring', 'board.getitem', 'board.iter'])
+        self.assertEqual(bench.select(['ai.*.empty.*']),
+            ['ai.evaluate.empty.cached', 'ai.evaluate.empty.uncached'])
+
+
+class SummarizeTestCase(unittest.TestCase):
+    def test_it_computes_the_median_and_the_95th_percentile(self):
+        summary = bench.summarize([float(n) for n in range(20, 0, -1)], number=10)
+
+        self.assertEqual(summary['median'], 10.5)
+        self.assertEqual(summary['p95'], 19.0)
+        self.assertEqual(summary['min'], 1.0)
+        self.assertEqual(summary['samples'], 20)
+        self.assertEqual(summary['number'], 10)
+
+
+class RunTestCase(unittest.TestCase):
+    def test_it_runs_the_selected_benchmarks(self):
+        results = bench.run(['board.getitem', 'game.selfplay'], repeat=2, warmup=1, min_time=0)
+
+        self.assertEqual(list(results), ['board.getitem', 'game.selfplay'])
+        self.assertEqual(results['board.getitem']['samples'], 2)
+        self.assertGreater(results['game.selfplay']['median'], 0)
+
+    def test_when_repeat_is_not_positive(self):
+        with self.assertRaisesRegex(ValueError, 'repeat must be positive: 0'):
+            bench.run(['board.getitem'], repeat=0)
+
+
+class MemoryTestCase(unittest.TestCase):
+    def test_a_game_table_takes_less_memory_than_games(self):
+        memory = bench.run_memory(number=100)
+
+        self.assertEqual(list(memory), ['game.Game', 'table.GameTable'])
+        self.assertLess(memory['table.GameTable'], memory['game.Game'])
+
+    def test_the_results_are_saved_with_the_timings(self):
+        data = bench.tojson({}, { 'table.GameTable': 18.0 })
+
+        self.assertEqual(data['memory'], { 'table.GameTable': 18.0 })
+
+
+class CompareTestCase(unittest.TestCase):
+    def test_it_flags_regressions(self):
+        baseline = { 'a': { 'median': 1.0 }, 'b': { 'median': 1.0 }, 'c': { 'median': 1.0 } }
+        results = { 'a': { 'median': 1.0625 }, 'b': { 'median': 1.5 }, 'd': { 'median': 1.0 } }
+
+        self.assertEqual(bench.compare(baseline, results, threshold=0.1), [
+            ('a', 1.0, 1.0625, 0.0625, False),
+            ('b', 1.0, 1.5, 0.5, True)
+        ])
+
+    def test_saved_results_can_be_used_as_a_baseline(self):
+        results = bench.run(['board.getitem'], repeat=1, warmup=0, min_time=0)
+        data = json.loads(json.dumps(bench.tojson(results)))
+
+        self.assertEqual(bench.fromjson(data), json.loads(json.dumps(results)))
+
+        with self.assertRaisesRegex(ValueError, 'unsupported benchmark results version: 2'):
+            bench.fromjson(dict(data, version=2))
@@ -1,6 +1,16 @@
+import mmap
+import tempfile
 import unittest
 
-from xo.board import Board
+from xo.board import (
+    Board, BoardRecords, default_geometry, geometry, parse_geometry,
+    inverse_symmetry, symmetries, transform_mask, transform_position
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class BoardCreationTestCase(unittest.TestCase):
@@ -89,3 +99,239 @@ class BoardToASCIITestCase(unittest.TestCase):
             '---+---+---\n'
             '   |   |   '
         )
+
+
+class BoardMasksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = Board.fromstring('x.o.o.x.x')
+
+    def test_it_stores_one_bit_per_piece_in_row_major_order(self):
+        self.assertEqual(self.board.xmask, 0b101000001)
+        self.assertEqual(self.board.omask, 0b000010100)
+        self.assertEqual(self.board.emptymask, 0b010101010)
+
+    def test_mask_of_a_token(self):
+        self.assertEqual(self.board.mask('x'), self.board.xmask)
+        self.assertEqual(self.board.mask('o'), self.board.omask)
+
+        with self.assertRaisesRegex(ValueError, 'must be a token: .'):
+            self.board.mask('.')
+
+    def test_setitem_updates_the_masks(self):
+        self.board[1, 1] = 'o'
+        self.board[3, 3] = ' '
+
+        self.assertEqual(self.board.xmask, 0b001000000)
+        self.assertEqual(self.board.omask, 0b000010101)
+
+    def test_frommasks(self):
+        self.assertEqual(str(Board.frommasks(0b101000001, 0b000010100)), 'x.o.o.x.x')
+
+    def test_frommasks_when_masks_overlap(self):
+        with self.assertRaisesRegex(ValueError, 'masks overlap: 1, 3'):
+            Board.frommasks(1, 3)
+
+    def test_frommasks_when_mask_is_out_of_bounds(self):
+        with self.assertRaisesRegex(ValueError, 'mask out of bounds: 512, 0'):
+            Board.frommasks(512, 0)
+
+    def test_copy_is_independent(self):
+        copy = self.board.copy()
+        copy[1, 2] = 'x'
+
+        self.assertEqual(str(self.board), 'x.o.o.x.x')
+        self.assertEqual(str(copy), 'xxo.o.x.x')
+
+
+class BoardSymmetryTestCase(unittest.TestCase):
+    def test_there_are_eight_symmetries(self):
+        self.assertEqual(len(symmetries), 8)
+        self.assertEqual(len(set(symmetries)), 8)
+
+    def test_symmetric_boards_have_the_same_canonical_form(self):
+        for layouts in [
+            ['x........', '..x......', '......x..', '........x'],
+            ['.x.......', '...x.....', '.....x...', '.......x.'],
+            ['xo.......', 'x..o.....', '.ox......', '..x..o...']
+        ]:
+            canonical = set(str(Board.fromstring(layout).canonical()[0]) for layout in layouts)
+            self.assertEqual(len(canonical), 1)
+
+    def test_the_symmetry_maps_the_board_onto_its_canonical_form(self):
+        board = Board.fromstring('.o...x..x')
+        canonical, t = board.canonical()
+
+        self.assertEqual(transform_mask(board.xmask, t), canonical.xmask)
+        self.assertEqual(transform_mask(board.omask, t), canonical.omask)
+
+        u = inverse_symmetry(t)
+        self.assertEqual(transform_mask(canonical.xmask, u), board.xmask)
+        self.assertEqual(transform_mask(canonical.omask, u), board.omask)
+
+    def test_transform_position(self):
+        board = Board.fromstring('.o...x..x')
+
+        for t in range(len(symmetries)):
+            image = Board(transform_mask(board.xmask, t), transform_mask(board.omask, t))
+
+            for r, c, piece in board:
+                self.assertEqual(image[transform_position((r, c), t)], piece)
+
+
+class GeometryTestCase(unittest.TestCase):
+    def test_the_default_geometry(self):
+        self.assertIs(geometry(), default_geometry)
+        self.assertIs(geometry(3, 3, 3), default_geometry)
+        self.assertIs(Board.fromstring().geometry, default_geometry)
+
+    def test_the_winning_lines_of_the_default_geometry(self):
+        self.assertEqual(default_geometry.lines, [
+            { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] },
+            { 'where': 'row', 'index': 2, 'positions': [(2, 1), (2, 2), (2, 3)] },
+            { 'where': 'row', 'index': 3, 'positions': [(3, 1), (3, 2), (3, 3)] },
+            { 'where': 'column', 'index': 1, 'positions': [(1, 1), (2, 1), (3, 1)] },
+            { 'where': 'column', 'index': 2, 'positions': [(1, 2), (2, 2), (3, 2)] },
+            { 'where': 'column', 'index': 3, 'positions': [(1, 3), (2, 3), (3, 3)] },
+            { 'where': 'diagonal', 'index': 1, 'positions': [(1, 1), (2, 2), (3, 3)] },
+            { 'where': 'diagonal', 'index': 2, 'positions': [(1, 3), (2, 2), (3, 1)] }
+        ])
+
+    def test_the_winning_lines_of_a_larger_geometry(self):
+        g = geometry(4, 5, 3)
+
+        self.assertEqual(len(g.lines), 4 * 3 + 5 * 2 + 2 * 2 * 3)
+        self.assertEqual(g.lines[0].positions, ((1, 1), (1, 2), (1, 3)))
+        self.assertEqual(g.lines[1].positions, ((1, 2), (1, 3), (1, 4)))
+        self.assertEqual(len(g.lines_through[g.index(2, 3)]), 3 + 2 + 2 + 2)
+
+    def test_gomoku(self):
+        g = geometry(15, 15, 5)
+
+        self.assertEqual(len(g.lines), 2 * 15 * 11 + 2 * 11 * 11)
+        self.assertEqual(len(g.lines_through[g.index(8, 8)]), 4 * 5)
+        self.assertEqual(len(g.lines_through[g.index(1, 1)]), 3)
+
+    def test_geometries_are_shared(self):
+        self.assertIs(geometry(4, 4, 3), geometry(4, 4, 3))
+        self.assertIsNot(geometry(4, 4, 3), geometry(4, 4, 4))
+        self.assertIs(geometry(4, 4), geometry(4, 4, 4))
+
+    def test_when_the_win_length_does_not_fit(self):
+        with self.assertRaisesRegex(ValueError, 'win length does not fit on a 3x4 board: 5'):
+            geometry(3, 4, 5)
+
+    def test_parse_geometry(self):
+        self.assertIs(parse_geometry('3x4'), geometry(3, 4))
+        self.assertIs(parse_geometry('15X15x5'), geometry(15, 15, 5))
+
+        with self.assertRaisesRegex(ValueError, 'geometry must be RxC or RxCxK: 3'):
+            parse_geometry('3')
+
+    def test_symmetries(self):
+        self.assertEqual(len(geometry(4, 4).symmetries), 8)
+        self.assertEqual(len(geometry(3, 4).symmetries), 4)
+
+    def test_symmetries_of_a_large_geometry(self):
+        g = geometry(6, 6, 4)
+        board = Board.fromstring('x' + '.' * 20 + 'o', g)
+
+        canonical, t = board.canonical()
+        u = g.symmetries.inverses[t]
+
+        self.assertEqual(g.symmetries.transform(canonical.xmask, u), board.xmask)
+        self.assertEqual(g.symmetries.transform(canonical.omask, u), board.omask)
+
+
+class LargerBoardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = Board.fromstring('x...o......x', geometry(3, 4, 3))
+
+    def test_str(self):
+        self.assertEqual(str(self.board), 'x...o......x')
+
+    def test_getitem(self):
+        self.assertEqual(self.board[1, 1], 'x')
+        self.assertEqual(self.board[2, 1], 'o')
+        self.assertEqual(self.board[3, 4], 'x')
+
+        with self.assertRaisesRegex(IndexError, 'position out of bounds: 4, 1'):
+            self.board[4, 1]
+
+    def test_contains(self):
+        self.assertTrue(self.board.contains(1, 4))
+        self.assertFalse(Board.contains(1, 4))
+
+    def test_toascii(self):
+        self.assertEqual(
+            self.board.toascii(),
+            ' x |   |   |   \n'
+            '---+---+---+---\n'
+            ' o |   |   |   \n'
+            '---+---+---+---\n'
+            '   |   |   | x '
+        )
+
+
+class BoardRecordsTestCase(unittest.TestCase):
+    def test_it_decodes_each_record(self):
+        records = BoardRecords(b'xo.xo.x..' b'.........' b'ooxx  o x')
+
+        self.assertEqual(len(records), 3)
+        self.assertEqual([str(board) for board in records], ['xo.xo.x..', '.........', 'ooxx..o.x'])
+        self.assertEqual(str(records[-1]), 'ooxx..o.x')
+        self.assertEqual(list(records.masks()), [(board.xmask, board.omask) for board in records])
+
+        with self.assertRaisesRegex(IndexError, 'record index out of range: 3'):
+            records[3]
+
+    def test_it_reads_records_that_are_separated(self):
+        records = BoardRecords(bytearray(b'xo.xo.x..\n.........\nx........'), stride=10)
+
+        self.assertEqual([str(board) for board in records], ['xo.xo.x..', '.........', 'x........'])
+
+    def test_slices_share_the_buffer(self):
+        buffer = bytearray(b'x........' b'.x.......' b'..x......' b'...x.....')
+        records = BoardRecords(buffer)[1:3]
+
+        buffer[9:18] = b'.o.......'
+
+        self.assertIsInstance(records, BoardRecords)
+        self.assertEqual([str(board) for board in records], ['.o.......', '..x......'])
+        self.assertEqual([str(board) for board in BoardRecords(buffer)[::2]], ['x........', '..x......'])
+
+    def test_it_reads_a_memory_mapped_file(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'xo.xo.x..\n' * 100)
+            f.flush()
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with BoardRecords(mm, stride=10) as records:
+                    self.assertEqual(len(records), 100)
+                    self.assertEqual(str(records[99]), 'xo.xo.x..')
+
+    def test_it_works_on_larger_boards(self):
+        g = geometry(3, 4, 3)
+        records = BoardRecords(b'xo.xo.x..ooo' b'x...........', g)
+
+        self.assertEqual(records[0].geometry, g)
+        self.assertEqual([str(board) for board in records], ['xo.xo.x..ooo', 'x...........'])
+
+    def test_when_the_buffer_is_not_a_whole_number_of_records(self):
+        with self.assertRaisesRegex(ValueError, 'buffer is not a whole number of records: 10 bytes'):
+            BoardRecords(b'xo.xo.x...')
+
+        with self.assertRaisesRegex(ValueError, 'stride is shorter than a board: 8'):
+            BoardRecords(b'', stride=8)
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_toarray_is_a_view_of_the_cells(self):
+        buffer = bytearray(b'xo.xo.x..\n.........\nx........')
+        cells = BoardRecords(buffer, stride=10).toarray()
+
+        self.assertEqual(cells.shape, (3, 9))
+        self.assertEqual(cells[2].tobytes(), b'x........')
+
+        buffer[20] = ord('o')
+
+        self.assertEqual(cells[2].tobytes(), b'o........')
+        self.assertFalse(cells.flags.writeable)
@@ -0,0 +1,145 @@
+import os
+import random
+import tempfile
+import unittest
+
+import xo.ai as ai
+
+from xo import arbiter, book, openings
+from xo.board import Board, each_bit, geometry
+
+
+class OpeningBookTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.geometry = geometry(3, 4, 3)
+        cls.path = os.path.join(cls.directory.name, book.filename(cls.geometry))
+
+        book.write(cls.path, cls.geometry, 2, openings.build(cls.geometry, 2), ai.SCORING_VERSION)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        # The book is compared against the search, not against the book that
+        # comes with xo.
+        ai.use_opening_book(None, self.geometry)
+
+    def tearDown(self):
+        del ai._opening_books[self.geometry]
+
+    def test_it_agrees_with_the_engine(self):
+        opening_book = book.OpeningBook(self.path, ai.SCORING_VERSION)
+        count = 0
+
+        for board, token in _positions(self.geometry, 2):
+            score, depth, moves = opening_book.lookup(board.xmask, board.omask, token)
+            expected = ai.evaluate(board, token)
+
+            with self.subTest(board=str(board), token=token):
+                self.assertEqual((score, depth), (expected.score, expected.depth))
+                self.assertEqual(sorted(each_bit(moves)),
+                    sorted(self.geometry.index(r, c) for r, c in expected.positions))
+
+            count += 1
+
+        self.assertGreater(count, len(opening_book))
+        self.assertIsNone(opening_book.lookup(0b111, 0b111000, 'x'))
+
+    def test_it_is_generated_the_same_every_time(self):
+        path = os.path.join(self.directory.name, 'again.bin')
+        book.write(path, self.geometry, 2, openings.build(self.geometry, 2), ai.SCORING_VERSION)
+
+        with open(self.path, 'rb') as f, open(path, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_evaluate_answers_from_it(self):
+        board = Board.fromstring('.x..o', self.geometry)
+        expected = ai.evaluate(board, 'x', use_cache=False)
+
+        ai.use_opening_book(book.OpeningBook(self.path, ai.SCORING_VERSION))
+
+        with ai.instrument() as stats:
+            self.assertEqual(ai.evaluate(board, 'x'), expected)
+
+        self.assertEqual(stats.book_hits, 1)
+        self.assertEqual(stats.total_nodes, 0)
+
+        ai.use_opening_book(None, self.geometry)
+
+        with ai.instrument() as stats:
+            self.assertEqual(ai.evaluate(board, 'x'), expected)
+
+        self.assertEqual(stats.book_hits, 0)
+
+    def test_when_the_scoring_has_changed(self):
+        with self.assertRaisesRegex(ValueError, 'opening book is out of date'):
+            book.OpeningBook(self.path, ai.SCORING_VERSION + 1)
+
+    def test_when_it_is_not_a_book(self):
+        path = os.path.join(self.directory.name, 'solutions.bin')
+
+        with open(self.path, 'rb') as f, open(path, 'wb') as g:
+            g.write(b'XOSD' + f.read()[4:])
+
+        with self.assertRaisesRegex(ValueError, 'not an opening book'):
+            book.OpeningBook(path, ai.SCORING_VERSION)
+
+
+class ShippedBooksTestCase(unittest.TestCase):
+    geometries = [geometry(3, 4, 3), geometry(4, 3, 3)]
+
+    def setUp(self):
+        for g in self.geometries:
+            ai.use_opening_book(None, g)
+
+    def tearDown(self):
+        for g in self.geometries:
+            del ai._opening_books[g]
+
+    def test_they_agree_with_the_engine(self):
+        rng = random.Random(0)
+
+        for g in self.geometries:
+            opening_book = book.load(g, ai.SCORING_VERSION)
+
+            self.assertIsNotNone(opening_book)
+            self.assertEqual(opening_book.ply, openings.DEFAULT_PLY)
+
+            positions = list(_positions(g, opening_book.ply))
+
+            for board, token in rng.sample(positions, 50):
+                score, depth, moves = opening_book.lookup(board.xmask, board.omask, token)
+                expected = ai.evaluate(board, token)
+
+                with self.subTest(board=str(board), token=token):
+                    self.assertEqual((score, depth), (expected.score, expected.depth))
+                    self.assertEqual(sorted(each_bit(moves)),
+                        sorted(g.index(r, c) for r, c in expected.positions))
+
+
+def _positions(geometry, ply):
+    """Every position, in every orientation, that can be evaluated and that
+    has at most ply pieces.
+    """
+    boards = {(0, 0)}
+
+    for n in range(ply + 1):
+        children = set()
+
+        for xmask, omask in sorted(boards):
+            board = Board(xmask, omask, geometry)
+
+            for token in ['x', 'o']:
+                if arbiter.can_move(board, token):
+                    yield board, token
+
+                    for i in each_bit(board.emptymask):
+                        if token == 'x':
+                            children.add((xmask | 1 << i, omask))
+                        else:
+                            children.add((xmask, omask | 1 << i))
+
+        boards = children
@@ -0,0 +1,208 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from concurrent.futures import ProcessPoolExecutor
+
+import xo.ai as ai
+from xo.board import Board, default_geometry, geometry
+from xo.cache import PersistentCache
+
+
+class PersistentCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, scoring_version=1, **kwargs):
+        cache = PersistentCache(scoring_version, self.directory.name, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_it_returns_what_was_put(self):
+        cache = self.open()
+        board = Board.fromstring('x.o')
+
+        self.assertIsNone(cache.get(default_geometry, board.xmask, board.omask, 'x'))
+
+        cache.put(default_geometry, board.xmask, board.omask, 'x', (18, 5, 0b101001000))
+
+        self.assertEqual(cache.get(default_geometry, board.xmask, board.omask, 'x'), (18, 5, 0b101001000))
+        self.assertIsNone(cache.get(default_geometry, board.xmask, board.omask, 'o'))
+        self.assertEqual(len(cache), 1)
+
+    def test_symmetric_boards_share_an_entry(self):
+        cache = self.open()
+        board = Board.fromstring('x')
+        reflected = Board.fromstring('..x')
+
+        cache.put(default_geometry, board.xmask, board.omask, 'o', (-1, 8, 1 << 4))
+        cache.put(default_geometry, reflected.xmask, reflected.omask, 'o', (-1, 8, 1 << 4))
+
+        self.assertEqual(len(cache), 1)
+
+        board = Board.fromstring('.x')
+        cache.put(default_geometry, board.xmask, board.omask, 'o', (0, 9, 0b010010101))
+
+        board = Board.fromstring('...x')
+        self.assertEqual(cache.get(default_geometry, board.xmask, board.omask, 'o'), (0, 9, 0b001110001))
+
+    def test_it_outlives_the_connection(self):
+        self.open().put(default_geometry, 0, 0, 'x', (0, 9, 0b111111111))
+
+        self.assertEqual(self.open().get(default_geometry, 0, 0, 'x'), (0, 9, 0b111111111))
+
+    def test_results_for_another_scoring_are_dropped(self):
+        self.open(scoring_version=1).put(default_geometry, 0, 0, 'x', (0, 9, 0b111111111))
+
+        cache = self.open(scoring_version=2)
+
+        self.assertIsNone(cache.get(default_geometry, 0, 0, 'x'))
+        self.assertEqual(len(cache), 0)
+
+    def test_the_oldest_results_are_evicted(self):
+        cache = self.open(maxsize=3)
+        g = geometry(15, 15, 5)
+
+        # None of the boards are symmetric to each other.
+        for i in range(5):
+            cache.put(g, 1 << i, 0, 'o', (i, 1, 1 << 112))
+
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(g, 1 << 0, 0, 'o'))
+        self.assertIsNone(cache.get(g, 1 << 1, 0, 'o'))
+        self.assertEqual(cache.get(g, 1 << 4, 0, 'o'), (4, 1, 1 << 112))
+
+    def test_boards_of_any_size_can_be_stored(self):
+        cache = self.open()
+        g = geometry(15, 15, 5)
+
+        cache.put(g, 1 << 200, 1 << 3, 'x', (10, 20, 1 << 224))
+
+        self.assertEqual(cache.get(g, 1 << 200, 1 << 3, 'x'), (10, 20, 1 << 224))
+
+    def test_processes_can_share_it(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            counts = list(executor.map(_fill, [self.directory.name] * 4, range(4)))
+
+        boards = {
+            geometry(4, 4).symmetries.canonical(xmask, omask)[:2] for xmask, omask in _boards(range(4))
+        }
+
+        self.assertEqual(counts, [50] * 4)
+        self.assertEqual(len(self.open()), len(boards))
+
+
+def _boards(workers):
+    for n in workers:
+        for i in range(50):
+            yield i, 1 << (n + 12)
+
+
+# Symmetric boards written by different processes share an entry, so the moves
+# stored are the board's own pieces, which are the same whichever board wrote
+# them.
+def _fill(directory, n):
+    cache = PersistentCache(1, directory)
+
+    try:
+        for xmask, omask in _boards([n]):
+            cache.put(geometry(4, 4), xmask, omask, 'x', (1, 2, xmask | omask))
+
+        return sum(
+            cache.get(geometry(4, 4), xmask, omask, 'x') == (1, 2, xmask | omask)
+            for xmask, omask in _boards([n])
+        )
+    finally:
+        cache.close()
+
+
+def _connection_pid():
+    len(ai._persistent_cache)
+    return os.getpid(), ai._persistent_cache._pid
+
+
+class EvaluateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = ai._solutions()
+        ai.use_solutions(None)
+
+    def tearDown(self):
+        ai.use_persistent_cache(None)
+        ai.use_solutions(self.database)
+        self.directory.cleanup()
+
+    def test_evaluate_uses_it(self):
+        cache = ai.open_persistent_cache(self.directory.name)
+        # The board has too many pieces to be in the opening book.
+        board = Board.fromstring('x.o..x.o.x..', geometry(3, 4, 3))
+        expected = ai.evaluate(board, 'o', use_cache=False)
+
+        with ai.instrument() as stats:
+            self.assertEqual(ai.evaluate(board, 'o'), expected)
+
+        self.assertEqual(stats.persistent_hits, 0)
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(os.path.exists(cache.path))
+
+        cache.close()
+        ai.transposition_table.clear()
+        ai.open_persistent_cache(self.directory.name)
+
+        with ai.instrument() as stats:
+            self.assertEqual(ai.evaluate(board, 'o'), expected)
+
+        self.assertEqual(stats.persistent_hits, 1)
+        self.assertEqual(stats.total_nodes, 0)
+
+        # Another engine is always run.
+        with ai.instrument() as stats:
+            self.assertEqual(ai.evaluate(board, 'o', engine=ai.ENGINE_ALPHABETA), expected)
+
+        self.assertEqual(stats.persistent_hits, 0)
+        self.assertGreater(stats.total_nodes, 0)
+
+    def test_it_is_used_by_evaluate_many_in_processes(self):
+        cache = ai.open_persistent_cache(self.directory.name)
+        g = geometry(3, 4, 3)
+        # The boards have too many pieces to be in the opening book.
+        positions = [
+            (Board.fromstring(layout, g), 'x')
+            for layout in ['xo.xo.o.x...', 'x.o.ox.ox...', 'oxx.o...xo..', '.x.ox.o.x.o.']
+        ]
+
+        self.assertEqual(len(cache), 0)
+
+        results = list(ai.evaluate_many(positions, jobs=2, chunksize=1))
+
+        self.assertEqual(results, [ai.evaluate(board, token, use_cache=False) for board, token in positions])
+        self.assertEqual(len(cache), len(positions))
+
+        ai.transposition_table.clear()
+
+        with ai.instrument() as stats:
+            self.assertEqual([ai.evaluate(board, token) for board, token in positions], results)
+
+        self.assertEqual(stats.persistent_hits, len(positions))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_a_forked_process_does_not_use_the_parents_connection(self):
+        ai.open_persistent_cache(self.directory.name)
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as executor:
+            pid, connection_pid = executor.submit(_connection_pid).result()
+
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual(connection_pid, pid)
+
+    def test_it_is_not_used_without_the_cache(self):
+        cache = ai.open_persistent_cache(self.directory.name)
+
+        ai.evaluate(Board.fromstring('x'), 'o', use_cache=False)
+        ai.evaluate(Board.fromstring('.x'), 'o', engine=ai.ENGINE_ALPHABETA, all_positions=False)
+
+        self.assertEqual(len(cache), 0)
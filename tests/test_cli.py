@@ -0,0 +1,59 @@
+import io
+import unittest
+
+from contextlib import redirect_stderr
+from unittest import mock
+
+from xo import ai, cli, mcts
+
+
+class HeadlessSelfPlayTestCase(unittest.TestCase):
+    def test_perfect_players_always_squash(self):
+        self.assertEqual(cli._play_rounds('x', 20, 1), b'.' * 20)
+
+    def test_the_computer_players_can_use_another_engine(self):
+        with mock.patch.object(mcts, 'search', wraps=mcts.search) as search:
+            results = cli._play_rounds('x', 2, 1, 'mcts')
+
+        self.assertEqual(len(results), 2)
+        self.assertGreaterEqual(search.call_count, 2 * 5)
+
+    def test_when_the_number_of_jobs_is_negative(self):
+        with redirect_stderr(io.StringIO()) as error, self.assertRaises(SystemExit):
+            cli.main(['-x', 'computer', '-j', '-5'])
+
+        self.assertIn('jobs must be non-negative: -5', error.getvalue())
+
+        with self.assertRaisesRegex(ValueError, 'jobs must be non-negative: -5'):
+            cli.Orchestrator(cli.Player('x', False), cli.Player('o', False)).start(jobs=-5)
+
+    def test_every_engine_of_the_ai_can_be_used(self):
+        for engine in ai.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(cli.Orchestrator(engine=engine)._engine, engine)
+
+    def test_when_the_engine_is_unknown(self):
+        with self.assertRaisesRegex(ValueError, 'unknown engine: random'):
+            cli.Orchestrator(engine='random')
+
+    def test_the_results_are_merged_into_the_statistics(self):
+        statistics = { 'total': 1, 'xwins': 0, 'owins': 1, 'squashed': 0 }
+
+        cli._merge_results(statistics, b'x..o.')
+
+        self.assertEqual(statistics, { 'total': 6, 'xwins': 1, 'owins': 2, 'squashed': 3 })
+
+    def test_the_rounds_are_split_between_processes(self):
+        output = io.StringIO()
+        orchestrator = cli.Orchestrator(
+            cli.Player('x', False),
+            cli.Player('o', False),
+            cli.Console(io.StringIO(), output)
+        )
+
+        orchestrator.start(rounds=25, jobs=2, seed=7)
+
+        self.assertTrue(output.getvalue().startswith('.' * 25 + '\n'))
+        self.assertIn('Total games played: 25 (', output.getvalue())
+        self.assertEqual(orchestrator._game.statistics,
+            { 'total': 25, 'xwins': 0, 'owins': 0, 'squashed': 25 })
@@ -0,0 +1,109 @@
+import io
+import json
+import sys
+import unittest
+
+from contextlib import redirect_stdout
+from unittest import mock
+
+import xo.ai as ai
+
+from xo import cli, evaluate
+from xo.board import Board, geometry
+
+
+class EvaluateLinesTestCase(unittest.TestCase):
+    def test_it_evaluates_boards_and_tokens(self):
+        result, = evaluate.evaluate_lines(['x...o.... x\n'])
+        expected = ai.evaluate(Board.fromstring('x...o....'), 'x')
+
+        self.assertEqual(result['score'], expected.score)
+        self.assertEqual(result['depth'], expected.depth)
+        self.assertEqual(result['positions'], [list(position) for position in expected.positions])
+        self.assertEqual(result['outcome'],
+            { 'status': 'in-progress', 'piece_counts': { 'xs': 1, 'os': 1, 'es': 7 } })
+
+    def test_it_keeps_the_keys_of_json_lines(self):
+        result, = evaluate.evaluate_lines(['{"id": 7, "board": "xx..oo...", "token": "x"}'])
+
+        self.assertEqual(result['id'], 7)
+        self.assertEqual(result['positions'], [[1, 3]])
+
+    def test_the_results_are_in_the_same_order_as_the_lines(self):
+        lines = [
+            'x........ o',
+            'xxxoo.... o',
+            '',
+            'nonsense',
+            '......... x',
+            'xx....... x',
+            '{"board": "x", "token": "o"}',
+            '{"board": "x........", "token": "z"}',
+            '..x...... o'
+        ]
+
+        results = list(evaluate.evaluate_lines(lines, chunksize=2))
+
+        self.assertEqual([result.get('board') for result in results], [
+            'x........', 'xxxoo....', None, '.........', 'xx.......', 'x', 'x........', '..x......'
+        ])
+        self.assertEqual([result.get('error') for result in results], [
+            None,
+            'no available moves',
+            'expected a board and a token: nonsense',
+            None,
+            'invalid board',
+            'board must have 9 cells: x',
+            'must be a token: z',
+            None
+        ])
+        self.assertEqual(results[2]['line'], 4)
+        self.assertEqual(results[1]['outcome']['reason'], 'loser')
+
+    def test_rejected_lines_do_not_wait_for_later_boards(self):
+        read = []
+
+        def lines():
+            for n in range(1000):
+                read.append(n)
+                yield 'xxxoo.... o'
+
+            yield 'x........ o'
+
+        results = evaluate.evaluate_lines(lines(), chunksize=4)
+
+        self.assertEqual(next(results)['error'], 'no available moves')
+        self.assertEqual(len(read), 4)
+
+    def test_when_it_is_not_the_tokens_turn(self):
+        result, = evaluate.evaluate_lines(['x........ x'])
+
+        self.assertEqual(result['error'], "not x's turn to play")
+        self.assertNotIn('positions', result)
+
+    def test_other_geometries(self):
+        result, = evaluate.evaluate_lines(['xx..oo...... x'], geometry(3, 4, 3))
+
+        self.assertEqual(result['positions'], [[1, 3]])
+
+    def test_the_boards_can_be_evaluated_in_processes(self):
+        lines = ['x........ o', '..x...... o', 'xx..oo... x', '......x.. o']
+
+        self.assertEqual(
+            list(evaluate.evaluate_lines(lines, jobs=2, chunksize=1)),
+            list(evaluate.evaluate_lines(lines))
+        )
+
+
+class MainTestCase(unittest.TestCase):
+    def test_it_is_a_subcommand_of_xo(self):
+        output = io.StringIO()
+
+        with mock.patch.object(sys, 'stdin', io.StringIO('x...o.... x\nbad\n')), redirect_stdout(output):
+            self.assertEqual(cli.main(['evaluate']), 0)
+
+        lines = output.getvalue().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['board'], 'x...o....')
+        self.assertEqual(json.loads(lines[1])['line'], 2)
@@ -1,8 +1,12 @@
+import json
+import random
 import unittest
 
+import xo.arbiter as arbiter
 import xo.game as game
 
 from xo.error import IllegalStateError
+from xo.board import geometry
 from xo.game import Game
 
 
@@ -166,6 +170,29 @@ class GamePlayTestCase(unittest.TestCase):
         self.assertEqual(self.game.statistics['squashed'], 1)
 
 
+class EventRecordTestCase(unittest.TestCase):
+    def test_it_can_be_encoded_as_json_like_the_dict(self):
+        g = Game()
+        g.start('x')
+
+        self.assertEqual(json.dumps(g.moveto(1, 1).asdict()),
+            json.dumps({ 'name': 'next-turn', 'last_move': { 'r': 1, 'c': 1, 'token': 'x' } }))
+        self.assertEqual(json.dumps(g.moveto(1, 1).asdict()),
+            json.dumps({ 'name': 'invalid-move', 'reason': 'occupied' }))
+
+        for r, c in [(2, 1), (1, 2), (2, 2)]:
+            g.moveto(r, c)
+
+        self.assertEqual(json.dumps(g.moveto(1, 3).asdict()), json.dumps({
+            'name': 'gameover',
+            'reason': 'winner',
+            'last_move': { 'r': 1, 'c': 3, 'token': 'x' },
+            'details': [
+                { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] }
+            ]
+        }))
+
+
 class RestartGameTestCase(unittest.TestCase):
     def setUp(self):
         self.game = Game()
@@ -210,3 +237,216 @@ class RestartGameTestCase(unittest.TestCase):
         self.assertEqual(self.game.statistics['xwins'], 0)
         self.assertEqual(self.game.statistics['owins'], 0)
         self.assertEqual(self.game.statistics['squashed'], 1)
+
+
+class UndoRedoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.game = Game()
+        self.game.start('x')
+
+    def test_undo_takes_back_the_last_move(self):
+        self.game.moveto(1, 1)
+        self.game.moveto(2, 2)
+
+        self.assertEqual(self.game.undo(), { 'r': 2, 'c': 2, 'token': 'o' })
+        self.assertEqual(str(self.game.board), 'x........')
+        self.assertEqual(self.game.turn, 'o')
+        self.assertEqual(self.game.history, [{ 'r': 1, 'c': 1, 'token': 'x' }])
+
+    def test_undo_reopens_a_finished_game(self):
+        for r, c in [(1, 1), (2, 1), (1, 2), (2, 2), (1, 3)]:
+            self.game.moveto(r, c)
+
+        self.game.undo()
+
+        self.assertEqual(self.game.state, game.STATE_PLAYING)
+        self.assertEqual(self.game.turn, 'x')
+        self.assertEqual(self.game.statistics,
+            { 'total': 0, 'xwins': 0, 'owins': 0, 'squashed': 0 })
+
+        event = self.game.moveto(3, 3)
+
+        self.assertEqual(event.name, game.EVENT_NAME_NEXT_TURN)
+
+    def test_redo_replays_the_moves_that_were_undone(self):
+        moves = [(1, 1), (2, 1), (1, 2), (2, 2), (1, 3)]
+
+        for r, c in moves:
+            self.game.moveto(r, c)
+
+        for _ in moves:
+            self.game.undo()
+
+        self.assertEqual(str(self.game.board), '.........')
+        self.assertIsNone(self.game.undo())
+
+        events = [self.game.redo() for _ in moves]
+
+        self.assertEqual(events[-1].name, game.EVENT_NAME_GAMEOVER)
+        self.assertEqual(events[-1].reason, game.EVENT_REASON_WINNER)
+        self.assertEqual(str(self.game.board), 'xxxoo....')
+        self.assertEqual(self.game.statistics['xwins'], 1)
+        self.assertIsNone(self.game.redo())
+
+    def test_a_new_move_replaces_the_moves_that_were_undone(self):
+        self.game.moveto(1, 1)
+        self.game.moveto(2, 2)
+        self.game.undo()
+        self.game.moveto(3, 3)
+
+        self.assertIsNone(self.game.redo())
+        self.assertEqual(str(self.game.board), 'x.......o')
+
+    def test_restart_clears_the_history(self):
+        self.game.moveto(1, 1)
+        self.game.moveto(2, 2)
+        self.game.undo()
+
+        for r, c in [(2, 2), (1, 2), (3, 3), (1, 3)]:
+            self.game.moveto(r, c)
+
+        self.game.restart()
+
+        self.assertEqual(self.game.history, [])
+        self.assertIsNone(self.game.undo())
+        self.assertIsNone(self.game.redo())
+
+    def test_the_history_is_empty_before_starting(self):
+        self.assertEqual(Game().history, [])
+        self.assertEqual(Game().fork().history, [])
+
+    def test_it_is_not_allowed_to_undo_or_redo_before_starting(self):
+        with self.assertRaises(IllegalStateError):
+            Game().undo()
+
+        with self.assertRaises(IllegalStateError):
+            Game().redo()
+
+
+class ForkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.game = Game()
+        self.game.start('x')
+        self.game.moveto(1, 1)
+        self.game.moveto(2, 2)
+
+    def test_the_fork_is_independent(self):
+        fork = self.game.fork()
+        fork.moveto(3, 3)
+
+        self.assertEqual(str(self.game.board), 'x...o....')
+        self.assertEqual(self.game.turn, 'x')
+        self.assertEqual(len(self.game.history), 2)
+
+        self.assertEqual(str(fork.board), 'x...o...x')
+        self.assertEqual(fork.turn, 'o')
+        self.assertEqual(len(fork.history), 3)
+
+    def test_the_history_is_shared_until_it_changes(self):
+        self.game.undo()
+        fork = self.game.fork()
+
+        self.assertIs(fork._history, self.game._history)
+
+        self.game.moveto(3, 3)
+
+        self.assertIsNot(fork._history, self.game._history)
+        self.assertEqual(fork.redo().last_move, { 'r': 2, 'c': 2, 'token': 'o' })
+        self.assertIsNone(self.game.redo())
+
+    def test_the_statistics_are_copied(self):
+        fork = self.game.fork()
+
+        for r, c in [(1, 2), (3, 3), (1, 3)]:
+            fork.moveto(r, c)
+
+        self.assertEqual(fork.statistics['xwins'], 1)
+        self.assertEqual(self.game.statistics['xwins'], 0)
+
+    def test_forking_before_starting(self):
+        fork = Game().fork()
+        fork.start('o')
+
+        self.assertEqual(fork.turn, 'o')
+
+
+class WinDetectionTestCase(unittest.TestCase):
+    def test_when_the_last_move_completes_two_lines(self):
+        g = Game()
+        g.start('x')
+        for r, c in [(1, 1), (1, 2), (1, 3), (2, 1), (3, 1), (2, 3), (3, 3), (3, 2)]:
+            g.moveto(r, c)
+        event = g.moveto(2, 2)
+
+        self.assertEqual(event['reason'], game.EVENT_REASON_WINNER)
+        self.assertEqual(event['details'], [
+            { 'where': 'diagonal', 'index': 1, 'positions': [(1, 1), (2, 2), (3, 3)] },
+            { 'where': 'diagonal', 'index': 2, 'positions': [(1, 3), (2, 2), (3, 1)] }
+        ])
+
+    def test_it_agrees_with_the_arbiter(self):
+        rng = random.Random(0)
+        g = Game()
+        g.start('x')
+
+        for _ in range(500):
+            while g.state == game.STATE_PLAYING:
+                token = g.turn
+                r, c = rng.choice([(r, c) for r, c, piece in g.board if piece == ' '])
+                event = g.moveto(r, c)
+                outcome = arbiter.outcome(g.board, token)
+
+                if outcome['status'] == arbiter.STATUS_IN_PROGRESS:
+                    self.assertEqual(event['name'], game.EVENT_NAME_NEXT_TURN)
+                else:
+                    self.assertEqual(event['name'], game.EVENT_NAME_GAMEOVER)
+                    self.assertEqual(event['reason'], outcome['reason'])
+                    self.assertEqual(event.get('details'), outcome.get('details'))
+
+            g.restart()
+
+
+class LargerBoardTestCase(unittest.TestCase):
+    def test_when_x_wins_on_a_4x4_board(self):
+        g = Game(geometry(4, 4, 3))
+        g.start('x')
+
+        self.assertEqual(g.moveto(4, 4)['name'], game.EVENT_NAME_NEXT_TURN)
+        g.moveto(1, 1)
+        g.moveto(3, 4)
+        g.moveto(1, 2)
+        event = g.moveto(2, 4)
+
+        self.assertEqual(event['name'], game.EVENT_NAME_GAMEOVER)
+        self.assertEqual(event['reason'], game.EVENT_REASON_WINNER)
+        self.assertEqual(event['details'], [{
+            'where': 'column',
+            'index': 4,
+            'positions': [(2, 4), (3, 4), (4, 4)]
+        }])
+        self.assertEqual(str(g.board), 'oo.....x...x...x')
+
+    def test_when_the_move_is_off_a_3x4_board(self):
+        g = Game(geometry(3, 4, 3))
+        g.start('x')
+
+        self.assertEqual(g.moveto(1, 4)['name'], game.EVENT_NAME_NEXT_TURN)
+        self.assertEqual(g.moveto(4, 1)['reason'], game.EVENT_REASON_OUT_OF_BOUNDS)
+
+    def test_when_a_2x2_game_is_squashed(self):
+        g = Game(geometry(2, 2, 3 - 1))
+        g.start('x')
+        g.moveto(1, 1)
+        g.moveto(2, 2)
+        event = g.moveto(1, 2)
+
+        self.assertEqual(event['reason'], game.EVENT_REASON_WINNER)
+
+        g = Game(geometry(1, 3, 3))
+        g.start('x')
+        g.moveto(1, 1)
+        g.moveto(1, 2)
+        event = g.moveto(1, 3)
+
+        self.assertEqual(event['reason'], game.EVENT_REASON_SQUASHED)
+        self.assertEqual(g.statistics['squashed'], 1)
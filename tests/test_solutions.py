@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import xo.ai as ai
+import xo.solutions as solutions
+import xo.solve as solve
+from xo.board import Board
+
+
+class PackTestCase(unittest.TestCase):
+    def test_it_roundtrips(self):
+        for score, depth, moves, positions in [
+            (9, 9, 0b111111111, [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (2, 3), (3, 1), (3, 2), (3, 3)]),
+            (-8, 8, 0b000010000, [(2, 2)]),
+            (-26, 1, 0b100000001, [(1, 1), (3, 3)])
+        ]:
+            self.assertEqual(
+                solutions.unpack(solutions.pack(score, depth, moves)),
+                (score, depth, positions)
+            )
+
+    def test_when_out_of_range(self):
+        with self.assertRaisesRegex(ValueError, 'score out of range: 32'):
+            solutions.pack(32, 1, 1)
+
+        with self.assertRaisesRegex(ValueError, 'depth out of range: 16'):
+            solutions.pack(0, 16, 1)
+
+        with self.assertRaisesRegex(ValueError, 'moves out of range: 0'):
+            solutions.pack(0, 1, 0)
+
+
+class SolutionDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = solutions.load(ai.SCORING_VERSION)
+
+    def tearDown(self):
+        self.database.close()
+
+    def test_it_is_up_to_date(self):
+        n = 0
+
+        for (xmask, omask, token), record in solve.solve():
+            n += 1
+            self.assertEqual(
+                self.database.lookup(xmask, omask, token),
+                solutions.unpack(record)
+            )
+
+        self.assertEqual(n, 9040)
+
+    def test_it_has_no_result_when_no_moves_are_available(self):
+        board = Board.fromstring('xxxoo')
+
+        self.assertIsNone(self.database.lookup(board.xmask, board.omask, 'x'))
+        self.assertIsNone(self.database.lookup(board.xmask, board.omask, 'o'))
+
+    def test_it_agrees_with_an_uncached_search(self):
+        for layout, token in [('x', 'o'), ('x.o', 'x'), ('xo.xo.', 'o'), ('x.oo..x.x', 'o')]:
+            board = Board.fromstring(layout)
+
+            self.assertEqual(
+                ai.MinimaxResult(*self.database.lookup(board.xmask, board.omask, token)),
+                ai.evaluate(board, token, use_cache=False)
+            )
+
+
+class LoadTestCase(unittest.TestCase):
+    def test_when_the_file_does_not_exist(self):
+        self.assertIsNone(solutions.load(ai.SCORING_VERSION, path='does-not-exist'))
+
+    def test_when_the_scoring_version_differs(self):
+        with self.assertRaisesRegex(ValueError, 'solution database is out of date'):
+            solutions.load(ai.SCORING_VERSION + 1)
+
+    def test_when_the_file_is_not_a_database(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'solutions.bin')
+            with open(path, 'wb') as f:
+                f.write(b'not a database')
+
+            with self.assertRaisesRegex(ValueError, 'not a solution database'):
+                solutions.load(ai.SCORING_VERSION, path=path)
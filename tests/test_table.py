@@ -0,0 +1,127 @@
+import random
+import unittest
+
+import xo.game as game
+
+from xo.board import geometry
+from xo.error import IllegalStateError
+from xo.game import Game
+from xo.table import GameTable
+
+
+class GameTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = GameTable()
+        self.game_id = self.table.new()
+
+    def test_a_new_game_is_in_init_state(self):
+        self.assertEqual(self.table.state(self.game_id), game.STATE_INIT)
+        self.assertIsNone(self.table.turn(self.game_id))
+        self.assertIsNone(self.table.board(self.game_id))
+
+        with self.assertRaises(IllegalStateError):
+            self.table.moveto(self.game_id, 1, 1)
+
+        with self.assertRaises(IllegalStateError):
+            self.table.restart(self.game_id)
+
+    def test_when_x_wins(self):
+        self.table.start(self.game_id, 'x')
+
+        for r, c in [(2, 2), (1, 2), (2, 1), (2, 3), (1, 1), (3, 1)]:
+            self.table.moveto(self.game_id, r, c)
+
+        event = self.table.moveto(self.game_id, 3, 3)
+
+        self.assertEqual(event['name'], game.EVENT_NAME_GAMEOVER)
+        self.assertEqual(event['last_move'], { 'r': 3, 'c': 3, 'token': 'x' })
+        self.assertEqual(event['details'],
+            [{ 'index': 1, 'where': 'diagonal', 'positions': [(1, 1), (2, 2), (3, 3)] }])
+
+        self.assertEqual(self.table.state(self.game_id), game.STATE_GAMEOVER)
+        self.assertEqual(str(self.table.board(self.game_id)), 'xo.xxoo.x')
+        self.assertEqual(self.table.turn(self.game_id), 'x')
+        self.assertEqual(self.table.statistics(self.game_id),
+            { 'total': 1, 'xwins': 1, 'owins': 0, 'squashed': 0 })
+
+        with self.assertRaises(IllegalStateError):
+            self.table.moveto(self.game_id, 1, 3)
+
+    def test_restart_after_a_squashed_game(self):
+        self.table.start(self.game_id, 'x')
+
+        for r, c in [(1, 1), (2, 2), (3, 3), (2, 3), (2, 1), (3, 1), (1, 3), (1, 2), (3, 2)]:
+            event = self.table.moveto(self.game_id, r, c)
+
+        self.assertEqual(event['reason'], game.EVENT_REASON_SQUASHED)
+
+        self.table.restart(self.game_id)
+
+        self.assertEqual(self.table.state(self.game_id), game.STATE_PLAYING)
+        self.assertEqual(str(self.table.board(self.game_id)), '.........')
+        self.assertEqual(self.table.turn(self.game_id), 'o')
+        self.assertEqual(self.table.statistics(self.game_id),
+            { 'total': 1, 'xwins': 0, 'owins': 0, 'squashed': 1 })
+
+    def test_invalid_moves(self):
+        self.table.start(self.game_id, 'o')
+        self.table.moveto(self.game_id, 1, 1)
+
+        self.assertEqual(self.table.moveto(self.game_id, 1, 1)['reason'], game.EVENT_REASON_OCCUPIED)
+        self.assertEqual(self.table.moveto(self.game_id, 0, 1)['reason'], game.EVENT_REASON_OUT_OF_BOUNDS)
+        self.assertEqual(self.table.turn(self.game_id), 'x')
+
+    def test_it_agrees_with_game(self):
+        rng = random.Random(0)
+
+        for g in [geometry(), geometry(4, 4, 3), geometry(8, 8, 5)]:
+            table = GameTable(g)
+            game_ids = [table.new() for _ in range(5)]
+            games = [Game(g) for _ in game_ids]
+
+            for game_id, reference in zip(game_ids, games):
+                table.start(game_id, 'o')
+                reference.start('o')
+
+            for _ in range(200):
+                n = rng.randrange(len(games))
+                game_id, reference = game_ids[n], games[n]
+
+                if reference.state == game.STATE_GAMEOVER:
+                    table.restart(game_id)
+                    reference.restart()
+                else:
+                    r, c = rng.randint(0, g.nrows), rng.randint(1, g.ncols)
+                    self.assertEqual(table.moveto(game_id, r, c), reference.moveto(r, c))
+
+                self.assertEqual(str(table.board(game_id)), str(reference.board))
+                self.assertEqual(table.turn(game_id), reference.turn)
+                self.assertEqual(table.state(game_id), reference.state)
+                self.assertEqual(table.statistics(game_id), reference.statistics)
+
+    def test_the_ids_of_removed_games_are_reused(self):
+        other_id = self.table.new()
+        self.table.start(other_id, 'x')
+        self.table.moveto(other_id, 1, 1)
+        self.table.remove(other_id)
+
+        self.assertEqual(len(self.table), 1)
+        self.assertNotIn(other_id, self.table)
+
+        with self.assertRaisesRegex(KeyError, 'no such game'):
+            self.table.state(other_id)
+
+        self.assertEqual(self.table.new(), other_id)
+        self.assertEqual(self.table.state(other_id), game.STATE_INIT)
+        self.assertEqual(self.table.statistics(other_id)['total'], 0)
+
+    def test_it_takes_a_few_bytes_per_game(self):
+        for _ in range(9):
+            self.table.new()
+
+        self.assertEqual(self.table.bytes_per_game, 18)
+        self.assertEqual(self.table.nbytes, 180)
+
+    def test_when_the_board_is_too_large(self):
+        with self.assertRaisesRegex(ValueError, 'at most 64 cells: 81'):
+            GameTable(geometry(9, 9, 5))
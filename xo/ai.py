@@ -1,185 +1,1104 @@
+import asyncio
+import itertools
 import math
+import os
+import threading
+import time
+import warnings
+import weakref
 
-from collections import namedtuple
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 
-from . import arbiter
-from .board import ncells
-from .token import isempty, istoken, other_token
+from . import arbiter, book as _book, mcts as _mcts, solutions
+from .board import Board, default_geometry, each_bit
+from .token import other_token
 
 
 MinimaxResult = namedtuple('MinimaxResult', 'score depth positions')
 
 
-def evaluate(board, token, use_cache=True):
+ENGINE_MINIMAX   = 'minimax'
+ENGINE_ALPHABETA = 'alphabeta'
+ENGINE_MCTS      = 'mcts'
+
+ENGINES = (ENGINE_MINIMAX, ENGINE_ALPHABETA, ENGINE_MCTS)
+
+
+# The number of playouts the MCTS engine runs when it isn't given a time
+# budget.
+MCTS_PLAYOUTS = 10000
+
+
+class TranspositionTable:
+    """A bounded cache of minimax results that evicts the least recently used
+    entry once it is full.
+
+    Keys identify a search node by its geometry, its canonical bitboards and
+    the token to move. Scores depend on the depth at which the game ends, so
+    they are stored relative to the node and rebased to the depth at which it
+    is reached, which lets searches from different roots share entries.
+
+    It is safe to share between threads.
+    """
+
+    def __init__(self, maxsize=65536):
+        if maxsize < 0:
+            raise ValueError('maxsize must be non-negative: {}'.format(maxsize))
+
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                result = self._entries[key]
+            except KeyError:
+                return None
+
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError('maxsize must be non-negative: {}'.format(maxsize))
+
+        with self._lock:
+            self.maxsize = maxsize
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every call to evaluate that uses the cache.
+transposition_table = TranspositionTable()
+
+
+# It must be incremented whenever the scoring changes so that results computed
+# ahead of time with an older scoring are no longer used.
+SCORING_VERSION = 1
+
+
+_solution_database = None
+_solution_database_loaded = False
+_solution_database_lock = threading.Lock()
+
+
+def use_solutions(database):
+    global _solution_database, _solution_database_loaded
+
+    _solution_database = database
+    _solution_database_loaded = True
+
+
+# The opening book of each geometry, or None if it has none, loaded from the
+# books that come with xo on first use.
+_opening_books = {}
+_opening_books_lock = threading.Lock()
+
+
+def use_opening_book(book, geometry=None):
+    """Makes evaluate answer from a book.OpeningBook, before it searches, for
+    boards of the book's geometry. If book is None, evaluate stops using a book
+    for the given geometry.
+    """
+    if book is not None:
+        geometry = book.geometry
+
+    _opening_books[geometry or default_geometry] = book
+
+
+def _opening_book(geometry):
+    try:
+        return _opening_books[geometry]
+    except KeyError:
+        pass
+
+    with _opening_books_lock:
+        if geometry not in _opening_books:
+            try:
+                book = _book.load(geometry, SCORING_VERSION)
+            except ValueError as e:
+                warnings.warn('ignoring the opening book: {}'.format(e))
+                book = None
+
+            _opening_books[geometry] = book
+
+    return _opening_books[geometry]
+
+
+_persistent_cache = None
+
+
+def use_persistent_cache(cache):
+    """Makes evaluate look results up in, and add them to, a cache.PersistentCache
+    that outlives the process, or stops it from doing so if cache is None.
+    """
+    global _persistent_cache
+
+    _persistent_cache = cache
+
+
+def open_persistent_cache(directory=None, maxsize=1 << 20):
+    """Opens the persistent cache in directory, for the current scoring, and
+    makes evaluate use it.
+    """
+    from .cache import PersistentCache
+
+    cache = PersistentCache(SCORING_VERSION, directory, maxsize)
+    use_persistent_cache(cache)
+
+    return cache
+
+
+def _solutions():
+    if not _solution_database_loaded:
+        with _solution_database_lock:
+            if not _solution_database_loaded:
+                try:
+                    database = solutions.load(SCORING_VERSION)
+                except ValueError as e:
+                    warnings.warn('ignoring the solution database: {}'.format(e))
+                    database = None
+
+                use_solutions(database)
+
+    return _solution_database
+
+
+class SearchStats:
+    """Counts the work done by the calls to evaluate made while it is being
+    collected, see instrument.
+
+    nodes maps each depth below the root to the number of positions visited
+    at that depth, including the ones answered from the transposition table.
+    """
+
+    def __init__(self):
+        self.evaluations = 0
+        self.database_hits = 0
+        self.book_hits = 0
+        self.persistent_hits = 0
+        self.nodes = Counter()
+        self.terminals = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.wall_time = 0.0
+
+    @property
+    def total_nodes(self):
+        return sum(self.nodes.values())
+
+    def _count_lookup(self, result):
+        if result is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+
+    def asdict(self):
+        return {
+            'evaluations': self.evaluations,
+            'database_hits': self.database_hits,
+            'book_hits': self.book_hits,
+            'persistent_hits': self.persistent_hits,
+            'nodes': { depth: self.nodes[depth] for depth in sorted(self.nodes) },
+            'total_nodes': self.total_nodes,
+            'terminals': self.terminals,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'wall_time': self.wall_time
+        }
+
+    def __repr__(self):
+        return 'SearchStats({})'.format(', '.join(
+            '{}={!r}'.format(name, value) for name, value in self.asdict().items()
+        ))
+
+
+# The stats being collected by each thread, if any. The search only checks
+# whether there are any, so it costs next to nothing when there aren't.
+class _Instrumentation(threading.local):
+    stats = None
+
+
+_instrumentation = _Instrumentation()
+
+
+@contextmanager
+def instrument(stats=None):
+    """Collects stats about the calls to evaluate made by the current thread
+    within the with block, for e.g.
+
+        with ai.instrument() as stats:
+            ai.evaluate(board, 'x', use_cache=False)
+
+        print(stats.total_nodes, stats.wall_time)
+
+    Pass in an existing SearchStats to keep adding to it.
+    """
+    if stats is None:
+        stats = SearchStats()
+
+    previous = _instrumentation.stats
+    _instrumentation.stats = stats
+
+    try:
+        yield stats
+    finally:
+        _instrumentation.stats = previous
+
+
+def evaluate(board, token, use_cache=True, engine=ENGINE_MINIMAX, all_positions=True, time_budget=None):
+    stats = _instrumentation.stats
+
+    if stats is None:
+        return _evaluate(board, token, use_cache, engine, all_positions, time_budget, None)
+
+    start = time.perf_counter()
+
+    try:
+        return _evaluate(board, token, use_cache, engine, all_positions, time_budget, stats)
+    finally:
+        stats.evaluations += 1
+        stats.wall_time += time.perf_counter() - start
+
+
+def _evaluate(board, token, use_cache, engine, all_positions, time_budget, stats):
+    if engine not in ENGINES:
+        raise ValueError('unknown engine: {}'.format(engine))
+    if time_budget is not None and time_budget < 0:
+        raise ValueError('time_budget must be non-negative: {}'.format(time_budget))
+
+    # The search never touches the caller's board. It works on a snapshot of
+    # its bitboards, so the board may be shared between threads and is left
+    # as it was if the search is interrupted.
+    board = Board(board.xmask, board.omask, board.geometry)
+    geometry = board.geometry
+
+    other = _check_turn(board, token)
+
+    # The solution database, the opening books and the persistent cache hold
+    # the results of the default search, so asking for another engine always
+    # runs it.
+    use_cache = use_cache and engine == ENGINE_MINIMAX
+
+    if use_cache and geometry is default_geometry:
+        database = _solutions()
+
+        if database is not None:
+            result = database.lookup(board.xmask, board.omask, token)
+
+            if result is not None:
+                if stats is not None:
+                    stats.database_hits += 1
+
+                return MinimaxResult(*result)
+
+    opening_book = _opening_book(geometry) if use_cache else None
+
+    if opening_book is not None:
+        result = opening_book.lookup(board.xmask, board.omask, token)
+
+        if result is not None:
+            if stats is not None:
+                stats.book_hits += 1
+
+            score, depth, moves = result
+            return MinimaxResult(score, depth, _positions(moves, geometry))
+
+    persistent = _persistent_cache if use_cache else None
+
+    if persistent is not None:
+        result = persistent.get(geometry, board.xmask, board.omask, token)
+
+        if result is not None:
+            if stats is not None:
+                stats.persistent_hits += 1
+
+            score, depth, moves = result
+            return MinimaxResult(score, depth, _positions(moves, geometry))
+
+    mine, theirs = board.mask(token), board.mask(other)
+    complete = True
+
+    if engine == ENGINE_MCTS:
+        if time_budget is None:
+            statistics = _mcts.search(geometry, mine, theirs, MCTS_PLAYOUTS)
+        else:
+            statistics = _mcts.search(geometry, mine, theirs, time_budget=time_budget)
+
+        return MinimaxResult(None, None,
+            _positions(_mcts.best_moves(statistics, all_positions), geometry))
+    elif time_budget is not None:
+        score, depth, moves, complete = _deepen(
+            geometry, mine, theirs, all_positions, time_budget, stats)
+    elif engine == ENGINE_ALPHABETA:
+        score, moves = _alphabeta(geometry, mine, theirs, all_positions, stats)
+        depth = _depth_of(score, geometry.ncells)
+    else:
+        if use_cache:
+            cache = transposition_table
+        else:
+            cache = None
+
+        score, depth, moves = _maximize(geometry, mine, theirs, token, 0, cache, stats)
+
+    # A search for just one of the optimal moves, or one that ran out of time,
+    # isn't a complete result so it isn't kept.
+    if persistent is not None and all_positions and complete:
+        persistent.put(geometry, board.xmask, board.omask, token, (score, depth, moves))
+
+    return MinimaxResult(score, depth, _positions(moves, geometry))
+
+
+# Raises the error that evaluate raises for a board that it can't evaluate and
+# returns the opponent's token otherwise.
+def _check_turn(board, token):
     outcome = arbiter.outcome(board, token)
 
-    if outcome['status'] == arbiter.STATUS_IN_PROGRESS:
+    if outcome.status == arbiter.STATUS_IN_PROGRESS:
         other = other_token(token)
-        token_piece_count = outcome['piece_counts']['{}s'.format(token)]
-        other_piece_count = outcome['piece_counts']['{}s'.format(other)]
-
-        if token_piece_count <= other_piece_count:
-            if use_cache and outcome['piece_counts']['es'] >= ncells - 1:
-                return _cached_minimax_result[str(board)]
-            else:
-                return _maximize(board, token, other, 0)
+
+        if outcome.piece_counts[token + 's'] <= outcome.piece_counts[other + 's']:
+            return other
         else:
             raise ValueError("not {}'s turn to play: {}".format(token, board))
-    elif outcome['status'] == arbiter.STATUS_GAMEOVER:
+    elif outcome.status == arbiter.STATUS_GAMEOVER:
         raise ValueError('no available moves: {}'.format(board))
     else:
         raise ValueError('invalid board: {}'.format(board))
 
 
-def _maximize(board, a, b, depth):
-    outcome = arbiter.outcome(board, b)
+def mcts(board, token, playouts=MCTS_PLAYOUTS, time_budget=None, all_positions=True, jobs=1, seed=None):
+    """Evaluates the board with a Monte Carlo tree search rather than an
+    exhaustive one, for boards that are too large to be searched to the end.
+
+    It runs the given number of playouts, or as many as it can in time_budget
+    seconds if playouts is None, or whichever comes first if both are given.
+    If jobs isn't 1, that many independent searches are run in processes, or
+    one per CPU if it is 0, and their statistics are merged. The positions of
+    the result are the most visited moves. Its score and depth are None since
+    the search doesn't know how the game ends.
+    """
+    if playouts is None and time_budget is None:
+        raise ValueError('either playouts or time_budget is needed')
+    if playouts is not None and playouts < 1:
+        raise ValueError('playouts must be positive: {}'.format(playouts))
+    if time_budget is not None and time_budget < 0:
+        raise ValueError('time_budget must be non-negative: {}'.format(time_budget))
+    if jobs < 0:
+        raise ValueError('jobs must be non-negative: {}'.format(jobs))
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    board = Board(board.xmask, board.omask, board.geometry)
+    other = _check_turn(board, token)
+    mine, theirs = board.mask(token), board.mask(other)
+
+    if jobs == 1:
+        statistics = _mcts.search(board.geometry, mine, theirs, playouts, time_budget, seed)
+    else:
+        statistics = _mcts.search_in_processes(
+            board.geometry, mine, theirs, playouts, time_budget, seed, jobs)
+
+    return MinimaxResult(None, None,
+        _positions(_mcts.best_moves(statistics, all_positions), board.geometry))
+
+
+def evaluate_many(positions, use_cache=True, engine=ENGINE_MINIMAX, all_positions=True, jobs=1, chunksize=256,
+                  executor=None):
+    """Evaluates each (board, token) pair in positions, which may be any
+    iterable, and returns a generator of the results in the same order.
+
+    Boards that are the same up to symmetry are only evaluated once. The
+    positions are read a chunk at a time and, if jobs isn't 1, the chunks are
+    evaluated in that many processes, or one per CPU if it is 0. Pass an
+    executor, such as a ProcessPoolExecutor, to evaluate the chunks in it
+    instead, with jobs the number of its workers. A position that evaluate
+    would reject raises the same ValueError when its result is reached.
+    """
+    if engine not in ENGINES:
+        raise ValueError('unknown engine: {}'.format(engine))
+    if jobs < 0:
+        raise ValueError('jobs must be non-negative: {}'.format(jobs))
+    if chunksize < 1:
+        raise ValueError('chunksize must be positive: {}'.format(chunksize))
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    options = (use_cache, engine, all_positions)
+
+    if executor is not None:
+        return _evaluate_many_in_executor(positions, options, executor, jobs, chunksize)
+    elif jobs == 1:
+        return _evaluate_many(positions, options, chunksize)
+    else:
+        return _evaluate_many_in_processes(positions, options, jobs, chunksize)
+
+
+# The results of a batch are remembered under the canonical form of each
+# board, along with the token to move, with the moves in the canonical
+# orientation.
+_max_batch_results = 65536
+
+
+def _evaluate_many(positions, options, chunksize):
+    results = TranspositionTable(_max_batch_results)
+
+    for chunk in _chunks(positions, chunksize):
+        keys = _new_keys(chunk, results, ())
+
+        for key, result in zip(keys, _solve(keys, *options)):
+            results.put(key, result)
+
+        yield from _chunk_results(chunk, results, options)
+
+
+def _evaluate_many_in_processes(positions, options, jobs, chunksize):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from _evaluate_many_in_executor(positions, options, executor, jobs, chunksize)
+
+
+def _evaluate_many_in_executor(positions, options, executor, jobs, chunksize):
+    results = TranspositionTable(_max_batch_results)
+    in_flight = set()
+    pending = deque()
+
+    def resolve(chunk, keys, future):
+        if future is not None:
+            for key, result in zip(keys, future.result()):
+                results.put(key, result)
+
+            in_flight.difference_update(keys)
+
+        return _chunk_results(chunk, results, options)
+
+    # A few chunks are kept in flight for each process, so that results can be
+    # streamed without reading all of the positions first.
+    for chunk in _chunks(positions, chunksize):
+        keys = _new_keys(chunk, results, in_flight)
+
+        if keys:
+            in_flight.update(keys)
+            future = executor.submit(_solve, keys, *options)
+        else:
+            future = None
+
+        pending.append((chunk, keys, future))
+
+        while len(pending) > 2 * jobs:
+            yield from resolve(*pending.popleft())
+
+    while pending:
+        yield from resolve(*pending.popleft())
+
+
+def _chunks(positions, chunksize):
+    positions = iter(positions)
+
+    while True:
+        chunk = [
+            (Board(board.xmask, board.omask, board.geometry), token)
+            for board, token in itertools.islice(positions, chunksize)
+        ]
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def _canonical_key(board, token):
+    xmask, omask, t = board.geometry.symmetries.canonical(board.xmask, board.omask)
+    return (board.geometry, xmask, omask, token), t
+
+
+def _new_keys(chunk, results, in_flight):
+    keys = OrderedDict()
+
+    for board, token in chunk:
+        key, _ = _canonical_key(board, token)
+
+        if key not in in_flight and results.get(key) is None:
+            keys[key] = None
+
+    return list(keys)
+
+
+# Runs in the worker processes. An entry is empty if evaluate rejected the
+# position, in which case the error is raised again for the original board.
+def _solve(keys, use_cache, engine, all_positions):
+    results = []
+
+    for geometry, xmask, omask, token in keys:
+        try:
+            result = evaluate(Board(xmask, omask, geometry), token, use_cache, engine, all_positions)
+        except ValueError:
+            results.append(())
+        else:
+            moves = 0
+
+            for r, c in result.positions:
+                moves |= 1 << geometry.index(r, c)
+
+            results.append((result.score, result.depth, moves))
+
+    return results
+
+
+def _chunk_results(chunk, results, options):
+    for board, token in chunk:
+        key, t = _canonical_key(board, token)
+        result = results.get(key)
+
+        if not result:
+            # Either evaluate rejects the position, and raises the error for
+            # this board, or the result was evicted and is worked out again.
+            yield evaluate(board, token, *options)
+        else:
+            score, depth, moves = result
+            symmetries = board.geometry.symmetries
+            moves = symmetries.transform(moves, symmetries.inverses[t])
+
+            yield MinimaxResult(score, depth, _positions(moves, board.geometry))
+
+
+async def evaluate_async(board, token, use_cache=True, engine=ENGINE_MINIMAX, all_positions=True,
+                         executor=None, timeout=None):
+    """The same as evaluate, but it runs in an executor, the event loop's
+    default one if executor is None, so that the event loop isn't blocked.
+
+    Concurrent requests for boards that are the same up to symmetry share a
+    single evaluation. Cancelling a request, or timing out after timeout
+    seconds, only affects that request. The evaluation itself is cancelled
+    if every request for it is, unless it has already started.
+    """
+    if engine not in ENGINES:
+        raise ValueError('unknown engine: {}'.format(engine))
+
+    board = Board(board.xmask, board.omask, board.geometry)
+    options = (use_cache, engine, all_positions)
+    key, t = _canonical_key(board, token)
+
+    loop = asyncio.get_running_loop()
+    flights = _flights.setdefault(loop, {})
+    flight_key = (key, options)
+    flight = flights.get(flight_key)
+
+    # A flight that was cancelled, or that has landed, may still be waiting for
+    # its done callback to run, and is of no use to a new request.
+    if flight is None or flight.future.done():
+        flight = flights[flight_key] = _Flight(loop.run_in_executor(executor, _solve, [key], *options))
+
+        def land(future, flight=flight):
+            if flights.get(flight_key) is flight:
+                del flights[flight_key]
+
+        flight.future.add_done_callback(land)
+
+    flight.waiters += 1
+
+    try:
+        result, = await asyncio.wait_for(asyncio.shield(flight.future), timeout)
+    finally:
+        flight.waiters -= 1
+
+        if flight.waiters == 0 and not flight.future.done():
+            if flights.get(flight_key) is flight:
+                del flights[flight_key]
+
+            flight.future.cancel()
+
+    if not result:
+        # Raises the error for this board.
+        return evaluate(board, token, *options)
+
+    score, depth, moves = result
+    symmetries = board.geometry.symmetries
+    moves = symmetries.transform(moves, symmetries.inverses[t])
+
+    return MinimaxResult(score, depth, _positions(moves, board.geometry))
+
+
+class _Flight:
+    __slots__ = ('future', 'waiters')
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+# The evaluations in progress for each event loop, keyed by the canonical form
+# of the board, the token and the options.
+_flights = weakref.WeakKeyDictionary()
+
+
+# Yields each (board, token) position along with its (score, depth, moves), with
+# the moves as a mask, for building the solution database and the opening
+# books. Every search shares one table, so each position is only searched once
+# whatever the order of the positions.
+def _solve_positions(positions):
+    table = TranspositionTable(maxsize=1 << 20)
+
+    for board, token in positions:
+        mine, theirs = board.mask(token), board.mask(other_token(token))
+        yield (board, token), _maximize(board.geometry, mine, theirs, token, 0, table)
+
+
+# The search works on a position given by two masks, mine for the pieces of
+# the player to move and theirs for the pieces of their opponent. A move is
+# made by passing mine | bit on as the opponent's mask of the child, so no
+# position is ever modified.
+#
+# The arbiter treats x and o alike, so the outcome of a position for the
+# player who just moved is its outcome for 'o' when their pieces are passed as
+# the o's.
+#
+# Moves are tracked as masks rather than lists of positions. Results are cached
+# under the canonical form of the position, with the moves mapped into the
+# canonical orientation, so every position in a symmetry class shares a single
+# entry and symmetric children are only ever searched once. The token to move
+# is part of the key since mine and theirs don't say who is x.
+def _maximize(geometry, mine, theirs, a, depth, cache, stats=None):
+    if stats is not None:
+        stats.nodes[depth] += 1
+
+    if cache is not None:
+        symmetries = geometry.symmetries
+        cmine, ctheirs, t = symmetries.canonical(mine, theirs)
+        key = (geometry, cmine, ctheirs, a)
+        result = cache.get(key)
+
+        if stats is not None:
+            stats._count_lookup(result)
+
+        if result is not None:
+            score, plies, moves = result
+            return (_rebase(score, depth, geometry.ncells), depth + plies,
+                symmetries.transform(moves, symmetries.inverses[t]))
+
+    outcome = arbiter.outcome_frommasks(mine, theirs, 'o', geometry)
 
     if _terminal(outcome):
-        return MinimaxResult(_min_terminal_score(outcome, depth), depth, [])
+        if stats is not None:
+            stats.terminals += 1
+
+        return _min_terminal_score(outcome, depth, geometry.ncells), depth, 0
 
+    b = other_token(a)
     max_score = -math.inf
-    max_positions = []
+    max_moves = 0
 
-    for r, c, piece in board:
-        if isempty(piece):
-            pos = (r, c)
+    for i in each_bit(geometry.full_mask & ~(mine | theirs)):
+        min_score, min_depth, _ = _minimize(geometry, theirs, mine | 1 << i, b, depth + 1, cache, stats)
 
-            board[pos] = a
+        if min_score > max_score:
+            max_score = min_score
+            max_depth = min_depth
+            max_moves = 1 << i
+        elif min_score == max_score:
+            max_depth = min_depth
+            max_moves |= 1 << i
 
-            min_score, min_depth, _ = _minimize(board, b, a, depth + 1)
+    if cache is not None:
+        cache.put(key, (_rebase(max_score, -depth, geometry.ncells), max_depth - depth,
+            symmetries.transform(max_moves, t)))
 
-            if min_score > max_score:
-                max_score = min_score
-                max_depth = min_depth
-                max_positions = [pos]
-            elif min_score == max_score:
-                max_depth = min_depth
-                max_positions.append(pos)
+    return max_score, max_depth, max_moves
 
-            board[pos] = ' '
 
-    return MinimaxResult(max_score, max_depth, max_positions)
+def _minimize(geometry, mine, theirs, a, depth, cache, stats=None):
+    if stats is not None:
+        stats.nodes[depth] += 1
 
+    if cache is not None:
+        symmetries = geometry.symmetries
+        cmine, ctheirs, t = symmetries.canonical(mine, theirs)
+        key = (geometry, cmine, ctheirs, a)
+        result = cache.get(key)
 
-def _minimize(board, a, b, depth):
-    outcome = arbiter.outcome(board, b)
+        if stats is not None:
+            stats._count_lookup(result)
+
+        if result is not None:
+            score, plies, moves = result
+            return (-_rebase(score, depth, geometry.ncells), depth + plies,
+                symmetries.transform(moves, symmetries.inverses[t]))
+
+    outcome = arbiter.outcome_frommasks(mine, theirs, 'o', geometry)
 
     if _terminal(outcome):
-        return MinimaxResult(_max_terminal_score(outcome, depth), depth, [])
+        if stats is not None:
+            stats.terminals += 1
+
+        return _max_terminal_score(outcome, depth, geometry.ncells), depth, 0
 
+    b = other_token(a)
     min_score = math.inf
-    min_positions = []
+    min_moves = 0
 
-    for r, c, piece in board:
-        if isempty(piece):
-            pos = (r, c)
+    for i in each_bit(geometry.full_mask & ~(mine | theirs)):
+        max_score, max_depth, _ = _maximize(geometry, theirs, mine | 1 << i, b, depth + 1, cache, stats)
 
-            board[pos] = a
+        if max_score < min_score:
+            min_score = max_score
+            min_depth = max_depth
+            min_moves = 1 << i
+        elif max_score == min_score:
+            min_depth = max_depth
+            min_moves |= 1 << i
 
-            max_score, max_depth, _ = _maximize(board, b, a, depth + 1)
+    if cache is not None:
+        cache.put(key, (_rebase(-min_score, -depth, geometry.ncells), min_depth - depth,
+            symmetries.transform(min_moves, t)))
 
-            if max_score < min_score:
-                min_score = max_score
-                min_depth = max_depth
-                min_positions = [pos]
-            elif max_score == min_score:
-                min_depth = max_depth
-                min_positions.append(pos)
+    return min_score, min_depth, min_moves
 
-            board[pos] = ' '
 
-    return MinimaxResult(min_score, min_depth, min_positions)
+# Results are kept in the transposition table as if the position were the root
+# of the search, i.e. scored for the player to move with the depth counted from
+# the position, so that it shares its entry wherever it is reached, for e.g. by
+# the searches for consecutive moves of a game. A win, or a loss, scores 2 less
+# for each ply that the position is below the root and a squash scores 1 more.
+# Wins always score more than squashes, so the best moves don't depend on the
+# depth.
+def _rebase(score, depth, maximum_depth):
+    if score > maximum_depth:
+        return score - 2 * depth
+    elif score < -maximum_depth:
+        return score + 2 * depth
+    elif score > 0:
+        return score + depth
+    else:
+        return score - depth
 
 
-def _terminal(outcome):
-    return outcome['status'] == arbiter.STATUS_GAMEOVER
+def _positions(moves, geometry):
+    return [geometry.positions[i] for i in each_bit(moves)]
+
+
+# Cells that lie on more winning lines are tried first, i.e. the center, then
+# the corners and then the edges, so that good moves cause early cutoffs.
+def _ordered_moves(geometry, mine, theirs):
+    occupied = mine | theirs
+    return [i for i in geometry.cells_by_line_count if not occupied >> i & 1]
+
+
+# The alpha-beta search only computes the score. Every score is reached by a
+# game that ends at a unique depth, see _depth_of, so the depth doesn't need to
+# be tracked.
+#
+# Once the best score is known, each root move that might also achieve it is
+# confirmed with a null-window search so that all the optimal moves are found.
+def _alphabeta(geometry, mine, theirs, all_positions, stats=None):
+    if stats is not None:
+        stats.nodes[0] += 1
+
+    best_score = -math.inf
+    best_moves = 0
+    candidates = []
+
+    for i in _ordered_moves(geometry, mine, theirs):
+        score = _alphabeta_min(geometry, theirs, mine | 1 << i, 1, best_score, math.inf, stats)
+
+        if score > best_score:
+            best_score = score
+            best_moves = 1 << i
+        elif all_positions:
+            # The score is an upper bound, so the move can only be as good as
+            # the best one if the bound reaches the best score.
+            candidates.append((i, score))
+
+    for i, score in candidates:
+        if score >= best_score:
+            score = _alphabeta_min(geometry, theirs, mine | 1 << i, 1, best_score - 1, best_score, stats)
+
+            if score >= best_score:
+                best_moves |= 1 << i
+
+    return best_score, best_moves
+
+
+def _alphabeta_max(geometry, mine, theirs, depth, alpha, beta, stats):
+    if stats is not None:
+        stats.nodes[depth] += 1
+
+    outcome = arbiter.outcome_frommasks(mine, theirs, 'o', geometry)
+
+    if _terminal(outcome):
+        if stats is not None:
+            stats.terminals += 1
+
+        return _min_terminal_score(outcome, depth, geometry.ncells)
+
+    max_score = -math.inf
+
+    for i in _ordered_moves(geometry, mine, theirs):
+        score = _alphabeta_min(geometry, theirs, mine | 1 << i, depth + 1, alpha, beta, stats)
+
+        if score > max_score:
+            max_score = score
+
+            if max_score >= beta:
+                break
+
+            alpha = max(alpha, max_score)
+
+    return max_score
+
+
+def _alphabeta_min(geometry, mine, theirs, depth, alpha, beta, stats):
+    if stats is not None:
+        stats.nodes[depth] += 1
+
+    outcome = arbiter.outcome_frommasks(mine, theirs, 'o', geometry)
+
+    if _terminal(outcome):
+        if stats is not None:
+            stats.terminals += 1
+
+        return _max_terminal_score(outcome, depth, geometry.ncells)
+
+    min_score = math.inf
+
+    for i in _ordered_moves(geometry, mine, theirs):
+        score = _alphabeta_max(geometry, theirs, mine | 1 << i, depth + 1, alpha, beta, stats)
+
+        if score < min_score:
+            min_score = score
+
+            if min_score <= alpha:
+                break
+
+            beta = min(beta, min_score)
+
+    return min_score
+
+
+# Iterative deepening runs the alpha-beta search to increasing depths until
+# it reaches the end of the game or runs out of time, in which case the result
+# of the deepest search that finished is used. Positions that are cut off at
+# the search's depth, without the game being over, score 0. No game ends with
+# that score, so it can't be confused with a real one.
+#
+# Each search tries the moves that were best in the previous one first, which
+# makes the cutoffs come earlier: at the root the moves are ordered by their
+# previous scores and every other position tries its previous best move first.
+#
+# The time only starts being checked once a move has been scored, so there is
+# always a result to return. If the first search doesn't finish, it is the
+# best of the moves scored so far.
+class _Deepening:
+    __slots__ = ('deadline', 'nodes', 'cut_off', 'best_moves', 'stats')
+
+    def __init__(self, stats):
+        self.deadline = math.inf
+        self.nodes = 0
+        self.cut_off = False
+        self.best_moves = {}
+        self.stats = stats
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+# The clock is only read every so many positions.
+_deadline_check_interval = 64
+
+
+def _deepen(geometry, mine, theirs, all_positions, time_budget, stats):
+    deadline = time.perf_counter() + time_budget
+    search = _Deepening(stats)
+    moves = _ordered_moves(geometry, mine, theirs)
+    result = None
+
+    for limit in range(1, len(moves) + 1):
+        search.cut_off = False
+        scores = {}
+
+        try:
+            score, best_moves = _deepening_root(
+                geometry, mine, theirs, moves, limit, all_positions, search, scores, deadline)
+        except _OutOfTime:
+            if result is None:
+                # The first of the moves with the highest score is the only
+                # one whose score isn't just an upper bound.
+                best = max(scores, key=scores.get)
+                result = (scores[best], limit, 1 << best, False)
+            break
+
+        if not search.cut_off:
+            return score, _depth_of(score, geometry.ncells), best_moves, True
+
+        result = (score, limit, best_moves, False)
+        moves.sort(key=lambda i: -scores[i])
+
+    return result
+
+
+def _deepening_root(geometry, mine, theirs, moves, limit, all_positions, search, scores, deadline):
+    if search.stats is not None:
+        search.stats.nodes[0] += 1
+
+    best_score = -math.inf
+    best_moves = 0
+    candidates = []
+
+    for i in moves:
+        score = scores[i] = _deepening_min(
+            geometry, theirs, mine | 1 << i, 1, limit, best_score, math.inf, search)
+        search.deadline = deadline
+
+        if score > best_score:
+            best_score = score
+            best_moves = 1 << i
+        elif all_positions:
+            candidates.append((i, score))
+
+    for i, score in candidates:
+        if score >= best_score:
+            score = _deepening_min(
+                geometry, theirs, mine | 1 << i, 1, limit, best_score - 1, best_score, search)
+
+            if score >= best_score:
+                best_moves |= 1 << i
+
+    return best_score, best_moves
+
+
+def _deepening_max(geometry, mine, theirs, depth, limit, alpha, beta, search):
+    outcome = _deepening_visit(geometry, mine, theirs, depth, search)
+
+    if _terminal(outcome):
+        return _min_terminal_score(outcome, depth, geometry.ncells)
+
+    if depth == limit:
+        search.cut_off = True
+        return 0
+
+    max_score = -math.inf
+    max_move = None
+
+    for i in _deepening_moves(geometry, mine, theirs, search):
+        score = _deepening_min(geometry, theirs, mine | 1 << i, depth + 1, limit, alpha, beta, search)
+
+        if score > max_score:
+            max_score = score
+            max_move = i
+
+            if max_score >= beta:
+                break
+
+            alpha = max(alpha, max_score)
+
+    search.best_moves[mine, theirs] = max_move
+
+    return max_score
+
+
+def _deepening_min(geometry, mine, theirs, depth, limit, alpha, beta, search):
+    outcome = _deepening_visit(geometry, mine, theirs, depth, search)
+
+    if _terminal(outcome):
+        return _max_terminal_score(outcome, depth, geometry.ncells)
+
+    if depth == limit:
+        search.cut_off = True
+        return 0
+
+    min_score = math.inf
+    min_move = None
+
+    for i in _deepening_moves(geometry, mine, theirs, search):
+        score = _deepening_max(geometry, theirs, mine | 1 << i, depth + 1, limit, alpha, beta, search)
+
+        if score < min_score:
+            min_score = score
+            min_move = i
+
+            if min_score <= alpha:
+                break
+
+            beta = min(beta, min_score)
+
+    search.best_moves[mine, theirs] = min_move
 
+    return min_score
 
-_maximum_depth = 9
 
+def _deepening_visit(geometry, mine, theirs, depth, search):
+    search.nodes += 1
 
-def _max_terminal_score(outcome, depth):
-    if outcome['reason'] == arbiter.REASON_WINNER:
-        return 2 * (_maximum_depth - depth) + _maximum_depth + 1
-    elif outcome['reason'] == arbiter.REASON_SQUASHED:
+    if search.nodes % _deadline_check_interval == 0 and time.perf_counter() > search.deadline:
+        raise _OutOfTime
+
+    outcome = arbiter.outcome_frommasks(mine, theirs, 'o', geometry)
+
+    if search.stats is not None:
+        search.stats.nodes[depth] += 1
+
+        if _terminal(outcome):
+            search.stats.terminals += 1
+
+    return outcome
+
+
+# The position is keyed by the pieces of the player to move and of their
+# opponent, so its best move is the same whichever of x or o is to move.
+def _deepening_moves(geometry, mine, theirs, search):
+    moves = _ordered_moves(geometry, mine, theirs)
+    best = search.best_moves.get((mine, theirs))
+
+    if best is not None:
+        moves.remove(best)
+        moves.insert(0, best)
+
+    return moves
+
+
+def _terminal(outcome):
+    return outcome.status == arbiter.STATUS_GAMEOVER
+
+
+def _max_terminal_score(outcome, depth, maximum_depth):
+    if outcome.reason == arbiter.REASON_WINNER:
+        return 2 * (maximum_depth - depth) + maximum_depth + 1
+    elif outcome.reason == arbiter.REASON_SQUASHED:
         return depth
     else:
         # Should never be reached
         raise ValueError('unexpected outcome: {}'.format(outcome))
 
 
-def _min_terminal_score(outcome, depth):
-    return -_max_terminal_score(outcome, depth)
-
-
-_cached_minimax_result = {
-    '.........': MinimaxResult(score=9, depth=9, positions=[
-        (1, 1), (1, 2), (1, 3),
-        (2, 1), (2, 2), (2, 3),
-        (3, 1), (3, 2), (3, 3)
-    ]),
-    'x........': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '.x.......': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (1, 3),
-        (2, 2), (3, 2)
-    ]),
-    '..x......': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '...x.....': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (2, 2),
-        (2, 3), (3, 1)
-    ]),
-    '....x....': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (1, 3),
-        (3, 1), (3, 3)
-    ]),
-    '.....x...': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 3), (2, 1),
-        (2, 2), (3, 3)
-    ]),
-    '......x..': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '.......x.': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 2), (2, 2),
-        (3, 1), (3, 3)
-    ]),
-    '........x': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    'o........': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '.o.......': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (1, 3),
-        (2, 2), (3, 2)
-    ]),
-    '..o......': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '...o.....': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (2, 2),
-        (2, 3), (3, 1)
-    ]),
-    '....o....': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 1), (1, 3),
-        (3, 1), (3, 3)
-    ]),
-    '.....o...': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 3), (2, 1),
-        (2, 2), (3, 3)
-    ]),
-    '......o..': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ]),
-    '.......o.': MinimaxResult(score=-8, depth=8, positions=[
-        (1, 2), (2, 2),
-        (3, 1), (3, 3)
-    ]),
-    '........o': MinimaxResult(score=-8, depth=8, positions=[
-        (2, 2)
-    ])
-}
+def _min_terminal_score(outcome, depth, maximum_depth):
+    return -_max_terminal_score(outcome, depth, maximum_depth)
+
+
+def _depth_of(score, maximum_depth):
+    score = abs(score)
+
+    if score > maximum_depth:
+        return maximum_depth - (score - maximum_depth - 1) // 2
+    else:
+        return score
+
@@ -1,5 +1,13 @@
+from collections import namedtuple
+
+from .board import Board, default_geometry, each_bit, popcount
+from .record import Record
 from .token import istoken, other_token
 
+# WinningLine used to be defined here and is re-exported so that
+# xo.arbiter.WinningLine keeps working.
+from .board import WinningLine
+
 
 STATUS_INVALID     = 'invalid'
 STATUS_GAMEOVER    = 'gameover'
@@ -13,102 +21,135 @@ REASON_LOSER                = 'loser'
 REASON_SQUASHED             = 'squashed'
 
 
+class Outcome(Record):
+    __slots__ = _fields = ('status', 'reason', 'details', 'piece_counts')
+    _list_fields = ('details',)
+
+
+class PieceCounts(Record):
+    __slots__ = _fields = ('xs', 'os', 'es')
+
+
+# The outcome of every board that has been seen so far, keyed by geometry, then
+# by token and then by the board's bitboards. There are at most 3^9 boards of the
+# default geometry so the table stays small, and each entry is computed once on
+# first use. Outcomes are immutable so equal ones are interned and shared
+# between boards.
+#
+# Larger geometries have far too many boards to remember, so their outcomes
+# are computed afresh on every call.
+_max_memoized_cells = 12
+
+_outcome_tables = {}
+_interned_outcomes = {}
+
+
 def outcome(board, token):
+    return outcome_frommasks(board.xmask, board.omask, token, board.geometry)
+
+
+# The same as outcome but for a board given by its bitboards, so that callers
+# such as the AI's search don't need a Board for every position they look at.
+def outcome_frommasks(xmask, omask, token, geometry=default_geometry):
     if not istoken(token):
         raise ValueError('must be a token: {}'.format(token))
 
+    tables = _outcome_tables.get(geometry)
+
+    if tables is None:
+        if geometry.ncells > _max_memoized_cells:
+            return _outcome(Board(xmask, omask, geometry), token)
+
+        tables = _outcome_tables.setdefault(geometry, { 'x': {}, 'o': {} })
+
+    table = tables[token]
+    key = xmask << geometry.ncells | omask
+
+    try:
+        return table[key]
+    except KeyError:
+        result = _outcome(Board(xmask, omask, geometry), token)
+        result = table[key] = _interned_outcomes.setdefault(result, result)
+        return result
+
+
+def can_move(board, token):
+    """Returns True if the game on the board is in progress and token may
+    move next.
+    """
+    outcome = outcome_frommasks(board.xmask, board.omask, token, board.geometry)
+
+    return (outcome.status == STATUS_IN_PROGRESS and
+            outcome.piece_counts[token + 's'] <= outcome.piece_counts[other_token(token) + 's'])
+
+
+def _outcome(board, token):
     piece_counts = count_pieces(board)
 
     if _two_or_more_moves_ahead(piece_counts):
-        result = {
-            'status': STATUS_INVALID,
-            'reason': REASON_TOO_MANY_MOVES_AHEAD
-        }
+        return Outcome(STATUS_INVALID, REASON_TOO_MANY_MOVES_AHEAD, None, piece_counts)
+
+    winners = _find_winners(board)
+
+    if _has_two_winners(winners):
+        return Outcome(STATUS_INVALID, REASON_TWO_WINNERS, None, piece_counts)
+    elif _is_winner(winners, token):
+        return Outcome(STATUS_GAMEOVER, REASON_WINNER, winners[token], piece_counts)
+    elif _is_winner(winners, other_token(token)):
+        return Outcome(STATUS_GAMEOVER, REASON_LOSER, winners[other_token(token)], piece_counts)
+    elif _is_squashed(piece_counts):
+        return Outcome(STATUS_GAMEOVER, REASON_SQUASHED, None, piece_counts)
     else:
-        winners = _find_winners(board)
-
-        if _has_two_winners(winners):
-            result = {
-                'status': STATUS_INVALID,
-                'reason': REASON_TWO_WINNERS
-            }
-        elif _is_winner(winners, token):
-            result = {
-                'status': STATUS_GAMEOVER,
-                'reason': REASON_WINNER,
-                'details': winners[token]
-            }
-        elif _is_winner(winners, other_token(token)):
-            result = {
-                'status': STATUS_GAMEOVER,
-                'reason': REASON_LOSER,
-                'details': winners[other_token(token)]
-            }
-        elif _is_squashed(piece_counts):
-            result = {
-                'status': STATUS_GAMEOVER,
-                'reason': REASON_SQUASHED
-            }
-        else:
-            result = { 'status': STATUS_IN_PROGRESS }
+        return Outcome(STATUS_IN_PROGRESS, None, None, piece_counts)
 
-    result['piece_counts'] = piece_counts
 
-    return result
+_piece_counts = {}
 
 
 def count_pieces(board):
-    xs, os, es = 0, 0, 0
+    xs = popcount(board.xmask)
+    os = popcount(board.omask)
+    key = (xs, os, board.geometry.ncells - xs - os)
 
-    for _, _, piece in board:
-        if piece == 'x':
-            xs += 1
-        elif piece == 'o':
-            os += 1
-        else:
-            es += 1
-
-    return { 'xs': xs, 'os': os, 'es': es }
+    try:
+        return _piece_counts[key]
+    except KeyError:
+        return _piece_counts.setdefault(key, PieceCounts(*key))
 
 
 def _two_or_more_moves_ahead(piece_counts):
-    return abs(piece_counts['xs'] - piece_counts['os']) >= 2
+    return abs(piece_counts.xs - piece_counts.os) >= 2
 
 
-_winning_positions = [
-    { 'where': 'row', 'index': 1, 'positions': [(1, 1), (1, 2), (1, 3)] },
-    { 'where': 'row', 'index': 2, 'positions': [(2, 1), (2, 2), (2, 3)] },
-    { 'where': 'row', 'index': 3, 'positions': [(3, 1), (3, 2), (3, 3)] },
+def lines_completed_by(board, r, c):
+    i = board._idx(r, c)
 
-    { 'where': 'column', 'index': 1, 'positions': [(1, 1), (2, 1), (3, 1)] },
-    { 'where': 'column', 'index': 2, 'positions': [(1, 2), (2, 2), (3, 2)] },
-    { 'where': 'column', 'index': 3, 'positions': [(1, 3), (2, 3), (3, 3)] },
-
-    { 'where': 'diagonal', 'index': 1, 'positions': [(1, 1), (2, 2), (3, 3)] },
-    { 'where': 'diagonal', 'index': 2, 'positions': [(1, 3), (2, 2), (3, 1)] }
-]
+    if board.xmask >> i & 1:
+        pieces = board.xmask
+    elif board.omask >> i & 1:
+        pieces = board.omask
+    else:
+        return ()
 
+    completed = ()
 
-def _find_winners(board):
-    winners = { 'x': [], 'o': [] }
+    for mask, line in board.geometry.lines_through[i]:
+        if pieces & mask == mask:
+            completed += (line,)
 
-    for w in _winning_positions:
-        x = board[w['positions'][0]]
-        y = board[w['positions'][1]]
-        z = board[w['positions'][2]]
+    return completed
 
-        if _is_winning(x, y, z):
-            winners[x].append({
-                'where': w['where'],
-                'index': w['index'],
-                'positions': list(w['positions'])
-            })
 
-    return winners
+def _find_winners(board):
+    winners = { 'x': (), 'o': () }
 
+    for line, mask in zip(board.geometry.lines, board.geometry.line_masks):
+        if board.xmask & mask == mask:
+            winners['x'] += (line,)
+        elif board.omask & mask == mask:
+            winners['o'] += (line,)
 
-def _is_winning(x, y, z):
-    return istoken(x) and x == y and y == z
+    return winners
 
 
 def _has_two_winners(winners):
@@ -120,4 +161,123 @@ def _is_winner(winners, token):
 
 
 def _is_squashed(piece_counts):
-    return piece_counts['es'] == 0
+    return piece_counts.es == 0
+
+
+# The outcome_batch results give the status and reason of each board as a
+# code, which is its index in these tuples.
+STATUSES = (STATUS_INVALID, STATUS_GAMEOVER, STATUS_IN_PROGRESS)
+REASONS = (None, REASON_TOO_MANY_MOVES_AHEAD, REASON_TWO_WINNERS, REASON_WINNER, REASON_LOSER, REASON_SQUASHED)
+
+
+OutcomeBatch = namedtuple('OutcomeBatch', 'status reason xs os es')
+
+
+# Boards are processed a block at a time to bound the size of the temporary
+# arrays.
+_batch_block_size = 1 << 16
+
+
+def outcome_batch(boards, token, geometry=None):
+    """The outcome of many boards at once, computed with NumPy.
+
+    boards is either an (N, ncells) array of cells, which are the bytes used
+    by Board.__str__, i.e. ord('x') and ord('o') with any other value being
+    empty, or an (xmasks, omasks) pair of integer arrays of bitboards.
+
+    It returns an OutcomeBatch of arrays with one entry per board: the codes
+    of the status and of the reason, see STATUSES and REASONS, and the piece
+    counts. They are the same as the outcome of each board except that the
+    winning lines are left out.
+    """
+    import numpy as np
+
+    if not istoken(token):
+        raise ValueError('must be a token: {}'.format(token))
+
+    geometry = geometry or default_geometry
+
+    if isinstance(boards, tuple):
+        xmasks, omasks = (np.asarray(masks) for masks in boards)
+
+        if geometry.ncells > 63:
+            raise ValueError('bitboards only work for boards of at most 63 cells: {}'.format(geometry))
+        if xmasks.shape != omasks.shape or xmasks.ndim != 1:
+            raise ValueError('masks must be one-dimensional arrays of the same length')
+
+        n = len(xmasks)
+        shifts = np.arange(geometry.ncells, dtype=np.int64)
+
+        def cells(start, end):
+            xs = (xmasks[start:end, None].astype(np.int64) >> shifts) & 1
+            os = (omasks[start:end, None].astype(np.int64) >> shifts) & 1
+            return xs.astype(bool), os.astype(bool)
+    else:
+        boards = np.asarray(boards)
+
+        if boards.ndim != 2 or boards.shape[1] != geometry.ncells:
+            raise ValueError('boards must be an array of shape (N, {}): {}'.format(geometry.ncells, boards.shape))
+
+        n = len(boards)
+
+        def cells(start, end):
+            block = boards[start:end]
+            return block == ord('x'), block == ord('o')
+
+    count_type = np.uint8 if geometry.ncells < 256 else np.uint32
+
+    # lines[i, j] is 1 if cell i is on the j-th winning line, so the number of
+    # a player's pieces on each line is the product of their cells and lines.
+    # The counts are small integers, which float32 holds exactly, and float
+    # products are much faster than integer ones.
+    lines = np.zeros((geometry.ncells, len(geometry.lines)), dtype=np.float32)
+    for j, mask in enumerate(geometry.line_masks):
+        for i in each_bit(mask):
+            lines[i, j] = 1
+
+    status = np.empty(n, dtype=np.uint8)
+    reason = np.empty(n, dtype=np.uint8)
+    xs = np.empty(n, dtype=count_type)
+    os = np.empty(n, dtype=count_type)
+    es = np.empty(n, dtype=count_type)
+
+    for start in range(0, n, _batch_block_size):
+        end = min(start + _batch_block_size, n)
+        xcells, ocells = cells(start, end)
+
+        xcount = xcells.sum(axis=1, dtype=count_type)
+        ocount = ocells.sum(axis=1, dtype=count_type)
+
+        xs[start:end] = xcount
+        os[start:end] = ocount
+        es[start:end] = geometry.ncells - xcount - ocount
+
+        xwins = ((xcells.astype(np.float32) @ lines) == geometry.k).any(axis=1)
+        owins = ((ocells.astype(np.float32) @ lines) == geometry.k).any(axis=1)
+
+        if token == 'x':
+            wins, losses = xwins, owins
+        else:
+            wins, losses = owins, xwins
+
+        # The conditions are checked in the same order as by outcome, so the
+        # earlier ones are assigned last.
+        block_status = np.full(end - start, STATUSES.index(STATUS_IN_PROGRESS), dtype=np.uint8)
+        block_reason = np.zeros(end - start, dtype=np.uint8)
+
+        conditions = [
+            (es[start:end] == 0, STATUS_GAMEOVER, REASON_SQUASHED),
+            (losses, STATUS_GAMEOVER, REASON_LOSER),
+            (wins, STATUS_GAMEOVER, REASON_WINNER),
+            (xwins & owins, STATUS_INVALID, REASON_TWO_WINNERS),
+            (np.abs(xcount.astype(np.int64) - ocount) >= 2, STATUS_INVALID, REASON_TOO_MANY_MOVES_AHEAD)
+        ]
+
+        for condition, condition_status, condition_reason in conditions:
+            block_status[condition] = STATUSES.index(condition_status)
+            block_reason[condition] = REASONS.index(condition_reason)
+
+        status[start:end] = block_status
+        reason[start:end] = block_reason
+
+    return OutcomeBatch(status, reason, xs, os, es)
@@ -0,0 +1,242 @@
+"""A compact binary format for archiving finished games.
+
+An archive is made up of an 8-byte header, which gives the geometry that the
+games were played on, followed by one record per game. A record is the number
+of moves shifted left by one, with the low bit set if o played first, as an
+unsigned LEB128 varint, followed by the cell index of each move packed into
+bits_per_move bits, little-endian, and padded to a whole byte. On the standard
+board a move takes 4 bits, so a game takes at most 6 bytes.
+
+Since only finished games are archived, every move of a game but the last one
+leads to the next turn and the last one ends the game. So a reader recovers the
+events of a game, or just its outcome, from its moves without replaying it on
+a board.
+
+Archives are read a block at a time, so they may be much larger than memory.
+"""
+
+import struct
+
+from .board import default_geometry, geometry as _geometry
+from .game import Event, EVENT_NAME_GAMEOVER, EVENT_REASON_WINNER, _move, _next_turn_event, _squashed_event
+
+
+MAGIC = b'XOGA'
+FORMAT_VERSION = 1
+
+
+_header = struct.Struct('<4sBBBB')
+
+_block_size = 1 << 20
+
+_tokens = ['x', 'o']
+
+# The two 4-bit moves packed in each byte, for the common case of boards of at
+# most 16 cells.
+_nibbles = [(byte & 0xf, byte >> 4) for byte in range(256)]
+
+
+def bits_per_move(geometry):
+    return max(1, (geometry.ncells - 1).bit_length())
+
+
+class ArchiveWriter:
+    """Writes the records of games to a binary stream, which it doesn't own,
+    starting with the archive's header.
+
+    A writer can be given to Game as its recorder, which makes the game record
+    itself every time it is restarted or closed after it has ended.
+    """
+
+    def __init__(self, stream, geometry=None):
+        self.geometry = geometry or default_geometry
+        self.stream = stream
+
+        if max(self.geometry.nrows, self.geometry.ncols) > 255:
+            raise ValueError('geometry is too large to archive: {}x{}'.format(
+                self.geometry.nrows, self.geometry.ncols))
+
+        self._bits = bits_per_move(self.geometry)
+        self.stream.write(_header.pack(MAGIC, FORMAT_VERSION,
+            self.geometry.nrows, self.geometry.ncols, self.geometry.k))
+
+    def record(self, first, moves):
+        """Writes a game that first started and that was played with the
+        given cell indexes.
+        """
+        bits = self._bits
+        packed = 0
+
+        for n, i in enumerate(moves):
+            packed |= i << (bits * n)
+
+        nmoves = len(moves)
+
+        self.stream.write(
+            _varint((nmoves << 1) | (first == 'o')) +
+            packed.to_bytes((bits * nmoves + 7) // 8, 'little')
+        )
+
+
+def _varint(n):
+    if n < 0x80:
+        return bytes((n,))
+
+    encoded = bytearray()
+
+    while n >= 0x80:
+        encoded.append(n & 0x7f | 0x80)
+        n >>= 7
+
+    encoded.append(n)
+    return bytes(encoded)
+
+
+class ArchiveReader:
+    """Reads the games of an archive from a binary stream, a block at a time."""
+
+    def __init__(self, stream, block_size=_block_size):
+        header = stream.read(_header.size)
+
+        if len(header) != _header.size:
+            raise ValueError('not a game archive')
+
+        magic, version, nrows, ncols, k = _header.unpack(header)
+
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('not a game archive')
+
+        self.geometry = _geometry(nrows, ncols, k)
+        self.stream = stream
+        self._block_size = block_size
+
+    def games(self):
+        """Yields the first token and the list of cell indexes of each game."""
+        for first, moves in self._records():
+            yield _tokens[first], moves
+
+    def outcomes(self):
+        """Yields the event that ended each game, as Game.moveto returned
+        it.
+        """
+        positions = self.geometry.positions
+
+        for first, moves in self._records():
+            yield self._last_event(first, moves, positions)
+
+    def events(self):
+        """Yields the event of every move of every game, in order. The
+        gameover events separate the games.
+        """
+        positions = self.geometry.positions
+
+        for first, moves in self._records():
+            token = first
+
+            for i in moves[:-1]:
+                r, c = positions[i]
+                yield _next_turn_event(_tokens[token], r, c)
+                token ^= 1
+
+            yield self._last_event(first, moves, positions)
+
+    def _last_event(self, first, moves, positions):
+        nmoves = len(moves)
+        last = moves[-1]
+        r, c = positions[last]
+        token = _tokens[first ^ ((nmoves - 1) & 1)]
+
+        # The last mover's pieces are every other move, counting back from
+        # the last one.
+        pieces = 0
+
+        for i in moves[nmoves - 1::-2]:
+            pieces |= 1 << i
+
+        winning_lines = ()
+
+        for mask, line in self.geometry.lines_through[last]:
+            if pieces & mask == mask:
+                winning_lines += (line,)
+
+        if winning_lines:
+            return Event(EVENT_NAME_GAMEOVER, EVENT_REASON_WINNER, _move(token, r, c), winning_lines)
+        else:
+            return _squashed_event(token, r, c)
+
+    def _records(self):
+        bits = bits_per_move(self.geometry)
+        move_mask = (1 << bits) - 1
+        read = self.stream.read
+        block_size = self._block_size
+
+        buffer = b''
+        offset = 0
+        end = 0
+        eof = False
+
+        while True:
+            start = offset
+
+            if end - offset < block_size and not eof:
+                buffer, offset, end, eof = _refill(buffer, offset, read, block_size)
+                start = offset
+
+            if offset == end:
+                return
+
+            # A record that is cut off at the end of the buffer is read again
+            # once the buffer has been refilled.
+            header = 0
+            shift = 0
+
+            while offset < end:
+                byte = buffer[offset]
+                offset += 1
+                header |= (byte & 0x7f) << shift
+                shift += 7
+
+                if byte < 0x80:
+                    break
+            else:
+                if eof:
+                    raise ValueError('game archive is truncated')
+
+                buffer, offset, end, eof = _refill(buffer, start, read, block_size)
+                continue
+
+            nmoves = header >> 1
+            nbytes = (bits * nmoves + 7) // 8
+
+            if nmoves == 0:
+                raise ValueError('game archive has an empty game')
+
+            if offset + nbytes > end:
+                if eof:
+                    raise ValueError('game archive is truncated')
+
+                buffer, offset, end, eof = _refill(buffer, start, read, block_size)
+                continue
+
+            if bits == 4:
+                moves = [i for byte in buffer[offset:offset + nbytes] for i in _nibbles[byte]]
+                del moves[nmoves:]
+            else:
+                packed = int.from_bytes(buffer[offset:offset + nbytes], 'little')
+                moves = [(packed >> (bits * n)) & move_mask for n in range(nmoves)]
+
+            offset += nbytes
+
+            yield header & 1, moves
+
+
+# Keeps what is left of the buffer from offset on and adds the next block to
+# it.
+def _refill(buffer, offset, read, block_size):
+    block = read(block_size)
+
+    if block:
+        buffer = buffer[offset:] + block
+        return buffer, 0, len(buffer), False
+    else:
+        return buffer, offset, len(buffer), True
@@ -0,0 +1,464 @@
+"""Benchmarks for the hot paths of the library.
+
+Usage: xo bench [-h] [-l] [-k PATTERN] [-r N] [-w N] [-m] [--json] [-o PATH]
+                [-c PATH] [-t FRACTION]
+
+Each benchmark is timed over a number of samples, after a few warmup samples
+that are thrown away. A sample calls the benchmark enough times to take at
+least a few milliseconds and records the time per call. The median and the
+95th percentile of the samples are reported.
+
+Results can be saved as JSON and later used as a baseline that a new run is
+compared against, in which case the exit status is 1 if any benchmark got
+slower by more than the threshold.
+
+With --memory, the memory taken by each game of the different ways of hosting
+games is measured as well, with tracemalloc.
+"""
+
+import fnmatch
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+from . import __version__, ai, arbiter, game, table
+from .board import Board
+
+
+# The version of the JSON format that results are saved in.
+FORMAT_VERSION = 1
+
+
+_benchmarks = OrderedDict()
+
+
+def benchmark(name):
+    """Registers a function that sets up a benchmark and returns the callable
+    that is timed.
+    """
+    def register(setup):
+        _benchmarks[name] = setup
+        return setup
+
+    return register
+
+
+@benchmark('board.fromstring')
+def _fromstring():
+    return lambda: Board.fromstring('xo.xo.x..')
+
+
+@benchmark('board.getitem')
+def _getitem():
+    board = Board.fromstring('xo.xo.x..')
+    return lambda: board[2, 2]
+
+
+@benchmark('board.iter')
+def _iter():
+    board = Board.fromstring('xo.xo.x..')
+    return lambda: list(board)
+
+
+@benchmark('arbiter.outcome')
+def _outcome():
+    board = Board.fromstring('xo.xo.x..')
+    return lambda: arbiter.outcome(board, 'o')
+
+
+_positions = OrderedDict([
+    ('empty', ('', 'x')),
+    ('one-piece', ('x', 'o')),
+    ('mid-game', ('x...o', 'x'))
+])
+
+
+def _register_evaluate(name, layout, token):
+    @benchmark('ai.evaluate.{}.cached'.format(name))
+    def _cached():
+        board = Board.fromstring(layout)
+        return lambda: ai.evaluate(board, token)
+
+    @benchmark('ai.evaluate.{}.uncached'.format(name))
+    def _uncached():
+        board = Board.fromstring(layout)
+        return lambda: ai.evaluate(board, token, use_cache=False)
+
+
+for name, (layout, token) in _positions.items():
+    _register_evaluate(name, layout, token)
+
+
+@benchmark('game.selfplay')
+def _selfplay():
+    rng = random.Random(0)
+
+    def play():
+        g = game.Game()
+        g.start('x')
+
+        while True:
+            r, c = rng.choice(ai.evaluate(g.board, g.turn).positions)
+
+            if g.moveto(r, c).name == game.EVENT_NAME_GAMEOVER:
+                return
+
+    return play
+
+
+_squashed_game = [(1, 1), (2, 2), (3, 3), (2, 3), (2, 1), (3, 1), (1, 3), (1, 2), (3, 2)]
+
+
+@benchmark('game.moveto')
+def _game_moveto():
+    g = game.Game()
+    g.start('x')
+
+    def play():
+        for r, c in _squashed_game:
+            g.moveto(r, c)
+
+        g.restart()
+
+    return play
+
+
+@benchmark('table.moveto')
+def _table_moveto():
+    t = table.GameTable()
+    game_id = t.new()
+    t.start(game_id, 'x')
+
+    def play():
+        for r, c in _squashed_game:
+            t.moveto(game_id, r, c)
+
+        t.restart(game_id)
+
+    return play
+
+
+_memory_benchmarks = OrderedDict()
+
+
+def memory_benchmark(name):
+    """Registers a function that creates the given number of games, each
+    with a move made, and returns whatever holds them.
+    """
+    def register(create):
+        _memory_benchmarks[name] = create
+        return create
+
+    return register
+
+
+@memory_benchmark('game.Game')
+def _games(number):
+    games = [game.Game() for _ in range(number)]
+
+    for g in games:
+        g.start('x')
+        g.moveto(1, 1)
+
+    return games
+
+
+@memory_benchmark('table.GameTable')
+def _game_table(number):
+    t = table.GameTable()
+
+    for _ in range(number):
+        game_id = t.new()
+        t.start(game_id, 'x')
+        t.moveto(game_id, 1, 1)
+
+    return t
+
+
+def names():
+    return list(_benchmarks)
+
+
+def memory_names():
+    return list(_memory_benchmarks)
+
+
+def select(patterns=None, benchmarks=None):
+    if benchmarks is None:
+        benchmarks = _benchmarks
+
+    if not patterns:
+        return list(benchmarks)
+
+    return [
+        name for name in benchmarks
+        if any(fnmatch.fnmatchcase(name, pattern) or pattern in name for pattern in patterns)
+    ]
+
+
+def run(selected=None, repeat=15, warmup=3, min_time=0.005):
+    """Runs the selected benchmarks, or all of them, and returns their
+    results keyed by name.
+    """
+    if repeat < 1:
+        raise ValueError('repeat must be positive: {}'.format(repeat))
+    if warmup < 0:
+        raise ValueError('warmup must be non-negative: {}'.format(warmup))
+
+    results = OrderedDict()
+
+    for name in selected or names():
+        results[name] = measure(_benchmarks[name](), repeat, warmup, min_time)
+
+    return results
+
+
+def measure(fn, repeat=15, warmup=3, min_time=0.005):
+    number = _calibrate(fn, min_time)
+    samples = [_time(fn, number) / number for _ in range(warmup + repeat)][warmup:]
+
+    return summarize(samples, number)
+
+
+def run_memory(selected=None, number=10000):
+    """Runs the selected memory benchmarks, or all of them, and returns the
+    number of bytes per game of each one keyed by name.
+    """
+    if number < 1:
+        raise ValueError('number must be positive: {}'.format(number))
+
+    results = OrderedDict()
+
+    for name in selected or memory_names():
+        results[name] = measure_memory(_memory_benchmarks[name], number)
+
+    return results
+
+
+def measure_memory(create, number=10000):
+    tracing = tracemalloc.is_tracing()
+
+    if not tracing:
+        tracemalloc.start()
+
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        games = create(number)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    del games
+    return (after - before) / number
+
+
+def _calibrate(fn, min_time):
+    number = 1
+
+    while _time(fn, number) < min_time:
+        number *= 10
+
+    return number
+
+
+def _time(fn, number):
+    start = time.perf_counter()
+
+    for _ in range(number):
+        fn()
+
+    return time.perf_counter() - start
+
+
+def summarize(samples, number=1):
+    ordered = sorted(samples)
+
+    return OrderedDict([
+        ('median', statistics.median(ordered)),
+        ('p95', ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]),
+        ('min', ordered[0]),
+        ('mean', statistics.mean(ordered)),
+        ('samples', len(ordered)),
+        ('number', number)
+    ])
+
+
+def tojson(results, memory=None):
+    data = OrderedDict([
+        ('version', FORMAT_VERSION),
+        ('xo', __version__),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('benchmarks', results)
+    ])
+
+    if memory is not None:
+        data['memory'] = memory
+
+    return data
+
+
+def fromjson(data):
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError('unsupported benchmark results version: {}'.format(data.get('version')))
+
+    return data['benchmarks']
+
+
+def compare(baseline, results, threshold=0.1):
+    """Compares the medians of the benchmarks that are in both sets of results
+    and returns (name, baseline median, median, relative change, regressed)
+    for each one.
+    """
+    comparison = []
+
+    for name, result in results.items():
+        if name in baseline:
+            before = baseline[name]['median']
+            after = result['median']
+            change = after / before - 1 if before > 0 else 0.0
+
+            comparison.append((name, before, after, change, change > threshold))
+
+    return comparison
+
+
+def format_time(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return '{:.3g} {}'.format(seconds / scale, unit)
+
+    return '{:.3g} ns'.format(seconds / 1e-9)
+
+
+def _write_results(output, results):
+    width = max([len(name) for name in results] + [len('benchmark')])
+
+    output.write('{:<{}}  {:>10}  {:>10}\n'.format('benchmark', width, 'median', 'p95'))
+
+    for name, result in results.items():
+        output.write('{:<{}}  {:>10}  {:>10}\n'.format(
+            name, width, format_time(result['median']), format_time(result['p95'])))
+
+
+def _write_memory(output, memory):
+    width = max([len(name) for name in memory] + [len('benchmark')])
+
+    output.write('{:<{}}  {:>10}\n'.format('benchmark', width, 'bytes/game'))
+
+    for name, nbytes in memory.items():
+        output.write('{:<{}}  {:>10.1f}\n'.format(name, width, nbytes))
+
+
+def _write_comparison(output, comparison):
+    width = max([len(row[0]) for row in comparison] + [len('benchmark')])
+
+    output.write('{:<{}}  {:>10}  {:>10}  {:>8}\n'.format('benchmark', width, 'baseline', 'median', 'change'))
+
+    for name, before, after, change, regressed in comparison:
+        output.write('{:<{}}  {:>10}  {:>10}  {:>+7.1f}%{}\n'.format(
+            name, width, format_time(before), format_time(after), 100 * change,
+            '  slower' if regressed else ''))
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='xo bench',
+        description='Benchmark the hot paths of the library.')
+
+    parser.add_argument('-l', '--list', action='store_true',
+        help='list the benchmarks and exit')
+
+    parser.add_argument('-k', '--filter', action='append', metavar='pattern',
+        help='only run the benchmarks whose name contains or matches the glob pattern (repeatable)')
+
+    parser.add_argument('-r', '--repeat', type=int, default=15,
+        metavar='n',
+        help='the number of samples to take (default: 15)')
+
+    parser.add_argument('-w', '--warmup', type=int, default=3,
+        metavar='n',
+        help='the number of samples to take and throw away first (default: 3)')
+
+    parser.add_argument('-m', '--memory', action='store_true',
+        help='also measure the memory taken by each game')
+
+    parser.add_argument('--json', action='store_true',
+        help='write the results as JSON instead of as a table')
+
+    parser.add_argument('-o', '--output', metavar='path',
+        help='also save the results as JSON, for use as a baseline')
+
+    parser.add_argument('-c', '--compare', metavar='path',
+        help='compare the results against a saved baseline')
+
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+        metavar='fraction',
+        help='how much slower than the baseline a benchmark may be before it is '
+             'reported as a regression (default: 0.1)')
+
+    args = parser.parse_args(args)
+
+    selected = select(args.filter)
+    selected_memory = select(args.filter, _memory_benchmarks) if args.memory else []
+
+    if args.list:
+        for name in selected + selected_memory:
+            print(name)
+        return 0
+
+    if not selected and not selected_memory:
+        parser.error('no benchmarks match: {}'.format(', '.join(args.filter)))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = fromjson(json.load(f))
+
+    results = run(selected, args.repeat, args.warmup) if selected else OrderedDict()
+    memory = run_memory(selected_memory) if selected_memory else None
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(tojson(results, memory), f, indent=2)
+            f.write('\n')
+
+    if args.json:
+        json.dump(tojson(results, memory), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        if results:
+            _write_results(sys.stdout, results)
+
+        if memory:
+            if results:
+                sys.stdout.write('\n')
+
+            _write_memory(sys.stdout, memory)
+
+    if baseline is not None:
+        comparison = compare(baseline, results, args.threshold)
+
+        if args.json:
+            _write_comparison(sys.stderr, comparison)
+        else:
+            sys.stdout.write('\n')
+            _write_comparison(sys.stdout, comparison)
+
+        if any(regressed for *_, regressed in comparison):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,67 +1,553 @@
-from .token import canonical_piece, istoken
+from collections.abc import Sequence
 
+from .record import Record
+from .token import istoken
 
-nrows = 3
-ncols = 3
-ncells = nrows * ncols
+
+class WinningLine(Record):
+    __slots__ = _fields = ('where', 'index', 'positions')
+    _list_fields = ('positions',)
+
+
+class Geometry:
+    """The shape of a board, nrows by ncols, and the number of pieces in a row,
+    k, that are needed to win on it.
+
+    Everything that only depends on the shape, such as the winning lines, the
+    lines through each cell and the symmetries, is computed once per geometry.
+    Geometries are shared so use geometry() rather than creating them directly.
+    """
+
+    def __init__(self, nrows, ncols, k):
+        if nrows < 1 or ncols < 1:
+            raise ValueError('board must have at least one cell: {}x{}'.format(nrows, ncols))
+        if not 1 <= k <= max(nrows, ncols):
+            raise ValueError('win length does not fit on a {}x{} board: {}'.format(nrows, ncols, k))
+
+        self.nrows = nrows
+        self.ncols = ncols
+        self.k = k
+        self.ncells = nrows * ncols
+
+        # Each piece is stored as a bit in one of two masks, one for the x's and
+        # one for the o's. Bit i corresponds to the i-th cell in row-major order.
+        self.full_mask = (1 << self.ncells) - 1
+        self.bits = [1 << i for i in range(self.ncells)]
+        self.positions = [(i // ncols + 1, i % ncols + 1) for i in range(self.ncells)]
+
+        self.lines = list(self._generate_lines())
+        self.line_masks = [self._mask(line.positions) for line in self.lines]
+
+        # The winning lines, along with their masks, that pass through each cell.
+        self.lines_through = [
+            [(mask, line) for line, mask in zip(self.lines, self.line_masks) if mask & bit]
+            for bit in self.bits
+        ]
+
+        # The cells on the most winning lines come first, i.e. the center, then
+        # the corners and then the edges on a 3x3 board.
+        self.cells_by_line_count = sorted(
+            range(self.ncells), key=lambda i: -len(self.lines_through[i])
+        )
+
+        self._symmetries = None
+
+    def __repr__(self):
+        return 'geometry({}, {}, {})'.format(self.nrows, self.ncols, self.k)
+
+    def __reduce__(self):
+        return geometry, (self.nrows, self.ncols, self.k)
+
+    def contains(self, r, c):
+        return 1 <= r <= self.nrows and 1 <= c <= self.ncols
+
+    def index(self, r, c):
+        if self.contains(r, c):
+            return self.ncols * (r - 1) + (c - 1)
+        else:
+            raise IndexError('position out of bounds: {}, {}'.format(r, c))
+
+    @property
+    def symmetries(self):
+        if self._symmetries is None:
+            self._symmetries = _Symmetries(self)
+
+        return self._symmetries
+
+    def _mask(self, positions):
+        mask = 0
+
+        for r, c in positions:
+            mask |= 1 << self.index(r, c)
+
+        return mask
+
+    def _generate_lines(self):
+        nrows, ncols, k = self.nrows, self.ncols, self.k
+
+        for r in range(1, nrows + 1):
+            for c in range(1, ncols - k + 2):
+                yield WinningLine('row', r, tuple((r, c + j) for j in range(k)))
+
+        for c in range(1, ncols + 1):
+            for r in range(1, nrows - k + 2):
+                yield WinningLine('column', c, tuple((r + j, c) for j in range(k)))
+
+        # A line of one piece lies in every direction, so it is only counted
+        # once, as a row.
+        if k > 1:
+            index = 0
+
+            for r in range(1, nrows - k + 2):
+                for c in range(1, ncols - k + 2):
+                    index += 1
+                    yield WinningLine('diagonal', index, tuple((r + j, c + j) for j in range(k)))
+
+            for r in range(1, nrows - k + 2):
+                for c in range(k, ncols + 1):
+                    index += 1
+                    yield WinningLine('diagonal', index, tuple((r + j, c - j) for j in range(k)))
+
+
+class _Symmetries:
+    # The symmetries are permutations that send cell i to cell perms[t][i]. Masks
+    # are transformed a chunk of bits at a time, using tables of the images of
+    # every possible chunk under each symmetry.
+    def __init__(self, geometry):
+        transforms = [_identity, _reflect_rows, _reflect_cols, _rotate_180]
+
+        if geometry.nrows == geometry.ncols:
+            transforms += [_transpose, _rotate_90, _rotate_270, _antitranspose]
+
+        self.perms = perms = []
+
+        for transform in transforms:
+            perm = []
+
+            for r, c in geometry.positions:
+                r, c = transform(r, c, geometry.nrows, geometry.ncols)
+                perm.append(geometry.index(r, c))
+
+            perms.append(tuple(perm))
+
+        self.inverses = [
+            perms.index(tuple(perm.index(i) for i in range(geometry.ncells)))
+            for perm in perms
+        ]
+
+        if geometry.ncells <= 12:
+            self.chunk_size = geometry.ncells
+        else:
+            self.chunk_size = 8
+
+        self.chunk_mask = (1 << self.chunk_size) - 1
+        self.nchunks = -(-geometry.ncells // self.chunk_size)
+
+        # images[t][n][chunk] is the image of the n-th chunk under symmetry t.
+        self.images = [
+            [
+                [
+                    sum(1 << perm[n * self.chunk_size + i] for i in each_bit(chunk))
+                    for chunk in range(1 << min(self.chunk_size, geometry.ncells - n * self.chunk_size))
+                ]
+                for n in range(self.nchunks)
+            ]
+            for perm in perms
+        ]
+
+    def __len__(self):
+        return len(self.perms)
+
+    def transform(self, mask, t):
+        images = self.images[t]
+
+        if self.nchunks == 1:
+            return images[0][mask]
+
+        image = 0
+        for n in range(self.nchunks):
+            image |= images[n][(mask >> (n * self.chunk_size)) & self.chunk_mask]
+
+        return image
+
+    # The canonical form of a board is the image with the smallest
+    # (xmask, omask). It is returned along with the symmetry that maps the board
+    # onto it.
+    def canonical(self, xmask, omask):
+        best_x, best_o, best_t = xmask, omask, 0
+
+        for t in range(1, len(self.perms)):
+            x, o = self.transform(xmask, t), self.transform(omask, t)
+
+            if x < best_x or (x == best_x and o < best_o):
+                best_x, best_o, best_t = x, o, t
+
+        return best_x, best_o, best_t
+
+
+def _identity(r, c, nrows, ncols):
+    return r, c
+
+
+def _reflect_rows(r, c, nrows, ncols):
+    return r, ncols + 1 - c
+
+
+def _reflect_cols(r, c, nrows, ncols):
+    return nrows + 1 - r, c
+
+
+def _rotate_180(r, c, nrows, ncols):
+    return nrows + 1 - r, ncols + 1 - c
+
+
+def _transpose(r, c, nrows, ncols):
+    return c, r
+
+
+def _rotate_90(r, c, nrows, ncols):
+    return c, nrows + 1 - r
+
+
+def _rotate_270(r, c, nrows, ncols):
+    return ncols + 1 - c, r
+
+
+def _antitranspose(r, c, nrows, ncols):
+    return ncols + 1 - c, nrows + 1 - r
+
+
+_geometries = {}
+
+
+def geometry(nrows=3, ncols=3, k=None):
+    if k is None:
+        k = min(nrows, ncols)
+
+    key = (nrows, ncols, k)
+
+    try:
+        return _geometries[key]
+    except KeyError:
+        return _geometries.setdefault(key, Geometry(nrows, ncols, k))
+
+
+def parse_geometry(s):
+    """Parses a geometry given as RxC or RxCxK, for e.g. 3x4x3."""
+    try:
+        sizes = [int(n) for n in s.lower().split('x')]
+    except ValueError:
+        sizes = []
+
+    if len(sizes) not in (2, 3):
+        raise ValueError('geometry must be RxC or RxCxK: {}'.format(s))
+
+    return geometry(*sizes)
+
+
+default_geometry = geometry()
+
+nrows = default_geometry.nrows
+ncols = default_geometry.ncols
+ncells = default_geometry.ncells
+full_mask = default_geometry.full_mask
+
+
+class _GeometryMethod:
+    # Looks the method up on the board's geometry when accessed through a board
+    # and on the default geometry when accessed through the class.
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, board, cls):
+        if board is None:
+            return getattr(default_geometry, self.name)
+        else:
+            return getattr(board.geometry, self.name)
 
 
 class Board:
+    __slots__ = ('xmask', 'omask', 'geometry')
+
     @classmethod
-    def fromstring(cls, layout=''):
-        cells = [' '] * ncells
+    def fromstring(cls, layout='', geometry=None):
+        geometry = geometry or default_geometry
+        bits = geometry.bits
+        xmask, omask = 0, 0
 
         for i, piece in enumerate(layout):
-            if i >= ncells:
+            if i >= geometry.ncells:
                 break
 
-            if istoken(piece):
-                cells[i] = piece
+            if piece == 'x':
+                xmask |= bits[i]
+            elif piece == 'o':
+                omask |= bits[i]
+
+        return cls(xmask, omask, geometry)
+
+    @classmethod
+    def frommasks(cls, xmask, omask, geometry=None):
+        geometry = geometry or default_geometry
+
+        if xmask & ~geometry.full_mask or omask & ~geometry.full_mask:
+            raise ValueError('mask out of bounds: {}, {}'.format(xmask, omask))
+        if xmask & omask:
+            raise ValueError('masks overlap: {}, {}'.format(xmask, omask))
+
+        return cls(xmask, omask, geometry)
 
-        return cls(cells)
+    # This should never be called directly. Use fromstring or frommasks instead.
+    def __init__(self, xmask=0, omask=0, geometry=None):
+        self.xmask = xmask
+        self.omask = omask
+        self.geometry = geometry or default_geometry
 
-    # This should never be called directly. Use fromstring instead.
-    def __init__(self, cells):
-        self.cells = cells
+    @property
+    def emptymask(self):
+        return self.geometry.full_mask & ~(self.xmask | self.omask)
+
+    def mask(self, token):
+        if token == 'x':
+            return self.xmask
+        elif token == 'o':
+            return self.omask
+        else:
+            raise ValueError('must be a token: {}'.format(token))
+
+    @property
+    def cells(self):
+        return [self._piece(bit) for bit in self.geometry.bits]
+
+    def copy(self):
+        return Board(self.xmask, self.omask, self.geometry)
+
+    def canonical(self):
+        xmask, omask, t = self.geometry.symmetries.canonical(self.xmask, self.omask)
+        return Board(xmask, omask, self.geometry), t
 
     def __getitem__(self, pos):
-        return self.cells[self._idx(*pos)]
+        return self._piece(1 << self._idx(*pos))
 
     def __setitem__(self, pos, piece):
-        self.cells[self._idx(*pos)] = canonical_piece(piece)
+        bit = 1 << self._idx(*pos)
+
+        if piece == 'x':
+            self.xmask |= bit
+            self.omask &= ~bit
+        elif piece == 'o':
+            self.omask |= bit
+            self.xmask &= ~bit
+        else:
+            self.xmask &= ~bit
+            self.omask &= ~bit
 
     def __iter__(self):
         return self._each_piece()
 
     def _each_piece(self):
-        for i, piece in enumerate(self.cells):
-            yield self._idx_to_row(i), self._idx_to_col(i), piece
+        for (r, c), bit in zip(self.geometry.positions, self.geometry.bits):
+            yield r, c, self._piece(bit)
+
+    def _piece(self, bit):
+        if self.xmask & bit:
+            return 'x'
+        elif self.omask & bit:
+            return 'o'
+        else:
+            return ' '
 
     def toascii(self):
-        return '\n---+---+---\n'.join([
-            ' {} | {} | {} '.format(self.cells[0], self.cells[1], self.cells[2]),
-            ' {} | {} | {} '.format(self.cells[3], self.cells[4], self.cells[5]),
-            ' {} | {} | {} '.format(self.cells[6], self.cells[7], self.cells[8])
-        ])
+        cells = self.cells
+        ncols = self.geometry.ncols
+
+        return '\n{}\n'.format('+'.join(['---'] * ncols)).join(
+            '|'.join(' {} '.format(piece) for piece in cells[i:i + ncols])
+            for i in range(0, len(cells), ncols)
+        )
 
     def __str__(self):
         return ''.join(piece if istoken(piece) else '.' for piece in self.cells)
 
-    @staticmethod
-    def contains(r, c):
-        return 1 <= r <= nrows and 1 <= c <= ncols
+    contains = _GeometryMethod('contains')
 
-    @classmethod
-    def _idx(cls, r, c):
-        if cls.contains(r, c):
-            return ncols * (r - 1) + (c - 1)
-        else:
-            raise IndexError('position out of bounds: {}, {}'.format(r, c))
+    _idx = _GeometryMethod('index')
+
+    def _idx_to_row(self, i):
+        return i // self.geometry.ncols + 1
+
+    def _idx_to_col(self, i):
+        return i % self.geometry.ncols + 1
+
+
+def position(i, geometry=default_geometry):
+    return geometry.positions[i]
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def each_bit(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+
+# The symmetries of the default geometry: the identity, the reflections and the
+# rotations. Each one is a permutation that sends cell i to cell
+# symmetries[t][i].
+symmetries = default_geometry.symmetries.perms
+
+
+def inverse_symmetry(t, geometry=default_geometry):
+    return geometry.symmetries.inverses[t]
+
+
+def transform_mask(mask, t, geometry=default_geometry):
+    return geometry.symmetries.transform(mask, t)
+
+
+def transform_position(pos, t, geometry=default_geometry):
+    return geometry.positions[geometry.symmetries.perms[t][geometry.index(*pos)]]
+
+
+def canonical_masks(xmask, omask, geometry=default_geometry):
+    return geometry.symmetries.canonical(xmask, omask)
+
+
+class BoardRecords(Sequence):
+    """A read-only sequence of the boards stored in a buffer of fixed-width
+    records, such as bytes, a memoryview or an mmap of a file.
+
+    Each record holds the cells of a board in the format of str(board), i.e.
+    one byte per cell with x for x, o for o and anything else for an empty
+    cell. The records are stride bytes apart, which is the number of cells by
+    default, so that for e.g. a file with one board per line can be read with
+    a stride of ncells + 1. The last record may then be short of a separator.
+
+    Nothing is copied up front. Boards are decoded as they are accessed, and
+    toarray gives a NumPy view of the cells without decoding them at all.
+    """
+
+    def __init__(self, buffer, geometry=None, stride=None):
+        self.geometry = geometry or default_geometry
+        self.stride = self.geometry.ncells if stride is None else stride
+
+        if self.stride < self.geometry.ncells:
+            raise ValueError('stride is shorter than a board: {}'.format(self.stride))
+
+        self._view = memoryview(buffer).cast('B')
+
+        extra = self.stride - self.geometry.ncells
+        length = len(self._view) + extra
+
+        if length % self.stride not in (0, extra):
+            raise ValueError('buffer is not a whole number of records: {} bytes'.format(len(self._view)))
+
+        self._len = length // self.stride
+        self._decoded = _decoded_records.setdefault(self.geometry, {})
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+
+            if step == 1:
+                stop = max(start, stop)
+                view = self._view[start * self.stride:stop * self.stride]
+                return BoardRecords(view, self.geometry, self.stride)
+            else:
+                return [self[j] for j in range(start, stop, step)]
+
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('record index out of range: {}'.format(i))
+
+        return Board(*self._masks(i * self.stride), self.geometry)
+
+    def __iter__(self):
+        geometry = self.geometry
+
+        for xmask, omask in self.masks():
+            yield Board(xmask, omask, geometry)
+
+    def masks(self):
+        """Yields the (xmask, omask) bitboards of each record, which is faster
+        than creating a board for each one.
+        """
+        masks = self._masks
+
+        for offset in range(0, self._len * self.stride, self.stride):
+            yield masks(offset)
+
+    def toarray(self):
+        """A read-only NumPy view of the cells, with one row per board, that
+        can be passed straight to arbiter.outcome_batch.
+        """
+        import numpy as np
+
+        cells = np.ndarray(
+            shape=(self._len, self.geometry.ncells),
+            dtype=np.uint8,
+            buffer=self._view,
+            strides=(self.stride, 1)
+        )
+        cells.flags.writeable = False
+
+        return cells
+
+    def release(self):
+        """Releases the buffer, for e.g. so that an mmap can be closed. Any
+        arrays returned by toarray must be deleted first.
+        """
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _masks(self, offset):
+        record = self._view[offset:offset + self.geometry.ncells].tobytes()
+
+        try:
+            return self._decoded[record]
+        except KeyError:
+            masks = _decode_record(record, self.geometry)
+
+            if len(self._decoded) < _max_decoded_records:
+                self._decoded[record] = masks
+
+            return masks
+
+
+# The bitboards of the records that have been decoded, keyed by geometry and
+# then by the bytes of the record. There are only 3^9 boards of the default
+# geometry, in the usual format, so looking a record up is much faster than
+# decoding it. The number of entries is capped to cope with larger geometries
+# and records that use unusual bytes for empty cells.
+_max_decoded_records = 1 << 16
+
+_decoded_records = {}
+
+
+def _decode_record(record, geometry):
+    xmask, omask = 0, 0
+
+    for i, piece in enumerate(record):
+        if piece == _x:
+            xmask |= geometry.bits[i]
+        elif piece == _o:
+            omask |= geometry.bits[i]
+
+    return xmask, omask
 
-    @staticmethod
-    def _idx_to_row(i):
-        return i // ncols + 1
 
-    @staticmethod
-    def _idx_to_col(i):
-        return i % ncols + 1
+_x = ord('x')
+_o = ord('o')
@@ -0,0 +1,119 @@
+"""Opening books of minimax results for boards other than the standard one.
+
+A book is generated ahead of time by xo.openings and holds the result of
+evaluating every legal position with at most ply pieces on the board, for each
+token that may move in it. The early positions are the most expensive to
+search, so a book spares the AI its longest searches.
+
+A book is made up of a 14-byte header followed by the records, sorted by key.
+A record holds the canonical form of a board, as two little-endian masks of
+ceil(ncells / 8) bytes, the mask of the optimal moves in the same orientation
+and a 4-byte trailer:
+
+    int16  the score
+    uint8  the depth
+    uint8  1 if o is to move and 0 if x is
+
+The books that come with xo live in DEFAULT_DIRECTORY and are named after their
+geometry, for e.g. 3x4x3.bin.
+"""
+
+import os
+import struct
+
+from .board import geometry as _geometry
+
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(__file__), 'books')
+
+MAGIC = b'XOOB'
+FORMAT_VERSION = 1
+
+
+_header = struct.Struct('<4sBBBBBBI')
+_trailer = struct.Struct('<hBB')
+
+
+def filename(geometry):
+    return '{}x{}x{}.bin'.format(geometry.nrows, geometry.ncols, geometry.k)
+
+
+def _mask_size(geometry):
+    return (geometry.ncells + 7) // 8
+
+
+def write(path, geometry, ply, results, scoring_version):
+    """Writes a book of results, which are ((xmask, omask, token), (score,
+    depth, moves)) pairs for canonical boards.
+    """
+    size = _mask_size(geometry)
+    records = sorted(results, key=lambda result: result[0])
+
+    with open(path, 'wb') as f:
+        f.write(_header.pack(MAGIC, FORMAT_VERSION, scoring_version,
+            geometry.nrows, geometry.ncols, geometry.k, ply, len(records)))
+
+        for (xmask, omask, token), (score, depth, moves) in records:
+            f.write(xmask.to_bytes(size, 'little'))
+            f.write(omask.to_bytes(size, 'little'))
+            f.write(moves.to_bytes(size, 'little'))
+            f.write(_trailer.pack(score, depth, token == 'o'))
+
+
+class OpeningBook:
+    def __init__(self, path, scoring_version):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < _header.size:
+            raise ValueError('not an opening book: {}'.format(path))
+
+        magic, version, scoring, nrows, ncols, k, ply, count = _header.unpack_from(data)
+
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('not an opening book: {}'.format(path))
+        if scoring != scoring_version:
+            raise ValueError('opening book is out of date: {}'.format(path))
+
+        self.geometry = _geometry(nrows, ncols, k)
+        self.ply = ply
+
+        size = _mask_size(self.geometry)
+        record_size = 3 * size + _trailer.size
+
+        if len(data) != _header.size + count * record_size:
+            raise ValueError('not an opening book: {}'.format(path))
+
+        self._results = {}
+
+        for offset in range(_header.size, len(data), record_size):
+            xmask = int.from_bytes(data[offset:offset + size], 'little')
+            omask = int.from_bytes(data[offset + size:offset + 2 * size], 'little')
+            moves = int.from_bytes(data[offset + 2 * size:offset + 3 * size], 'little')
+            score, depth, o_to_move = _trailer.unpack_from(data, offset + 3 * size)
+
+            self._results[xmask, omask, 'o' if o_to_move else 'x'] = (score, depth, moves)
+
+    def __len__(self):
+        return len(self._results)
+
+    def lookup(self, xmask, omask, token):
+        """Returns the (score, depth, moves) of the board, with the moves as a
+        mask, or None if it isn't in the book.
+        """
+        symmetries = self.geometry.symmetries
+        xmask, omask, t = symmetries.canonical(xmask, omask)
+        result = self._results.get((xmask, omask, token))
+
+        if result is None:
+            return None
+
+        score, depth, moves = result
+        return score, depth, symmetries.transform(moves, symmetries.inverses[t])
+
+
+def load(geometry, scoring_version, directory=DEFAULT_DIRECTORY):
+    try:
+        return OpeningBook(os.path.join(directory, filename(geometry)), scoring_version)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,176 @@
+"""A persistent cache of minimax results that is shared by processes and
+survives restarts.
+
+The results are stored in an SQLite database in a configurable directory. It
+uses write-ahead logging so that any number of processes can read from it while
+one of them writes, and writers wait their turn rather than fail.
+
+Results are stored under the canonical form of the board, along with the
+scoring version they were computed with, so that symmetric boards share an
+entry and results computed with another scoring are never used. Once the cache
+holds more than maxsize results, the oldest ones are evicted.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'xo'
+)
+
+FILENAME = 'minimax.sqlite3'
+
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    scoring_version INTEGER NOT NULL,
+    geometry TEXT NOT NULL,
+    board TEXT NOT NULL,
+    token TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    moves TEXT NOT NULL,
+    UNIQUE (scoring_version, geometry, board, token)
+)
+'''
+
+
+class PersistentCache:
+    def __init__(self, scoring_version, directory=None, maxsize=1 << 20, timeout=30.0):
+        if maxsize < 0:
+            raise ValueError('maxsize must be non-negative: {}'.format(maxsize))
+
+        self.scoring_version = scoring_version
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.maxsize = maxsize
+        self.path = os.path.join(self.directory, FILENAME)
+
+        self._timeout = timeout
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._open()
+
+        try:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(_schema)
+
+            with self._transaction():
+                self._connection.execute(
+                    'DELETE FROM results WHERE scoring_version != ?', (scoring_version,))
+        except Exception:
+            self._connection.close()
+            raise
+
+    def __len__(self):
+        self._check_process()
+
+        with self._lock:
+            count, = self._connection.execute(
+                'SELECT COUNT(*) FROM results WHERE scoring_version = ?',
+                (self.scoring_version,)).fetchone()
+
+        return count
+
+    def get(self, geometry, xmask, omask, token):
+        """Returns the (score, depth, moves) of the board, with the moves as a
+        mask, or None if it isn't in the cache.
+        """
+        symmetries = geometry.symmetries
+        xmask, omask, t = symmetries.canonical(xmask, omask)
+
+        self._check_process()
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT score, depth, moves FROM results '
+                'WHERE scoring_version = ? AND geometry = ? AND board = ? AND token = ?',
+                self._key(geometry, xmask, omask, token)).fetchone()
+
+        if row is None:
+            return None
+
+        score, depth, moves = row
+        return score, depth, symmetries.transform(int(moves), symmetries.inverses[t])
+
+    def put(self, geometry, xmask, omask, token, result):
+        symmetries = geometry.symmetries
+        xmask, omask, t = symmetries.canonical(xmask, omask)
+        score, depth, moves = result
+
+        self._check_process()
+
+        with self._lock, self._transaction():
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results '
+                '(scoring_version, geometry, board, token, score, depth, moves) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                self._key(geometry, xmask, omask, token) +
+                (score, depth, str(symmetries.transform(moves, t))))
+
+            # Ids only ever increase, so the rows with the smallest ids are the
+            # oldest ones.
+            self._connection.execute(
+                'DELETE FROM results WHERE id <= (SELECT MAX(id) FROM results) - ?',
+                (self.maxsize,))
+
+    def clear(self):
+        self._check_process()
+
+        with self._lock, self._transaction():
+            self._connection.execute('DELETE FROM results')
+
+    def close(self):
+        self._check_process()
+
+        with self._lock:
+            self._connection.close()
+
+    def _open(self):
+        # The connection is shared by the threads of the process, one at a time.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=self._timeout,
+            isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._pid = os.getpid()
+
+    # SQLite connections must not be carried across a fork, and the lock may
+    # have been held by another thread at the time, so a forked process, such
+    # as a worker of ai.evaluate_many, opens its own. The parent's connection
+    # is left open since closing it could interfere with the parent's use of
+    # the database.
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._inherited_connection = self._connection
+            self._open()
+
+    def _key(self, geometry, xmask, omask, token):
+        layout = ''.join(
+            'x' if xmask & bit else 'o' if omask & bit else '.' for bit in geometry.bits
+        )
+
+        return (self.scoring_version,
+            '{}x{}x{}'.format(geometry.nrows, geometry.ncols, geometry.k), layout, token)
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+
+class _Transaction:
+    # Takes the write lock up front so that concurrent writers wait for each
+    # other, up to the connection's timeout, rather than fail part way through.
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        self._connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._connection.execute('COMMIT')
+        else:
+            self._connection.execute('ROLLBACK')
@@ -1,9 +1,11 @@
+import os
 import random
 import re
 import sys
 import time
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 from . import ai, game
 from .token import isempty, istoken, other_token
@@ -30,13 +32,16 @@ class Console:
 
 
 class Orchestrator:
-    def __init__(self, player1=Player('x', True), player2=Player('o', False), console=Console()):
+    def __init__(self, player1=Player('x', True), player2=Player('o', False), console=Console(),
+                 engine=ai.ENGINE_MINIMAX):
         if not istoken(player1.token):
             raise ValueError('player1 has an invalid token: {}'.format(player1.token))
         if not istoken(player2.token):
             raise ValueError('player2 has an invalid token: {}'.format(player2.token))
         if player1.token == player2.token:
             raise ValueError('both players cannot play with the same token: {}'.format(player1.token))
+        if engine not in ai.ENGINES:
+            raise ValueError('unknown engine: {}'.format(engine))
 
         self._first_player = player1
 
@@ -45,6 +50,7 @@ class Orchestrator:
         self._players[player2.token] = player2
 
         self._console = console
+        self._engine = engine
 
         self._num_human_players = 0
         if player1.ishuman:
@@ -52,11 +58,17 @@ class Orchestrator:
         if player2.ishuman:
             self._num_human_players += 1
 
-    def start(self, rounds=50):
+    def start(self, rounds=50, jobs=1, seed=None):
+        if jobs < 0:
+            raise ValueError('jobs must be non-negative: {}'.format(jobs))
+
         start_time = time.time()
 
         try:
-            self._play(rounds)
+            if self._num_human_players == 0 and jobs != 1:
+                self._play_headless(rounds, jobs, seed)
+            else:
+                self._play(rounds)
         except KeyboardInterrupt:
             self._console.writeln()
             if self._num_human_players > 0:
@@ -99,6 +111,33 @@ class Orchestrator:
                 if playing:
                     self._game.restart()
 
+    # The rounds are split into chunks that are played in separate processes.
+    # Each chunk is played with its own random number generator, seeded from
+    # the seed and the chunk's number, so a seed always gives the same games
+    # however many processes there are. The processes only send back one byte
+    # per game, which is merged into the game's statistics.
+    def _play_headless(self, rounds, jobs, seed):
+        self._game = game.Game()
+
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if seed is None:
+            seed = random.randrange(1 << 32)
+
+        chunk_size = max(1, min(_max_chunk_size, -(-rounds // (4 * jobs))))
+        chunks = [
+            (self._first_player.token, min(chunk_size, rounds - start), seed + n, self._engine)
+            for n, start in enumerate(range(0, rounds, chunk_size))
+        ]
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for results in executor.map(_play_rounds, *zip(*chunks)):
+                self._console.write(results.decode('ascii'))
+                _merge_results(self._game.statistics, results)
+
+        if rounds > 0:
+            self._console.writeln()
+
     def _init_and_start_game(self):
         self._game = game.Game()
         self._game.start(self._first_player.token)
@@ -127,7 +166,7 @@ class Orchestrator:
                 else:
                     return event
         else:
-            positions = ai.evaluate(self._game.board, self._game.turn).positions
+            positions = ai.evaluate(self._game.board, self._game.turn, engine=self._engine).positions
             random.shuffle(positions)
             r, c = positions[0]
             event = self._game.moveto(r, c)
@@ -200,8 +239,8 @@ class Orchestrator:
         self._console.writeln('Game statistics')
         self._console.writeln('---------------')
         if self._num_human_players == 0:
-            self._console.writeln('Total games played: {} ({:.3f} secs)'.format(
-                stats['total'], self._elapsed_time))
+            self._console.writeln('Total games played: {} ({:.3f} secs, {:.1f} games/sec)'.format(
+                stats['total'], self._elapsed_time, stats['total'] / max(self._elapsed_time, 1e-9)))
         else:
             self._console.writeln('Total games played: {}'.format(stats['total']))
         self._console.writeln('Number of times x won: {}'.format(stats['xwins']))
@@ -212,10 +251,63 @@ class Orchestrator:
         return self._players[self._game.turn]
 
 
-def main():
+_max_chunk_size = 1000
+
+
+def _play_rounds(token, rounds, seed, engine=ai.ENGINE_MINIMAX):
+    """Lets the computer play itself the given number of times, with token
+    playing first, and returns the result of each game as a byte: x or o for
+    the winner and . for a squashed game.
+    """
+    rng = random.Random(seed)
+    results = bytearray()
+
+    g = game.Game()
+    g.start(token)
+
+    while True:
+        r, c = rng.choice(ai.evaluate(g.board, g.turn, engine=engine).positions)
+        event = g.moveto(r, c)
+
+        if event.name == game.EVENT_NAME_GAMEOVER:
+            if event.reason == game.EVENT_REASON_WINNER:
+                results += event.last_move.token.encode('ascii')
+            else:
+                results += b'.'
+
+            if len(results) == rounds:
+                return bytes(results)
+
+            g.restart()
+
+
+def _merge_results(statistics, results):
+    statistics['total'] += len(results)
+    statistics['xwins'] += results.count(b'x')
+    statistics['owins'] += results.count(b'o')
+    statistics['squashed'] += results.count(b'.')
+
+
+# Subcommands of the xo script, each of which is the main function of a
+# module. They are imported on demand to keep the game's start up fast.
+_commands = {
+    'bench': 'xo.bench',
+    'evaluate': 'xo.evaluate'
+}
+
+
+def main(args=None):
     import argparse
 
-    parser = argparse.ArgumentParser(description='A Tic-tac-toe game.')
+    if args is None:
+        args = sys.argv[1:]
+
+    if args and args[0] in _commands:
+        import importlib
+        return importlib.import_module(_commands[args[0]]).main(args[1:])
+
+    parser = argparse.ArgumentParser(description='A Tic-tac-toe game.',
+        epilog='other commands: {} (see xo COMMAND -h)'.format(', '.join(sorted(_commands))))
 
     player_choices = ['human', 'computer']
 
@@ -228,10 +320,26 @@ def main():
         metavar='n',
         help='the number of rounds to let two computer players play (default: 50)')
 
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        metavar='n',
+        help='the number of processes to play the rounds in, 0 for one per CPU (default: 1)')
+
+    parser.add_argument('-s', '--seed', type=int,
+        metavar='n',
+        help='the seed for the computer players\' choice between equally good moves '
+             'when playing in more than one process (default: random)')
+
     parser.add_argument('-f', '--first', choices=['x', 'o'], default='x',
         help='who plays first (default: x)')
 
-    args = parser.parse_args()
+    parser.add_argument('-e', '--engine', default=ai.ENGINE_MINIMAX,
+        choices=ai.ENGINES,
+        help='how the computer searches for its moves (default: minimax)')
+
+    args = parser.parse_args(args)
+
+    if args.jobs < 0:
+        parser.error('jobs must be non-negative: {}'.format(args.jobs))
 
     players = {
         'x': Player('x', args.x == 'human'),
@@ -243,6 +351,6 @@ def main():
 
     rounds = max(0, args.rounds)
 
-    Orchestrator(player1, player2).start(rounds)
+    Orchestrator(player1, player2, engine=args.engine).start(rounds, args.jobs, args.seed)
 
     return 0
@@ -0,0 +1,210 @@
+"""Evaluates boards read from standard input and writes the results to standard
+output, for use in shell pipelines.
+
+Usage: xo evaluate [-h] [-g RxCxK] [-e ENGINE] [-j N] [--chunksize N]
+
+Each line of the input is either a board, in the format of str(board), and the
+token to move, separated by whitespace:
+
+    x...o.... x
+
+or a JSON object with board and token keys:
+
+    {"id": 7, "board": "x...o....", "token": "x"}
+
+Each line of the output is a JSON object with the keys of the input, the score,
+depth and positions of the AI's evaluation and the arbiter's outcome. A board
+that can't be evaluated gets an error instead of the evaluation, and a line
+that can't be read gets just an error and its line number.
+
+The input is read a block of --chunksize lines per process at a time, and every
+line of a block is written before the next block is read, so the input may be
+much larger than memory. The boards of a block are evaluated in chunks with
+ai.evaluate_many, in as many processes as --jobs says, so boards that are the
+same up to symmetry are only evaluated once per chunk.
+"""
+
+import itertools
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from . import ai, arbiter
+from .board import Board, default_geometry, parse_geometry
+from .token import istoken, other_token
+
+
+# The number of lines that are written at a time.
+_output_batch_size = 1024
+
+
+def evaluate_lines(lines, geometry=None, engine=ai.ENGINE_MINIMAX, jobs=1, chunksize=256):
+    """Parses and evaluates each line and returns a generator of the results,
+    as dicts, in the same order.
+
+    The lines are read a block of chunksize lines per process at a time, and
+    the results of a block, including those of the lines that can't be
+    evaluated, are all yielded before the next block is read.
+    """
+    if jobs < 0:
+        raise ValueError('jobs must be non-negative: {}'.format(jobs))
+    if chunksize < 1:
+        raise ValueError('chunksize must be positive: {}'.format(chunksize))
+
+    geometry = geometry or default_geometry
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1:
+        yield from _evaluate_blocks(lines, geometry, engine, jobs, chunksize, None)
+    else:
+        # The processes are started once and then evaluate every block.
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from _evaluate_blocks(lines, geometry, engine, jobs, chunksize, executor)
+
+
+def _evaluate_blocks(lines, geometry, engine, jobs, chunksize, executor):
+    lines = iter(lines)
+    block_size = jobs * chunksize
+    number = 0
+
+    while True:
+        block = list(itertools.islice(lines, block_size))
+
+        if not block:
+            return
+
+        entries = []
+
+        for line in block:
+            number += 1
+
+            if line.strip():
+                entries.append(_parse(line, number, geometry))
+
+        positions = [(board, token) for result, board, token in entries if board is not None]
+        evaluations = ai.evaluate_many(positions, engine=engine, jobs=jobs, chunksize=chunksize,
+            executor=executor)
+
+        for result, board, token in entries:
+            if board is not None:
+                evaluation = next(evaluations)
+                result['score'] = evaluation.score
+                result['depth'] = evaluation.depth
+                result['positions'] = [list(position) for position in evaluation.positions]
+
+            yield result
+
+
+# Returns the result so far, along with the board and token if the board
+# should be evaluated.
+def _parse(line, number, geometry):
+    line = line.strip()
+
+    if line.startswith('{'):
+        try:
+            result = json.loads(line)
+        except ValueError as e:
+            return { 'line': number, 'error': 'invalid JSON: {}'.format(e) }, None, None
+
+        if not isinstance(result, dict):
+            return { 'line': number, 'error': 'not a JSON object' }, None, None
+
+        layout = result.get('board')
+        token = result.get('token')
+    else:
+        fields = line.split()
+
+        if len(fields) != 2:
+            return { 'line': number, 'error': 'expected a board and a token: {}'.format(line) }, None, None
+
+        layout, token = fields
+        result = { 'board': layout, 'token': token }
+
+    if not isinstance(layout, str) or len(layout) != geometry.ncells:
+        result['line'] = number
+        result['error'] = 'board must have {} cells: {}'.format(geometry.ncells, layout)
+        return result, None, None
+
+    if not istoken(token):
+        result['line'] = number
+        result['error'] = 'must be a token: {}'.format(token)
+        return result, None, None
+
+    board = Board.fromstring(layout, geometry)
+    outcome = arbiter.outcome(board, token)
+    result['outcome'] = outcome.asdict()
+
+    if outcome.status != arbiter.STATUS_IN_PROGRESS:
+        result['error'] = 'no available moves' if outcome.status == arbiter.STATUS_GAMEOVER \
+            else 'invalid board'
+        return result, None, None
+
+    piece_counts = outcome.piece_counts
+
+    if piece_counts[token + 's'] > piece_counts[other_token(token) + 's']:
+        result['error'] = "not {}'s turn to play".format(token)
+        return result, None, None
+
+    return result, board, token
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='xo evaluate',
+        description='Evaluate the boards read from standard input and write the results '
+                    'to standard output as JSON lines.')
+
+    parser.add_argument('-g', '--geometry', default='3x3x3',
+        metavar='RxCxK',
+        help='the size of the boards and the number in a row that wins (default: 3x3x3)')
+
+    parser.add_argument('-e', '--engine', default=ai.ENGINE_MINIMAX,
+        choices=ai.ENGINES,
+        help='how to search for the best moves (default: minimax)')
+
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        metavar='n',
+        help='the number of processes to evaluate the boards in, 0 for one per CPU (default: 1)')
+
+    parser.add_argument('--chunksize', type=int, default=256,
+        metavar='n',
+        help='the number of boards that are evaluated at a time (default: 256)')
+
+    args = parser.parse_args(args)
+
+    try:
+        geometry = parse_geometry(args.geometry)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.jobs < 0:
+        parser.error('jobs must be non-negative: {}'.format(args.jobs))
+    if args.chunksize < 1:
+        parser.error('chunksize must be positive: {}'.format(args.chunksize))
+
+    results = evaluate_lines(sys.stdin, geometry, args.engine, args.jobs, args.chunksize)
+    output = []
+
+    for result in results:
+        output.append(json.dumps(result))
+
+        if len(output) == _output_batch_size:
+            output.append('')
+            sys.stdout.write('\n'.join(output))
+            output = []
+
+    if output:
+        output.append('')
+        sys.stdout.write('\n'.join(output))
+
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
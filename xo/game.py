@@ -1,6 +1,9 @@
+from array import array
+
 from . import arbiter
 from .error import IllegalStateError
-from .board import Board
+from .board import Board, default_geometry
+from .record import Record
 from .token import isempty, istoken, other_token
 
 
@@ -20,86 +23,256 @@ EVENT_REASON_WINNER        = 'winner'
 EVENT_REASON_SQUASHED      = 'squashed'
 
 
+class Event(Record):
+    __slots__ = _fields = ('name', 'reason', 'last_move', 'details')
+    _list_fields = ('details',)
+
+
+class Move(Record):
+    __slots__ = _fields = ('r', 'c', 'token')
+
+
+# Every event, except for a win, is one of a small number of possibilities so
+# they are created once, on first use, and shared.
+_invalid_move_events = {
+    reason: Event(EVENT_NAME_INVALID_MOVE, reason, None, None)
+    for reason in [EVENT_REASON_OUT_OF_BOUNDS, EVENT_REASON_OCCUPIED]
+}
+
+_moves = { 'x': {}, 'o': {} }
+_next_turn_events = { 'x': {}, 'o': {} }
+_squashed_events = { 'x': {}, 'o': {} }
+
+
+def _move(token, r, c):
+    moves = _moves[token]
+
+    try:
+        return moves[r, c]
+    except KeyError:
+        return moves.setdefault((r, c), Move(r, c, token))
+
+
+def _next_turn_event(token, r, c):
+    events = _next_turn_events[token]
+
+    try:
+        return events[r, c]
+    except KeyError:
+        event = Event(EVENT_NAME_NEXT_TURN, None, _move(token, r, c), None)
+        return events.setdefault((r, c), event)
+
+
+def _squashed_event(token, r, c):
+    events = _squashed_events[token]
+
+    try:
+        return events[r, c]
+    except KeyError:
+        event = Event(EVENT_NAME_GAMEOVER, EVENT_REASON_SQUASHED, _move(token, r, c), None)
+        return events.setdefault((r, c), event)
+
+
 class Game:
-    def __init__(self):
+    # The recorder, if any, is an object such as an xo.archive.ArchiveWriter
+    # whose record(first, moves) is called with the token that played first
+    # and the cell indexes of the moves of every finished game. A game that
+    # has ended may still be undone, so it is only recorded once it is final,
+    # i.e. when the game is restarted or closed.
+    def __init__(self, geometry=None, recorder=None):
+        self.geometry = geometry or default_geometry
+        self.recorder = recorder
         self.state = STATE_INIT
         self.board = None
         self.turn = None
         self.statistics = { 'total': 0, 'xwins': 0, 'owins': 0, 'squashed': 0 }
 
+        self._first_turn = None
+        self._history = array('H')
+        self._history_is_shared = False
+        self._length = 0
+
     def next_turn(self):
         if self.turn:
             return other_token(self.turn)
         else:
             return None
 
+    @property
+    def history(self):
+        """The moves of the current game, oldest first, without the ones that
+        were undone.
+        """
+        positions = self.geometry.positions
+        token = self._first_turn
+        moves = []
+
+        for i in self._history[:self._length]:
+            r, c = positions[i]
+            moves.append(_move(token, r, c))
+            token = other_token(token)
+
+        return moves
+
     def start(self, token):
         if self.state == STATE_INIT:
             if not istoken(token):
                 raise ValueError('must be a token: {}'.format(token))
 
             self.state = STATE_PLAYING
-            self.board = Board.fromstring()
             self.turn = token
+            self._new_game()
         else:
             raise IllegalStateError(self.state)
 
     def moveto(self, r, c):
         if self.state == STATE_PLAYING:
-            if Board.contains(r, c):
+            if self.geometry.contains(r, c):
                 if isempty(self.board[r, c]):
-                    self.board[r, c] = self.turn
-                    last_move = { 'r': r, 'c': c, 'token': self.turn }
-
-                    outcome = arbiter.outcome(self.board, self.turn)
-
-                    if outcome['status'] == arbiter.STATUS_IN_PROGRESS:
-                        self.turn = other_token(self.turn)
-
-                        return {
-                            'name': EVENT_NAME_NEXT_TURN,
-                            'last_move': last_move
-                        }
-                    elif outcome['status'] == arbiter.STATUS_GAMEOVER:
-                        self.state = STATE_GAMEOVER
-                        self.statistics['total'] += 1
-
-                        if outcome['reason'] == arbiter.REASON_WINNER:
-                            self._restart_turn = self.turn
-                            self.statistics['{}wins'.format(self.turn)] += 1
-
-                            return {
-                                'name': EVENT_NAME_GAMEOVER,
-                                'reason': EVENT_REASON_WINNER,
-                                'last_move': last_move,
-                                'details': outcome['details']
-                            }
-                        elif outcome['reason'] == arbiter.REASON_SQUASHED:
-                            self._restart_turn = other_token(self.turn)
-                            self.statistics['squashed'] += 1
-
-                            return {
-                                'name': EVENT_NAME_GAMEOVER,
-                                'reason': EVENT_REASON_SQUASHED,
-                                'last_move': last_move
-                            }
+                    if self._history_is_shared:
+                        self._own_history()
+
+                    # A new move replaces the moves that were undone, if any.
+                    if self._length < len(self._history):
+                        del self._history[self._length:]
+
+                    self._history.append(self.geometry.ncols * (r - 1) + c - 1)
+
+                    return self._play(r, c)
                 else:
-                    return {
-                        'name': EVENT_NAME_INVALID_MOVE,
-                        'reason': EVENT_REASON_OCCUPIED
-                    }
+                    return _invalid_move_events[EVENT_REASON_OCCUPIED]
             else:
-                return {
-                    'name': EVENT_NAME_INVALID_MOVE,
-                    'reason': EVENT_REASON_OUT_OF_BOUNDS
-                }
+                return _invalid_move_events[EVENT_REASON_OUT_OF_BOUNDS]
         else:
             raise IllegalStateError(self.state)
 
+    def undo(self):
+        """Takes back the last move of the current game, even one that ended
+        it, and returns it, or None if there is no move to take back.
+        """
+        if self.state == STATE_INIT:
+            raise IllegalStateError(self.state)
+
+        if self._length == 0:
+            return None
+
+        self._length -= 1
+        r, c = self.geometry.positions[self._history[self._length]]
+
+        if self.state == STATE_GAMEOVER:
+            self.state = STATE_PLAYING
+            self.statistics['total'] -= 1
+            self.statistics[self._result] -= 1
+        else:
+            self.turn = other_token(self.turn)
+
+        self.board[r, c] = ' '
+        self._empty_count += 1
+
+        return _move(self.turn, r, c)
+
+    def redo(self):
+        """Replays the last move that was taken back and returns its event, or
+        None if there is no move to replay.
+        """
+        if self.state == STATE_INIT:
+            raise IllegalStateError(self.state)
+
+        if self._length == len(self._history):
+            return None
+
+        r, c = self.geometry.positions[self._history[self._length]]
+        return self._play(r, c)
+
+    def fork(self):
+        """Returns an independent copy of the game, for e.g. trying out a
+        variation. The copy shares the move history with the game until
+        either of them changes it.
+        """
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game.statistics = dict(self.statistics)
+
+        # A variation isn't a game that was played, so it isn't recorded.
+        game.recorder = None
+
+        if self.state != STATE_INIT:
+            game.board = self.board.copy()
+            game._history_is_shared = self._history_is_shared = True
+
+        return game
+
     def restart(self):
         if self.state == STATE_GAMEOVER:
+            self._record()
+
             self.state = STATE_PLAYING
-            self.board = Board.fromstring()
             self.turn = self._restart_turn
+            self._new_game()
         else:
             raise IllegalStateError(self.state)
+
+    def close(self):
+        """Records the current game, if it has ended, and detaches the
+        recorder. Call it once the game won't be played any further.
+        """
+        if self.state == STATE_GAMEOVER:
+            self._record()
+
+        self.recorder = None
+
+    def _record(self):
+        if self.recorder is not None:
+            self.recorder.record(self._first_turn, self._history[:self._length])
+
+    def _new_game(self):
+        self.board = Board.fromstring(geometry=self.geometry)
+        self._empty_count = self.geometry.ncells
+        self._first_turn = self.turn
+
+        # The cell indexes of the moves of the current game. The first _length
+        # of them have been played and the rest were undone, so they can be
+        # redone.
+        self._history = array('H')
+        self._history_is_shared = False
+        self._length = 0
+
+    def _own_history(self):
+        self._history = self._history[:self._length]
+        self._history_is_shared = False
+
+    def _play(self, r, c):
+        self.board[r, c] = self.turn
+        self._empty_count -= 1
+        self._length += 1
+
+        # The game was in progress before this move, so only the lines through
+        # it could have been completed.
+        winning_lines = arbiter.lines_completed_by(self.board, r, c)
+
+        if winning_lines:
+            self.state = STATE_GAMEOVER
+            self.statistics['total'] += 1
+            self._restart_turn = self.turn
+            self._result = '{}wins'.format(self.turn)
+            self.statistics[self._result] += 1
+
+            return Event(
+                EVENT_NAME_GAMEOVER,
+                EVENT_REASON_WINNER,
+                _move(self.turn, r, c),
+                winning_lines
+            )
+        elif self._empty_count == 0:
+            self.state = STATE_GAMEOVER
+            self.statistics['total'] += 1
+            self._restart_turn = other_token(self.turn)
+            self._result = 'squashed'
+            self.statistics[self._result] += 1
+
+            return _squashed_event(self.turn, r, c)
+        else:
+            event = _next_turn_event(self.turn, r, c)
+            self.turn = other_token(self.turn)
+
+            return event
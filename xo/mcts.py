@@ -0,0 +1,200 @@
+"""A Monte Carlo tree search, using UCT, for boards that are too large to be
+searched exhaustively.
+
+The search grows a tree of positions from the root, choosing which branch to
+explore with the UCT formula, and scores each new position with a random
+playout to the end of the game. The move that was explored the most is the
+best one.
+
+Positions are given by two masks, mine for the pieces of the player to move
+and theirs for the pieces of their opponent, as in xo.ai.
+"""
+
+import math
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .board import each_bit
+
+
+# The exploration constant of UCT.
+EXPLORATION = math.sqrt(2)
+
+
+# The clock is only read every so many playouts.
+_deadline_check_interval = 16
+
+
+class _Node:
+    # reward is the total reward, from the point of view of the player who
+    # made the move that led to the node, of the playouts through it.
+    __slots__ = ('mine', 'theirs', 'children', 'untried', 'visits', 'reward', 'result')
+
+    def __init__(self, mine, theirs, untried, result):
+        self.mine = mine
+        self.theirs = theirs
+        self.children = {}
+        self.untried = untried
+        self.visits = 0
+        self.reward = 0.0
+        self.result = result
+
+
+def search(geometry, mine, theirs, playouts=None, time_budget=None, seed=None):
+    """Searches until it has run the given number of playouts or the time
+    budget, in seconds, is used up, whichever comes first, and returns the
+    (visits, reward) of each of the root's moves.
+    """
+    if playouts is None and time_budget is None:
+        raise ValueError('either playouts or time_budget is needed')
+
+    rng = random.Random(seed)
+    lines_through = [[mask for mask, _ in lines] for lines in geometry.lines_through]
+    full_mask = geometry.full_mask
+
+    if time_budget is None:
+        deadline = math.inf
+    else:
+        deadline = time.perf_counter() + time_budget
+
+    root = _Node(mine, theirs, _moves(full_mask, mine, theirs, rng), None)
+    n = 0
+
+    while playouts is None or n < playouts:
+        if n % _deadline_check_interval == 0 and n > 0 and time.perf_counter() > deadline:
+            break
+
+        n += 1
+        node = root
+        path = [root]
+
+        # Selection
+        while not node.untried and node.children and node.result is None:
+            node = _select(node)
+            path.append(node)
+
+        # Expansion
+        if node.result is None and node.untried:
+            i = node.untried.pop()
+            child_mine = node.mine | 1 << i
+
+            if _completes_a_line(child_mine, lines_through[i]):
+                result = 1.0
+            elif child_mine | node.theirs == full_mask:
+                result = 0.5
+            else:
+                result = None
+
+            child = _Node(node.theirs, child_mine,
+                _moves(full_mask, node.theirs, child_mine, rng) if result is None else [], result)
+            node.children[i] = child
+            node = child
+            path.append(node)
+
+        # Simulation
+        if node.result is not None:
+            reward = node.result
+        else:
+            reward = 1.0 - _playout(node.mine, node.theirs, full_mask, lines_through, rng)
+
+        # Backpropagation
+        for node in reversed(path):
+            node.visits += 1
+            node.reward += reward
+            reward = 1.0 - reward
+
+    return { i: (child.visits, child.reward) for i, child in root.children.items() }
+
+
+def search_in_processes(geometry, mine, theirs, playouts=None, time_budget=None, seed=None, jobs=2):
+    """Runs an independent search in each of jobs processes, splitting the
+    playouts between them, and merges the statistics of the root's moves.
+    """
+    if seed is None:
+        seed = random.randrange(1 << 32)
+
+    if playouts is not None:
+        shares = [playouts // jobs + (n < playouts % jobs) for n in range(jobs)]
+    else:
+        shares = [None] * jobs
+
+    merged = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(search, geometry, mine, theirs, share, time_budget, seed + n)
+            for n, share in enumerate(shares)
+        ]
+
+        for future in futures:
+            for i, (visits, reward) in future.result().items():
+                total_visits, total_reward = merged.get(i, (0, 0.0))
+                merged[i] = (total_visits + visits, total_reward + reward)
+
+    return merged
+
+
+def best_moves(statistics, all_positions=True):
+    """The mask of the most visited moves, or of the first of them if
+    all_positions is False.
+    """
+    most_visits = max(visits for visits, _ in statistics.values())
+    moves = 0
+
+    for i in sorted(statistics):
+        if statistics[i][0] == most_visits:
+            moves |= 1 << i
+
+            if not all_positions:
+                break
+
+    return moves
+
+
+def _select(node):
+    log_visits = math.log(node.visits)
+    best_value = -math.inf
+
+    for child in node.children.values():
+        value = child.reward / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+
+        if value > best_value:
+            best_value = value
+            best = child
+
+    return best
+
+
+def _moves(full_mask, mine, theirs, rng):
+    moves = list(each_bit(full_mask & ~(mine | theirs)))
+    rng.shuffle(moves)
+    return moves
+
+
+def _completes_a_line(pieces, lines):
+    for mask in lines:
+        if pieces & mask == mask:
+            return True
+
+    return False
+
+
+# Plays random moves until the game is over and returns the reward for the
+# player to move.
+def _playout(mine, theirs, full_mask, lines_through, rng):
+    moves = list(each_bit(full_mask & ~(mine | theirs)))
+    rng.shuffle(moves)
+    reward = 1.0
+
+    for i in moves:
+        mine |= 1 << i
+
+        if _completes_a_line(mine, lines_through[i]):
+            return reward
+
+        mine, theirs = theirs, mine
+        reward = 1.0 - reward
+
+    return 0.5
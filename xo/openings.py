@@ -0,0 +1,95 @@
+"""Generates the opening books that xo.ai.evaluate answers from before it
+searches.
+
+Usage: python -m xo.openings -g RxCxK [-p PLY] [-o PATH]
+"""
+
+import os
+import sys
+
+from . import ai, arbiter, book
+from .board import Board, each_bit, parse_geometry
+
+
+DEFAULT_PLY = 4
+
+
+def build(geometry, ply=DEFAULT_PLY):
+    """Yields the result of each position, in canonical form, with at most ply
+    pieces on the board.
+    """
+    positions = [(Board(xmask, omask, geometry), token) for xmask, omask, token in _positions(geometry, ply)]
+
+    for (board, token), result in ai._solve_positions(positions):
+        yield (board.xmask, board.omask, token), result
+
+
+def _positions(geometry, ply):
+    symmetries = geometry.symmetries
+    positions = set()
+    layer = {(0, 0)}
+
+    for n in range(ply + 1):
+        next_layer = set()
+
+        for xmask, omask in layer:
+            board = Board(xmask, omask, geometry)
+
+            for token in ['x', 'o']:
+                if not arbiter.can_move(board, token):
+                    continue
+
+                positions.add((xmask, omask, token))
+
+                if n < ply:
+                    for i in each_bit(board.emptymask):
+                        if token == 'x':
+                            child = symmetries.canonical(xmask | 1 << i, omask)
+                        else:
+                            child = symmetries.canonical(xmask, omask | 1 << i)
+
+                        next_layer.add(child[:2])
+
+        layer = next_layer
+
+    return positions
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m xo.openings',
+        description='Generate an opening book used by the AI.')
+
+    parser.add_argument('-g', '--geometry', required=True,
+        metavar='RxCxK',
+        help='the size of the board and the number in a row that wins')
+
+    parser.add_argument('-p', '--ply', type=int, default=DEFAULT_PLY,
+        metavar='n',
+        help='the most pieces on the boards in the book (default: {})'.format(DEFAULT_PLY))
+
+    parser.add_argument('-o', '--output',
+        metavar='path',
+        help='where to write the book (default: {})'.format(
+            os.path.join(book.DEFAULT_DIRECTORY, 'RxCxK.bin')))
+
+    args = parser.parse_args(args)
+
+    try:
+        geometry = parse_geometry(args.geometry)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.ply < 0:
+        parser.error('ply must be non-negative: {}'.format(args.ply))
+
+    output = args.output or os.path.join(book.DEFAULT_DIRECTORY, book.filename(geometry))
+
+    book.write(output, geometry, args.ply, build(geometry, args.ply), ai.SCORING_VERSION)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
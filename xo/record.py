@@ -0,0 +1,86 @@
+"""Immutable, slotted records that can also be read like the dicts they replace.
+
+A record exposes its fields as attributes. For backwards compatibility it is
+also a read-only mapping from field names to values, where fields that are None
+are left out and fields listed in _list_fields are returned as fresh lists. So
+it compares equal to the dict that used to be returned in its place. A record
+isn't a dict though, so json.dumps doesn't accept it. Use asdict to get a copy
+as plain dicts and lists, for e.g. json.dumps(event.asdict()).
+
+Records are immutable, so the common ones are created once and shared.
+"""
+
+from collections.abc import Mapping
+
+
+class Record(Mapping):
+    __slots__ = ()
+
+    _fields = ()
+    _list_fields = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self._fields):
+            raise TypeError('{} expects {} values: {}'.format(
+                type(self).__name__, len(self._fields), values))
+
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return all(getattr(self, name) == getattr(other, name) for name in self._fields)
+        else:
+            return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self._fields))
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, name) for name in self._fields)
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            value = getattr(self, key)
+
+            if value is not None:
+                if key in self._list_fields:
+                    return list(value)
+                else:
+                    return value
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        for name in self._fields:
+            if getattr(self, name) is not None:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def asdict(self):
+        """Returns the dict that the record replaces, with the records in its
+        fields, and in the lists of its list fields, also turned into dicts.
+        """
+        return { name: _asdict(self[name]) for name in self }
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name)) for name in self
+        ))
+
+
+def _asdict(value):
+    if isinstance(value, Record):
+        return value.asdict()
+    elif isinstance(value, list):
+        return [_asdict(item) for item in value]
+    else:
+        return value
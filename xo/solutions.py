@@ -0,0 +1,121 @@
+"""A compact, memory-mapped database of minimax results.
+
+The database is generated ahead of time by xo.solve and holds the result of
+evaluating every legal position for each token that may move in it. It is made
+up of an 8-byte header followed by one 32-bit little-endian record per
+(board, token) pair, indexed by the base-3 value of the board.
+
+A record packs the score, the depth and a 9-bit mask of the optimal moves:
+
+    bits  0-8   the optimal moves, bit i set for the i-th cell in row-major order
+    bits  9-12  the depth
+    bits 13-18  the score offset by 32
+
+A record of 0 means that there is no result for the (board, token) pair.
+"""
+
+import mmap
+import os
+import struct
+
+from .board import each_bit, ncells, ncols, nrows, position
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'solutions.bin')
+
+MAGIC = b'XOSD'
+FORMAT_VERSION = 1
+
+
+_header = struct.Struct('<4sBBBB')
+_record = struct.Struct('<I')
+
+_nrecords = 2 * 3 ** ncells
+
+_moves_mask = (1 << ncells) - 1
+_depth_shift = ncells
+_depth_mask = 0xf
+_score_shift = ncells + 4
+_score_mask = 0x3f
+_score_offset = 32
+
+
+# The base-3 value of each mask, where a set bit i contributes 3^i.
+_ternary = [
+    sum(3 ** i for i in each_bit(mask)) for mask in range(1 << ncells)
+]
+
+
+def index(xmask, omask, token):
+    return 2 * (_ternary[xmask] + 2 * _ternary[omask]) + (token == 'o')
+
+
+def pack(score, depth, moves):
+    if not -_score_offset <= score < _score_mask + 1 - _score_offset:
+        raise ValueError('score out of range: {}'.format(score))
+    if not 0 <= depth <= _depth_mask:
+        raise ValueError('depth out of range: {}'.format(depth))
+    if not 0 < moves <= _moves_mask:
+        raise ValueError('moves out of range: {}'.format(moves))
+
+    return ((score + _score_offset) << _score_shift) | (depth << _depth_shift) | moves
+
+
+def unpack(record):
+    score = ((record >> _score_shift) & _score_mask) - _score_offset
+    depth = (record >> _depth_shift) & _depth_mask
+    positions = [position(i) for i in each_bit(record & _moves_mask)]
+
+    return score, depth, positions
+
+
+def write(path, records, scoring_version):
+    table = bytearray(_record.size * _nrecords)
+
+    for (xmask, omask, token), record in records:
+        _record.pack_into(table, _record.size * index(xmask, omask, token), record)
+
+    with open(path, 'wb') as f:
+        f.write(_header.pack(MAGIC, FORMAT_VERSION, nrows, ncols, scoring_version))
+        f.write(table)
+
+
+class SolutionDatabase:
+    def __init__(self, path, scoring_version):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if len(self._mm) != _header.size + _record.size * _nrecords:
+                raise ValueError('not a solution database: {}'.format(path))
+
+            magic, version, rows, cols, scoring = _header.unpack_from(self._mm)
+
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError('not a solution database: {}'.format(path))
+            if (rows, cols) != (nrows, ncols):
+                raise ValueError('solution database is for a {}x{} board: {}'.format(rows, cols, path))
+            if scoring != scoring_version:
+                raise ValueError('solution database is out of date: {}'.format(path))
+        except Exception:
+            self._mm.close()
+            raise
+
+    def lookup(self, xmask, omask, token):
+        offset = _header.size + _record.size * index(xmask, omask, token)
+        record, = _record.unpack_from(self._mm, offset)
+
+        if record:
+            return unpack(record)
+        else:
+            return None
+
+    def close(self):
+        self._mm.close()
+
+
+def load(scoring_version, path=DEFAULT_PATH):
+    try:
+        return SolutionDatabase(path, scoring_version)
+    except FileNotFoundError:
+        return None
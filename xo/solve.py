@@ -0,0 +1,51 @@
+"""Generates the solution database that xo.ai.evaluate answers from.
+
+Usage: python -m xo.solve [-o PATH]
+"""
+
+import sys
+
+from . import ai, arbiter, solutions
+from .board import Board, full_mask
+
+
+def solve():
+    for (board, token), (score, depth, moves) in ai._solve_positions(_positions_to_solve()):
+        yield (board.xmask, board.omask, token), solutions.pack(score, depth, moves)
+
+
+def _positions_to_solve():
+    for xmask in range(full_mask + 1):
+        omask = full_mask & ~xmask
+
+        while True:
+            board = Board(xmask, omask)
+
+            for token in ['x', 'o']:
+                if arbiter.can_move(board, token):
+                    yield board, token
+
+            if omask == 0:
+                break
+            omask = (omask - 1) & ~xmask & full_mask
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m xo.solve',
+        description='Generate the solution database used by the AI.')
+
+    parser.add_argument('-o', '--output', default=solutions.DEFAULT_PATH,
+        metavar='path',
+        help='where to write the database (default: {})'.format(solutions.DEFAULT_PATH))
+
+    args = parser.parse_args(args)
+
+    solutions.write(args.output, solve(), ai.SCORING_VERSION)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""A table of many games stored in packed arrays.
+
+Each game in the table takes a few dozen bytes rather than the kilobyte or so
+of a Game object, which matters when a server hosts a very large number of
+matches at once. A game is identified by the id that new returns and is played
+with start, moveto and restart, which behave like the methods of Game of the
+same name and return the same events.
+
+Boards are stored as bitboards, so the table only works with boards of at most
+64 cells.
+"""
+
+from array import array
+
+from .board import Board, default_geometry
+from .error import IllegalStateError
+from .game import (
+    Event,
+    EVENT_NAME_GAMEOVER, EVENT_REASON_OCCUPIED, EVENT_REASON_OUT_OF_BOUNDS, EVENT_REASON_WINNER,
+    STATE_INIT, STATE_PLAYING, STATE_GAMEOVER,
+    _invalid_move_events, _move, _next_turn_event, _squashed_event
+)
+from .token import istoken
+
+
+# The states of a game as they are stored. _FREE marks a slot that isn't
+# in use.
+_FREE, _INIT, _PLAYING, _GAMEOVER = range(4)
+
+_state_names = [None, STATE_INIT, STATE_PLAYING, STATE_GAMEOVER]
+
+# The bits of a game's turn. A bit is set if it is o.
+_TURN         = 1
+_RESTART_TURN = 2
+
+_tokens = ['x', 'o']
+
+
+class GameTable:
+    def __init__(self, geometry=None):
+        self.geometry = geometry or default_geometry
+
+        if self.geometry.ncells > 64:
+            raise ValueError('a game table only works with boards of at most 64 cells: {}'.format(
+                self.geometry.ncells))
+
+        mask_typecode = next(
+            typecode for typecode in 'HIQ' if array(typecode).itemsize * 8 >= self.geometry.ncells
+        )
+
+        self._xmasks = array(mask_typecode)
+        self._omasks = array(mask_typecode)
+        self._states = array('B')
+        self._turns = array('B')
+        self._totals = array('I')
+        self._xwins = array('I')
+        self._owins = array('I')
+
+        self._arrays = [
+            self._xmasks, self._omasks, self._states, self._turns,
+            self._totals, self._xwins, self._owins
+        ]
+
+        self._free = []
+        self._lines_through = self.geometry.lines_through
+
+    def __len__(self):
+        return len(self._states) - len(self._free)
+
+    def __contains__(self, game_id):
+        return isinstance(game_id, int) and 0 <= game_id < len(self._states) and \
+            self._states[game_id] != _FREE
+
+    @property
+    def nbytes(self):
+        """The number of bytes taken by the games' arrays."""
+        return sum(a.itemsize * len(a) for a in self._arrays)
+
+    @property
+    def bytes_per_game(self):
+        return sum(a.itemsize for a in self._arrays)
+
+    def new(self):
+        """Adds a game, in the init state, and returns its id. The ids of
+        removed games are reused.
+        """
+        if self._free:
+            game_id = self._free.pop()
+
+            for a in self._arrays:
+                a[game_id] = 0
+        else:
+            game_id = len(self._states)
+
+            for a in self._arrays:
+                a.append(0)
+
+        self._states[game_id] = _INIT
+        return game_id
+
+    def remove(self, game_id):
+        self._check(game_id)
+        self._states[game_id] = _FREE
+        self._free.append(game_id)
+
+    def state(self, game_id):
+        return _state_names[self._check(game_id)]
+
+    def turn(self, game_id):
+        if self._check(game_id) == _INIT:
+            return None
+        else:
+            return _tokens[self._turns[game_id] & _TURN]
+
+    def board(self, game_id):
+        """A copy of the game's board, or None if it hasn't started."""
+        if self._check(game_id) == _INIT:
+            return None
+        else:
+            return Board(self._xmasks[game_id], self._omasks[game_id], self.geometry)
+
+    def statistics(self, game_id):
+        self._check(game_id)
+
+        total = self._totals[game_id]
+        xwins = self._xwins[game_id]
+        owins = self._owins[game_id]
+
+        return { 'total': total, 'xwins': xwins, 'owins': owins, 'squashed': total - xwins - owins }
+
+    def start(self, game_id, token):
+        state = self._check(game_id)
+
+        if state == _INIT:
+            if not istoken(token):
+                raise ValueError('must be a token: {}'.format(token))
+
+            self._states[game_id] = _PLAYING
+            self._turns[game_id] = _TURN if token == 'o' else 0
+        else:
+            raise IllegalStateError(_state_names[state])
+
+    def moveto(self, game_id, r, c):
+        state = self._check(game_id)
+
+        if state != _PLAYING:
+            raise IllegalStateError(_state_names[state])
+
+        geometry = self.geometry
+
+        if not geometry.contains(r, c):
+            return _invalid_move_events[EVENT_REASON_OUT_OF_BOUNDS]
+
+        i = geometry.ncols * (r - 1) + c - 1
+        bit = 1 << i
+        xmask = self._xmasks[game_id]
+        omask = self._omasks[game_id]
+
+        if (xmask | omask) & bit:
+            return _invalid_move_events[EVENT_REASON_OCCUPIED]
+
+        turns = self._turns[game_id]
+        turn = turns & _TURN
+
+        if turn:
+            omask |= bit
+            pieces = self._omasks[game_id] = omask
+            token = 'o'
+        else:
+            xmask |= bit
+            pieces = self._xmasks[game_id] = xmask
+            token = 'x'
+
+        # The game was in progress before this move, so only the lines through
+        # it could have been completed.
+        winning_lines = tuple(
+            line for mask, line in self._lines_through[i] if pieces & mask == mask
+        )
+
+        if winning_lines:
+            self._states[game_id] = _GAMEOVER
+            self._totals[game_id] += 1
+            self._turns[game_id] = turn | (_RESTART_TURN if turn else 0)
+
+            if turn:
+                self._owins[game_id] += 1
+            else:
+                self._xwins[game_id] += 1
+
+            return Event(
+                EVENT_NAME_GAMEOVER,
+                EVENT_REASON_WINNER,
+                _move(token, r, c),
+                winning_lines
+            )
+        elif xmask | omask == geometry.full_mask:
+            self._states[game_id] = _GAMEOVER
+            self._totals[game_id] += 1
+            self._turns[game_id] = turn | (0 if turn else _RESTART_TURN)
+
+            return _squashed_event(token, r, c)
+        else:
+            self._turns[game_id] = turns ^ _TURN
+
+            return _next_turn_event(token, r, c)
+
+    def restart(self, game_id):
+        state = self._check(game_id)
+
+        if state == _GAMEOVER:
+            turns = self._turns[game_id]
+
+            self._states[game_id] = _PLAYING
+            self._xmasks[game_id] = 0
+            self._omasks[game_id] = 0
+            self._turns[game_id] = _TURN if turns & _RESTART_TURN else 0
+        else:
+            raise IllegalStateError(_state_names[state])
+
+    def _check(self, game_id):
+        if game_id not in self:
+            raise KeyError('no such game: {}'.format(game_id))
+
+        return self._states[game_id]